@@ -0,0 +1,136 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from utils import prepare_feature_matrix, format_predictions
+
+# Upper bounds of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+class PredictionCoalescer:
+    """
+    Micro-batching coalescer for single-candidate predictions
+
+    Concurrent requests are collected in a shared queue and scored as one
+    feature matrix once the queue reaches ``max_batch_size`` or the oldest
+    request has waited ``max_wait_ms``. Each caller receives its own row
+    of the result.
+    """
+
+    def __init__(self, score_fn: Callable, max_batch_size: int = 64, max_wait_ms: float = 2.0):
+        """
+        Args:
+            score_fn: Async callable taking a model and a feature matrix and
+                returning (predictions, confidences, probabilities) arrays
+            max_batch_size: Flush as soon as this many requests are queued
+            max_wait_ms: Flush when the oldest queued request is this old
+        """
+        self.score_fn = score_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+        self._max_queue_depth = 0
+        self._batches = 0
+        self._rows = 0
+        self._flush_reasons = {"size": 0, "timeout": 0}
+        self._batch_size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self._wait_seconds_total = 0.0
+
+    async def submit(self, features: Dict[str, float], model) -> Dict[str, Any]:
+        """
+        Queue one candidate and wait for its prediction
+
+        Args:
+            features: Dictionary of feature names and values
+            model: Model used to score this candidate
+
+        Returns:
+            Prediction dictionary in the API response format
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((features, model, future, time.perf_counter()))
+        self._max_queue_depth = max(self._max_queue_depth, len(self._pending))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush("size")
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush, "timeout")
+
+        return await future
+
+    def _flush(self, reason: str):
+        """Hand everything currently queued to a scoring task"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        now = time.perf_counter()
+        self._batches += 1
+        self._rows += len(batch)
+        self._flush_reasons[reason] += 1
+        self._batch_size_counts[int(np.searchsorted(BATCH_SIZE_BUCKETS, len(batch)))] += 1
+        self._wait_seconds_total += sum(now - queued_at for _, _, _, queued_at in batch)
+
+        # Requests for different models are scored as separate matrices
+        groups: Dict[int, List[tuple]] = {}
+        for item in batch:
+            groups.setdefault(id(item[1]), []).append(item)
+
+        loop = asyncio.get_running_loop()
+        for group in groups.values():
+            task = loop.create_task(self._score(group))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _score(self, batch: List[tuple]):
+        """Score one flushed batch as a single matrix"""
+        futures = [future for _, _, future, _ in batch]
+        try:
+            X = prepare_feature_matrix([features for features, _, _, _ in batch])
+            results = format_predictions(*await self.score_fn(batch[0][1], X))
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get queue-depth and batch-size metrics for tuning
+
+        Returns:
+            Dictionary of coalescer settings and counters
+        """
+        histogram = {
+            f"le_{bound}": count
+            for bound, count in zip(BATCH_SIZE_BUCKETS, self._batch_size_counts)
+        }
+        histogram["gt_" + str(BATCH_SIZE_BUCKETS[-1])] = self._batch_size_counts[-1]
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": len(self._pending),
+            "max_queue_depth": self._max_queue_depth,
+            "batches": self._batches,
+            "rows": self._rows,
+            "avg_batch_size": self._rows / self._batches if self._batches else 0.0,
+            "avg_wait_ms": 1000.0 * self._wait_seconds_total / self._rows if self._rows else 0.0,
+            "flush_reasons": dict(self._flush_reasons),
+            "batch_size_histogram": histogram
+        }
@@ -0,0 +1,106 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from utils import FEATURE_ORDER
+
+def feature_key(features: Dict[str, float], model_version: Optional[str]) -> str:
+    """
+    Canonical cache key for one candidate scored by one model version
+
+    Args:
+        features: Dictionary of feature names and values
+        model_version: Version id of the model producing the result
+
+    Returns:
+        Hex digest of the float64 feature vector and the model version
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.array([features[key] for key in FEATURE_ORDER], dtype=np.float64).tobytes())
+    digest.update(str(model_version).encode())
+    return digest.hexdigest()
+
+class ResultCache:
+    """
+    Bounded LRU result cache with an optional time-to-live
+
+    A ``max_entries`` of 0 disables the cache.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: Optional[float] = None):
+        """
+        Args:
+            max_entries: Maximum number of cached results
+            ttl_seconds: Drop entries older than this, if set
+        """
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a cached result, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at is not None and time.monotonic() > expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any):
+        """Store a result, evicting the least recently used entries"""
+        if self.max_entries == 0:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all cached results"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters
+
+        Returns:
+            Dictionary of size, limits and hit/miss counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
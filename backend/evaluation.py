@@ -0,0 +1,309 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+# Equal-width bins of the predicted 'confirmed' probability
+CALIBRATION_BINS = 10
+
+# Written next to a model artifact by /api/retrain and the training scripts
+HOLDOUT_SUFFIX = ".holdout.npz"
+
+EVALUATION_SOURCES = ["all", "holdout", "feedback"]
+
+class RunningMetrics:
+    """
+    Fixed-size accumulator of binary classification metrics
+
+    Holds the confusion counts, per-bin calibration sums and the Brier score
+    sum. Updating costs O(rows) vectorized work; reading the metrics costs
+    O(1) regardless of how many rows were accumulated.
+    """
+
+    def __init__(self):
+        # confusion[actual, predicted]
+        self.confusion = np.zeros((2, 2), dtype=np.int64)
+        self.bin_count = np.zeros(CALIBRATION_BINS, dtype=np.int64)
+        self.bin_probability = np.zeros(CALIBRATION_BINS, dtype=np.float64)
+        self.bin_positive = np.zeros(CALIBRATION_BINS, dtype=np.int64)
+        self.brier_sum = 0.0
+
+    @property
+    def count(self) -> int:
+        return int(self.confusion.sum())
+
+    def update(self, y_true: np.ndarray, y_pred: np.ndarray, p_confirmed: np.ndarray):
+        """
+        Add a batch of evaluated rows
+
+        Args:
+            y_true: Ground-truth labels (1 = confirmed, 0 = false positive)
+            y_pred: Predicted labels
+            p_confirmed: Predicted probability of 'confirmed'
+        """
+        y_true = np.asarray(y_true, dtype=np.int64)
+        y_pred = np.asarray(y_pred, dtype=np.int64)
+        p_confirmed = np.asarray(p_confirmed, dtype=np.float64)
+
+        self.confusion += np.bincount(2 * y_true + y_pred, minlength=4).reshape(2, 2)
+
+        bins = np.clip((p_confirmed * CALIBRATION_BINS).astype(np.int64), 0, CALIBRATION_BINS - 1)
+        self.bin_count += np.bincount(bins, minlength=CALIBRATION_BINS)
+        self.bin_probability += np.bincount(bins, weights=p_confirmed, minlength=CALIBRATION_BINS)
+        self.bin_positive += np.bincount(bins, weights=y_true, minlength=CALIBRATION_BINS).astype(np.int64)
+        self.brier_sum += float(np.sum((p_confirmed - y_true) ** 2))
+
+    def merge(self, other: "RunningMetrics") -> "RunningMetrics":
+        """Combine two accumulators into a new one"""
+        merged = RunningMetrics()
+        merged.confusion = self.confusion + other.confusion
+        merged.bin_count = self.bin_count + other.bin_count
+        merged.bin_probability = self.bin_probability + other.bin_probability
+        merged.bin_positive = self.bin_positive + other.bin_positive
+        merged.brier_sum = self.brier_sum + other.brier_sum
+        return merged
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Current metrics
+
+        Returns:
+            Dictionary of confusion counts, accuracy, precision, recall, F1,
+            Brier score, expected calibration error and calibration bins
+        """
+        (tn, fp), (fn, tp) = self.confusion.tolist()
+        count = tn + fp + fn + tp
+
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+        occupied = self.bin_count > 0
+        mean_probability = np.divide(self.bin_probability, self.bin_count, where=occupied,
+                                     out=np.zeros(CALIBRATION_BINS))
+        observed_rate = np.divide(self.bin_positive, self.bin_count, where=occupied,
+                                  out=np.zeros(CALIBRATION_BINS))
+        ece = float(np.sum(self.bin_count * np.abs(mean_probability - observed_rate)) / count) if count else 0.0
+
+        return {
+            "count": count,
+            "confusion_matrix": self.confusion.tolist(),
+            "accuracy": (tp + tn) / count if count else 0.0,
+            "precision": precision,
+            "recall": recall,
+            "f1_score": f1,
+            "brier_score": self.brier_sum / count if count else 0.0,
+            "expected_calibration_error": ece,
+            "calibration": [
+                {
+                    "bin_start": i / CALIBRATION_BINS,
+                    "bin_end": (i + 1) / CALIBRATION_BINS,
+                    "count": int(self.bin_count[i]),
+                    "mean_predicted": float(mean_probability[i]),
+                    "observed_rate": float(observed_rate[i])
+                }
+                for i in range(CALIBRATION_BINS)
+            ]
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "confusion": self.confusion.tolist(),
+            "bin_count": self.bin_count.tolist(),
+            "bin_probability": self.bin_probability.tolist(),
+            "bin_positive": self.bin_positive.tolist(),
+            "brier_sum": self.brier_sum
+        }
+
+    @classmethod
+    def from_dict(cls, content: Dict[str, Any]) -> "RunningMetrics":
+        metrics = cls()
+        metrics.confusion = np.asarray(content["confusion"], dtype=np.int64)
+        metrics.bin_count = np.asarray(content["bin_count"], dtype=np.int64)
+        metrics.bin_probability = np.asarray(content["bin_probability"], dtype=np.float64)
+        metrics.bin_positive = np.asarray(content["bin_positive"], dtype=np.int64)
+        metrics.brier_sum = float(content["brier_sum"])
+        return metrics
+
+def holdout_path(model_path: Path) -> Path:
+    """Holdout predictions file stored next to a model artifact"""
+    model_path = Path(model_path)
+    return model_path.with_name(model_path.stem + HOLDOUT_SUFFIX)
+
+def save_holdout(model_path: Path, y_true: np.ndarray, y_pred: np.ndarray, p_confirmed: np.ndarray):
+    """
+    Save the holdout predictions of a freshly trained model
+
+    Args:
+        model_path: Model artifact the predictions belong to
+        y_true: Holdout labels
+        y_pred: Predicted labels
+        p_confirmed: Predicted probability of 'confirmed'
+    """
+    np.savez(
+        holdout_path(model_path),
+        y_true=np.asarray(y_true, dtype=np.int8),
+        y_pred=np.asarray(y_pred, dtype=np.int8),
+        p_confirmed=np.asarray(p_confirmed, dtype=np.float32)
+    )
+
+class EvaluationStore:
+    """
+    Per-model-version evaluation metrics
+
+    Each version has a 'holdout' accumulator, filled from the holdout
+    predictions saved at training time, and a 'feedback' accumulator, fed by
+    ground truth reported later. Both are persisted as one small JSON file
+    per version, so every worker serves the same numbers; updates from
+    different processes are serialized with a file lock where available.
+    """
+
+    def __init__(self, directory: Path):
+        """
+        Args:
+            directory: Directory of the per-version state files
+        """
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        # version -> (state file mtime, state)
+        self._states: Dict[str, tuple] = {}
+
+    def _path(self, version: str) -> Path:
+        return self.directory / f"{version}.json"
+
+    def _read(self, version: str) -> Dict[str, Any]:
+        path = self._path(version)
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            return {"revision": 0, "holdout": None, "feedback": None}
+
+        cached = self._states.get(version)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        with open(path) as f:
+            content = json.load(f)
+        state = {
+            "revision": content["revision"],
+            "holdout": RunningMetrics.from_dict(content["holdout"]) if content["holdout"] else None,
+            "feedback": RunningMetrics.from_dict(content["feedback"]) if content["feedback"] else None
+        }
+        self._states[version] = (mtime, state)
+        return state
+
+    def _write(self, version: str, state: Dict[str, Any]):
+        path = self._path(version)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "revision": state["revision"],
+                "holdout": state["holdout"].to_dict() if state["holdout"] else None,
+                "feedback": state["feedback"].to_dict() if state["feedback"] else None
+            }, f)
+        os.replace(tmp_path, path)
+        self._states[version] = (path.stat().st_mtime_ns, state)
+
+    def _update(self, version: str, source: str, metrics: RunningMetrics, replace: bool = False):
+        """Read-modify-write one accumulator under the thread and file locks"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.directory / ".lock", "w") as lock_file:
+            if HAS_FCNTL:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            state = dict(self._read(version))
+            if state[source] is not None and not replace:
+                metrics = state[source].merge(metrics)
+            state[source] = metrics
+            state["revision"] += 1
+            self._write(version, state)
+
+    def _ensure_holdout(self, version: str, model_path: Optional[Path]):
+        """Import holdout predictions saved by a training script"""
+        if model_path is None or self._read(version)["holdout"] is not None:
+            return
+
+        path = holdout_path(model_path)
+        if not path.exists():
+            return
+
+        with np.load(path) as holdout:
+            metrics = RunningMetrics()
+            metrics.update(holdout["y_true"], holdout["y_pred"], holdout["p_confirmed"])
+        self._update(version, "holdout", metrics, replace=True)
+
+    def record_holdout(self, version: str, model_path: Path, y_true: np.ndarray,
+                       y_pred: np.ndarray, p_confirmed: np.ndarray):
+        """
+        Save the holdout predictions of a model version and reset its
+        holdout metrics to them
+
+        Args:
+            version: Model version
+            model_path: Model artifact
+            y_true: Holdout labels
+            y_pred: Predicted labels
+            p_confirmed: Predicted probability of 'confirmed'
+        """
+        save_holdout(model_path, y_true, y_pred, p_confirmed)
+        metrics = RunningMetrics()
+        metrics.update(y_true, y_pred, p_confirmed)
+        self._update(version, "holdout", metrics, replace=True)
+
+    def record_feedback(self, version: str, y_true: np.ndarray, y_pred: np.ndarray,
+                        p_confirmed: np.ndarray):
+        """
+        Add ground-truth feedback for predictions of a model version
+
+        Args:
+            version: Model version
+            y_true: Reported labels
+            y_pred: Labels the model predicts for the same rows
+            p_confirmed: Predicted probability of 'confirmed'
+        """
+        metrics = RunningMetrics()
+        metrics.update(y_true, y_pred, p_confirmed)
+        self._update(version, "feedback", metrics)
+
+    def metrics(self, version: str, model_path: Optional[Path] = None,
+                source: str = "all") -> Optional[Dict[str, Any]]:
+        """
+        Current metrics of a model version
+
+        Args:
+            version: Model version
+            model_path: Model artifact, to pick up holdout predictions saved
+                next to it by a training script
+            source: 'holdout', 'feedback' or 'all' for both combined
+
+        Returns:
+            Metrics snapshot with the state revision, or None without data
+        """
+        if source not in EVALUATION_SOURCES:
+            raise ValueError(f"Unknown evaluation source: {source}")
+
+        self._ensure_holdout(version, model_path)
+        state = self._read(version)
+
+        if source == "all":
+            parts = [state[name] for name in ("holdout", "feedback") if state[name] is not None]
+            combined = parts[0].merge(parts[1]) if len(parts) == 2 else (parts[0] if parts else None)
+        else:
+            combined = state[source]
+
+        if combined is None or combined.count == 0:
+            return None
+
+        return {"source": source, "revision": state["revision"], **combined.snapshot()}
+
+    def revision(self, version: str) -> int:
+        """Number of updates applied to a model version's metrics"""
+        return self._read(version)["revision"]
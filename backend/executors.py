@@ -0,0 +1,114 @@
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+# Pool sizes, configurable per deployment
+POOL_SIZES = {
+    "inference": int(os.getenv("EXOVISION_INFERENCE_WORKERS", "4")),
+    "training": int(os.getenv("EXOVISION_TRAINING_WORKERS", "1")),
+    "rendering": int(os.getenv("EXOVISION_RENDERING_WORKERS", "2")),
+    "explaining": int(os.getenv("EXOVISION_EXPLAIN_PROCESSES", str(min(4, os.cpu_count() or 1)))),
+}
+
+# Pools backed by worker processes instead of threads, for CPU-bound work
+# that holds the GIL; a size of 0 disables them
+PROCESS_POOLS = {"explaining"}
+
+_executors: Dict[str, Executor] = {}
+_in_flight: Dict[str, int] = {name: 0 for name in POOL_SIZES}
+_lock = threading.Lock()
+
+def process_pool_enabled(pool: str) -> bool:
+    """Whether a process-backed pool is configured with any workers"""
+    return pool in PROCESS_POOLS and POOL_SIZES[pool] > 0
+
+def get_executor(pool: str) -> Executor:
+    """
+    Get (and lazily create) the executor backing a named pool
+
+    Args:
+        pool: One of 'inference', 'training', 'rendering' or 'explaining'
+
+    Returns:
+        Thread (or process) pool limited to the configured size for that pool
+    """
+    if pool not in POOL_SIZES:
+        raise ValueError(f"Unknown executor pool: {pool}")
+
+    with _lock:
+        executor = _executors.get(pool)
+        if executor is None and pool in PROCESS_POOLS:
+            if POOL_SIZES[pool] < 1:
+                raise ValueError(f"Executor pool {pool} is disabled")
+            # Spawned, not forked, so workers do not inherit the server's
+            # threads and locks
+            executor = ProcessPoolExecutor(
+                max_workers=POOL_SIZES[pool],
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            _executors[pool] = executor
+        elif executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=max(1, POOL_SIZES[pool]),
+                thread_name_prefix=f"exovision-{pool}"
+            )
+            _executors[pool] = executor
+        return executor
+
+async def run_in_pool(pool: str, fn: Callable, *args, **kwargs) -> Any:
+    """
+    Run blocking CPU work in a named pool without blocking the event loop
+
+    Args:
+        pool: One of 'inference', 'training', 'rendering' or 'explaining'
+        fn: Blocking callable (picklable for process pools)
+        *args, **kwargs: Arguments passed to ``fn``
+
+    Returns:
+        Result of ``fn``
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_executor(pool)
+
+    call = functools.partial(fn, *args, **kwargs)
+    if pool not in PROCESS_POOLS:
+        # Keep request-scoped context (e.g. per-request stage timings)
+        call = functools.partial(contextvars.copy_context().run, call)
+
+    with _lock:
+        _in_flight[pool] += 1
+    try:
+        return await loop.run_in_executor(executor, call)
+    finally:
+        with _lock:
+            _in_flight[pool] -= 1
+
+def executor_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Get size and load of every executor pool
+
+    Returns:
+        Dictionary mapping pool name to its size and in-flight task count
+    """
+    with _lock:
+        return {
+            name: {
+                "max_workers": size if name in PROCESS_POOLS else max(1, size),
+                "in_flight": _in_flight[name]
+            }
+            for name, size in POOL_SIZES.items()
+        }
+
+def shutdown_executors():
+    """Shut down all executor pools, waiting for running work to finish"""
+    with _lock:
+        executors = list(_executors.values())
+        _executors.clear()
+
+    for executor in executors:
+        executor.shutdown(wait=True)
@@ -0,0 +1,162 @@
+import asyncio
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from executors import process_pool_enabled, run_in_pool
+from monitoring import stage
+from utils import create_shap_explainer, positive_class_shap
+
+# Rows explained per task; small enough to spread a batch over every worker
+EXPLAIN_CHUNK_ROWS = 256
+
+# Explainers kept per worker process, most recently used model versions
+MAX_PROCESS_EXPLAINERS = 2
+
+_process_explainers: "OrderedDict[str, Any]" = OrderedDict()
+
+def _process_explainer(version: str, store_path: Optional[str], model_path: str,
+                       background: Optional[np.ndarray]):
+    """
+    Get the explainer of a model version in this worker process
+
+    A compiled forest is read from the array store the server workers
+    already map, so its node arrays are shared rather than unpickled again;
+    other models are loaded from their artifact. Either way the explainer
+    is built once per worker process and model version.
+    """
+    explainer = _process_explainers.get(version)
+    if explainer is None:
+        if store_path is not None:
+            from forest import load_forest
+            model = load_forest(store_path)
+        else:
+            import joblib
+            model = joblib.load(model_path)
+        explainer = create_shap_explainer(model, background)
+        _process_explainers[version] = explainer
+        while len(_process_explainers) > MAX_PROCESS_EXPLAINERS:
+            _process_explainers.popitem(last=False)
+    else:
+        _process_explainers.move_to_end(version)
+    return explainer
+
+def explain_rows(explainer, X: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Compute confirmed-class SHAP values for a block of rows
+
+    Args:
+        explainer: SHAP explainer
+        X: Feature matrix
+
+    Returns:
+        Tuple of ((rows, features) float32 SHAP values, base value)
+    """
+    values, base_value = positive_class_shap(explainer.shap_values(X), explainer.expected_value)
+    return values.astype(np.float32), base_value
+
+def explain_rows_in_process(version: str, store_path: Optional[str], model_path: str,
+                            background: Optional[np.ndarray], X: np.ndarray) -> Tuple[np.ndarray, float]:
+    """``explain_rows`` in a worker process, which builds each explainer once"""
+    return explain_rows(_process_explainer(version, store_path, model_path, background), X)
+
+async def explain_chunks(X: np.ndarray, entry, explainer=None,
+                         background: Optional[np.ndarray] = None,
+                         store_path: Optional[str] = None,
+                         chunk_rows: int = EXPLAIN_CHUNK_ROWS) -> AsyncIterator[Tuple[int, np.ndarray, float]]:
+    """
+    Compute SHAP values for every row of a feature matrix, chunk by chunk
+
+    All chunks are explained concurrently in the 'explaining' process pool,
+    where every worker reuses one explainer per model version. Without
+    worker processes the chunks run on the 'rendering' threads with
+    ``explainer``. Each chunk is yielded as soon as it and the chunks
+    before it are done; chunks not started yet are dropped if the caller
+    stops iterating.
+
+    Args:
+        X: Feature matrix
+        entry: Registry entry of the model to explain
+        explainer: Explainer of ``entry``, used when the process pool is disabled
+        background: SHAP background rows the worker processes build with
+        store_path: Array store the worker processes read the model from,
+            instead of its artifact
+        chunk_rows: Rows per task
+
+    Yields:
+        Tuples of (first row index, (rows, features) float32 SHAP values,
+        base value), in row order
+    """
+    starts = range(0, len(X), chunk_rows)
+
+    if process_pool_enabled("explaining"):
+        tasks = [
+            asyncio.ensure_future(run_in_pool(
+                "explaining", explain_rows_in_process, entry.version, store_path,
+                str(entry.path), background, X[start:start + chunk_rows]
+            ))
+            for start in starts
+        ]
+    else:
+        tasks = [
+            asyncio.ensure_future(run_in_pool("rendering", explain_rows, explainer, X[start:start + chunk_rows]))
+            for start in starts
+        ]
+
+    try:
+        for start, task in zip(starts, tasks):
+            values, base_value = await task
+            yield start, values, base_value
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def explain_matrix(X: np.ndarray, entry, explainer=None,
+                         background: Optional[np.ndarray] = None,
+                         store_path: Optional[str] = None,
+                         chunk_rows: int = EXPLAIN_CHUNK_ROWS) -> Tuple[np.ndarray, float]:
+    """
+    Compute SHAP values for every row of a feature matrix at once
+
+    Args:
+        X: Feature matrix
+        entry: Registry entry of the model to explain
+        explainer, background, store_path, chunk_rows: As for ``explain_chunks``
+
+    Returns:
+        Tuple of ((rows, features) float32 SHAP values, base value)
+    """
+    if len(X) == 0:
+        return np.empty((0, X.shape[1]), dtype=np.float32), 0.0
+
+    with stage("shap"):
+        chunks = [
+            chunk async for chunk in explain_chunks(X, entry, explainer, background, store_path, chunk_rows)
+        ]
+    return np.concatenate([values for _, values, _ in chunks]), chunks[0][2]
+
+def shap_summary(values: np.ndarray, base_value: float, feature_names: List[str]) -> Dict[str, Any]:
+    """
+    Aggregate SHAP values over a batch
+
+    Args:
+        values: (rows, features) SHAP values
+        base_value: Explainer expected value of the confirmed class
+        feature_names: Feature names in column order
+
+    Returns:
+        Dictionary with the row count, base value and per-feature mean |SHAP|
+    """
+    abs_sum = np.abs(values).sum(axis=0, dtype=np.float64) if len(values) else np.zeros(len(feature_names))
+    return summarize_abs_shap(abs_sum, len(values), base_value, feature_names)
+
+def summarize_abs_shap(abs_sum: np.ndarray, rows: int, base_value: float,
+                       feature_names: List[str]) -> Dict[str, Any]:
+    """``shap_summary`` from per-feature sums of |SHAP| accumulated over chunks"""
+    mean_abs = abs_sum / rows if rows else np.zeros(len(feature_names))
+    return {
+        "rows": rows,
+        "base_value": base_value,
+        "mean_abs_shap": dict(zip(feature_names, np.asarray(mean_abs, dtype=np.float64).tolist()))
+    }
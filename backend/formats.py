@@ -0,0 +1,408 @@
+import json
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, Response
+
+from monitoring import stage, timed
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# Result formats and the media types they are negotiated from
+MEDIA_TYPES = {
+    "json": ["application/json"],
+    "columnar": ["application/vnd.exovision.columnar+json"],
+    "ndjson": ["application/x-ndjson", "application/ndjson"],
+    "csv": ["text/csv"],
+    "arrow": ["application/vnd.apache.arrow.stream", "application/vnd.apache.arrow.file"],
+    "parquet": ["application/vnd.apache.parquet", "application/x-parquet"],
+    "npy": ["application/x-npy"],
+}
+
+BULK_FORMATS = ["columnar", "arrow", "parquet"]
+
+SHAP_FORMATS = ["json", "npy", "parquet", "ndjson"]
+
+# Binary feature matrix formats accepted by /api/predict-binary
+INPUT_FORMATS = ["arrow", "parquet", "npy"]
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse recording its encoding time as the serialization stage"""
+
+    def render(self, content: Any) -> bytes:
+        with stage("serialization"):
+            return super().render(content)
+
+def negotiate_format(accept: Optional[str], allowed: List[str]) -> str:
+    """
+    Pick a result format from an Accept header
+
+    Args:
+        accept: Accept header value
+        allowed: Formats supported by the endpoint
+
+    Returns:
+        Best allowed format by quality value, 'json' if nothing matches
+    """
+    candidates = []
+    for position, item in enumerate((accept or "").split(",")):
+        parts = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        candidates.append((-quality, position, parts[0].lower()))
+
+    for quality, _, media_type in sorted(candidates):
+        if quality == 0:
+            break
+        for name in allowed:
+            if media_type in MEDIA_TYPES[name]:
+                return name
+
+    return "json"
+
+def resolve_output(output: Optional[str], accept: Optional[str], allowed: List[str]) -> str:
+    """
+    Resolve the result format from an explicit parameter or the Accept header
+
+    Args:
+        output: Explicitly requested format, if any
+        accept: Accept header value
+        allowed: Formats supported by the endpoint
+
+    Returns:
+        Format name
+    """
+    if output is None:
+        return negotiate_format(accept, allowed)
+
+    if output not in allowed:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid output format. Allowed formats: {', '.join(allowed)}"
+        )
+    return output
+
+def resolve_input(input_format: Optional[str], content_type: Optional[str]) -> str:
+    """
+    Resolve the format of a binary request body
+
+    Args:
+        input_format: Explicitly declared format, if any
+        content_type: Content-Type header value
+
+    Returns:
+        Format name
+    """
+    if input_format is not None:
+        if input_format not in INPUT_FORMATS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid input format. Allowed formats: {', '.join(INPUT_FORMATS)}"
+            )
+        return input_format
+
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    for name in INPUT_FORMATS:
+        if media_type in MEDIA_TYPES[name]:
+            return name
+
+    raise HTTPException(
+        status_code=415,
+        detail="Unsupported body type. Send an Arrow IPC stream or file, a Parquet file or a .npy "
+               "matrix, or declare it with ?input="
+    )
+
+def read_npy(body: bytes) -> np.ndarray:
+    """
+    Wrap a .npy body as an array without copying it
+
+    Returns:
+        Read-only array viewing the request body
+    """
+    from numpy.lib import format as npy_format
+
+    buffer = BytesIO(body)
+    try:
+        version = npy_format.read_magic(buffer)
+        if version == (1, 0):
+            shape, fortran_order, dtype = npy_format.read_array_header_1_0(buffer)
+        elif version == (2, 0):
+            shape, fortran_order, dtype = npy_format.read_array_header_2_0(buffer)
+        else:
+            raise ValueError(f"unsupported .npy version {version}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid .npy body: {e}")
+
+    if dtype.hasobject:
+        raise HTTPException(status_code=400, detail="Invalid .npy body: object arrays are not accepted")
+
+    count = int(np.prod(shape))
+    if len(body) - buffer.tell() < count * dtype.itemsize:
+        raise HTTPException(status_code=400, detail="Invalid .npy body: data is shorter than its header")
+
+    array = np.frombuffer(body, dtype=dtype, count=count, offset=buffer.tell())
+    return array.reshape(shape, order="F" if fortran_order else "C")
+
+def _declared_features(features: Optional[List[str]], metadata: Optional[Dict[bytes, bytes]]) -> Optional[List[str]]:
+    """Feature order from the request, else from the 'features' schema metadata"""
+    if features is not None:
+        return features
+    if metadata and b"features" in metadata:
+        return [name.strip() for name in metadata[b"features"].decode().split(",")]
+    return None
+
+def _table_matrix(table, features: Optional[List[str]], feature_order: List[str]) -> Tuple[np.ndarray, List[str]]:
+    """
+    Turn an Arrow table into a feature matrix
+
+    A table with a single fixed-size list column is read as a row-major
+    matrix, a view of the Arrow buffer when it has no nulls. Otherwise every
+    column named after a feature is copied into one matrix.
+    """
+    import pyarrow as pa
+
+    if table.num_columns == 1 and pa.types.is_fixed_size_list(table.schema.field(0).type):
+        column = table.column(0)
+        array = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+        if array.null_count:
+            raise HTTPException(status_code=400, detail="Invalid Arrow body: the feature matrix has null rows")
+        width = table.schema.field(0).type.list_size
+        X = array.flatten().to_numpy(zero_copy_only=False).reshape(-1, width)
+        return X, _declared_features(features, table.schema.metadata) or feature_order[:width]
+
+    names = [name for name in feature_order if name in table.column_names]
+    columns = [table.column(name) for name in names]
+    dtype = np.float32 if columns and all(pa.types.is_float32(column.type) for column in columns) else np.float64
+    X = np.empty((table.num_rows, len(names)), dtype=dtype)
+    for j, column in enumerate(columns):
+        # Nulls come out as NaN and fail validation
+        X[:, j] = column.to_numpy()
+    return X, names
+
+@timed("validation")
+def decode_matrix(fmt: str, body: bytes, features: Optional[List[str]],
+                  feature_order: List[str]) -> Tuple[np.ndarray, List[str]]:
+    """
+    Decode a binary feature matrix
+
+    Args:
+        fmt: 'arrow' (IPC stream or file), 'parquet' or 'npy'
+        body: Request body
+        features: Declared column order, if any
+        feature_order: Feature names the model expects
+
+    Returns:
+        Tuple of (matrix, feature name of each column)
+    """
+    if fmt == "npy":
+        X = read_npy(body)
+        return X, features or feature_order[:X.shape[1] if X.ndim == 2 else 0]
+
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise HTTPException(
+            status_code=415,
+            detail="Arrow and Parquet input require the pyarrow library"
+        )
+
+    try:
+        if fmt == "arrow":
+            buffer = pa.py_buffer(body)
+            if body[:6] == b"ARROW1":
+                table = pa.ipc.open_file(buffer).read_all()
+            else:
+                table = pa.ipc.open_stream(buffer).read_all()
+        elif fmt == "parquet":
+            import pyarrow.parquet as pq
+            parquet_file = pq.ParquetFile(pa.BufferReader(body))
+            wanted = [name for name in feature_order if name in parquet_file.schema_arrow.names]
+            table = parquet_file.read(columns=wanted or None)
+        else:
+            raise ValueError(f"Unknown input format: {fmt}")
+    except pa.ArrowException as e:
+        raise HTTPException(status_code=400, detail=f"Invalid {fmt} body: {e}")
+
+    return _table_matrix(table, features, feature_order)
+
+def columnar_result(predictions: np.ndarray, confidences: np.ndarray,
+                    probabilities: np.ndarray) -> Dict[str, Any]:
+    """
+    Lay out scored rows as parallel arrays
+
+    Args:
+        predictions: Predicted class per row
+        confidences: Confidence per row
+        probabilities: Probability matrix, columns [false_positive, confirmed]
+
+    Returns:
+        Dictionary of row, prediction, confidence and p_confirmed arrays
+    """
+    return {
+        "row": np.arange(1, len(predictions) + 1, dtype=np.int64),
+        "prediction": np.where(predictions == 1, "confirmed", "false-positive"),
+        "confidence": np.ascontiguousarray(confidences, dtype=np.float64),
+        "p_confirmed": np.ascontiguousarray(probabilities[:, 1], dtype=np.float64)
+    }
+
+def loads(body: bytes) -> Any:
+    """Decode a JSON request body"""
+    if HAS_ORJSON:
+        return orjson.loads(body)
+    return json.loads(body)
+
+def dumps(content: Dict[str, Any]) -> bytes:
+    """Encode a dictionary holding NumPy arrays as JSON"""
+    if HAS_ORJSON:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY, default=_to_list)
+    return json.dumps(content, default=_to_list).encode()
+
+def _to_list(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _arrow_table(columns: Dict[str, np.ndarray], summary: Optional[Dict[str, Any]]):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise HTTPException(
+            status_code=406,
+            detail="Arrow and Parquet output require the pyarrow library"
+        )
+
+    table = pa.table({
+        "row": pa.array(columns["row"]),
+        "prediction": pa.array(columns["prediction"].tolist()).dictionary_encode(),
+        "confidence": pa.array(columns["confidence"]),
+        "p_confirmed": pa.array(columns["p_confirmed"])
+    })
+    if summary is not None:
+        table = table.replace_schema_metadata({"summary": json.dumps(summary)})
+    return table
+
+@timed("serialization")
+def encode_results(fmt: str, predictions: np.ndarray, confidences: np.ndarray,
+                   probabilities: np.ndarray, summary: Optional[Dict[str, Any]] = None) -> Response:
+    """
+    Encode bulk predictions in a columnar format
+
+    Args:
+        fmt: 'columnar', 'arrow' or 'parquet'
+        predictions: Predicted class per row
+        confidences: Confidence per row
+        probabilities: Probability matrix, columns [false_positive, confirmed]
+        summary: Optional summary, stored as a JSON field or schema metadata
+
+    Returns:
+        Response with the encoded body and matching media type
+    """
+    columns = columnar_result(predictions, confidences, probabilities)
+
+    if fmt == "columnar":
+        content = {**columns, "count": len(predictions)}
+        if summary is not None:
+            content["summary"] = summary
+        return Response(content=dumps(content), media_type=MEDIA_TYPES["columnar"][0])
+
+    table = _arrow_table(columns, summary)
+
+    if fmt == "arrow":
+        import pyarrow as pa
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(content=sink.getvalue().to_pybytes(), media_type=MEDIA_TYPES["arrow"][0])
+
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        buffer = BytesIO()
+        pq.write_table(table, buffer)
+        return Response(content=buffer.getvalue(), media_type=MEDIA_TYPES["parquet"][0])
+
+    raise ValueError(f"Unknown result format: {fmt}")
+
+@timed("serialization")
+def encode_shap_rows(values: np.ndarray, feature_names: List[str], first_row: int) -> bytes:
+    """
+    Encode a chunk of SHAP values as NDJSON lines, one per row
+
+    Args:
+        values: (rows, features) float32 SHAP values
+        feature_names: Feature names in column order
+        first_row: 1-based row number of the first row in the chunk
+
+    Returns:
+        Encoded lines
+    """
+    lines = [
+        json.dumps({"row": first_row + i, "shap_values": dict(zip(feature_names, row))})
+        for i, row in enumerate(values.astype(np.float64).tolist())
+    ]
+    return ("\n".join(lines) + "\n").encode() if lines else b""
+
+@timed("serialization")
+def encode_shap_values(fmt: str, values: np.ndarray, feature_names: List[str],
+                       summary: Dict[str, Any]) -> Response:
+    """
+    Encode a batch of SHAP values
+
+    Args:
+        fmt: 'json', 'npy' (float32 matrix, summary in the X-SHAP-Summary
+            header) or 'parquet' (one float32 column per feature, summary in
+            the schema metadata); 'ndjson' is streamed with ``encode_shap_rows``
+        values: (rows, features) float32 SHAP values
+        feature_names: Feature names in column order
+        summary: Batch aggregates from explaining.shap_summary
+
+    Returns:
+        Response with the encoded body and matching media type
+    """
+    if fmt == "json":
+        content = {"features": feature_names, "shap_values": values, "summary": summary}
+        return Response(content=dumps(content), media_type=MEDIA_TYPES["json"][0])
+
+    if fmt == "npy":
+        buffer = BytesIO()
+        np.save(buffer, np.ascontiguousarray(values, dtype=np.float32), allow_pickle=False)
+        return Response(
+            content=buffer.getvalue(),
+            media_type=MEDIA_TYPES["npy"][0],
+            headers={
+                "X-SHAP-Features": ",".join(feature_names),
+                "X-SHAP-Summary": json.dumps(summary)
+            }
+        )
+
+    if fmt == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise HTTPException(
+                status_code=406,
+                detail="Arrow and Parquet output require the pyarrow library"
+            )
+
+        table = pa.table({
+            name: pa.array(np.ascontiguousarray(values[:, i], dtype=np.float32))
+            for i, name in enumerate(feature_names)
+        }).replace_schema_metadata({"summary": json.dumps(summary)})
+        buffer = BytesIO()
+        pq.write_table(table, buffer)
+        return Response(content=buffer.getvalue(), media_type=MEDIA_TYPES["parquet"][0])
+
+    raise ValueError(f"Unknown SHAP format: {fmt}")
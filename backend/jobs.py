@@ -0,0 +1,420 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import signal
+import traceback
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from executors import run_in_pool
+from utils import file_digest
+
+# Steps of a retraining job, in order
+JOB_STAGES = ["parse", "split", "tune", "fit", "evaluate", "persist"]
+
+ACTIVE_STATES = {"queued", "running"}
+FINISHED_STATES = {"succeeded", "failed", "cancelled"}
+
+JOB_ID_PATTERN = re.compile(r"^[a-f0-9]{32}$")
+
+# Files in a job directory
+STATUS_FILE = "status.json"
+CANCEL_FILE = "cancel"
+DATA_FILE = "train.csv"
+MODEL_FILE = "model.joblib"
+HOLDOUT_FILE = "holdout.npz"
+
+class JobError(Exception):
+    """Training job rejected because of its input; the message is shown as is"""
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _close_stages(stages: Dict[str, Dict[str, Any]], now: datetime):
+    """Mark the stage still running as finished"""
+    for timing in stages.values():
+        if timing["finished_at"] is None:
+            timing["finished_at"] = now.isoformat()
+            timing["seconds"] = (now - datetime.fromisoformat(timing["started_at"])).total_seconds()
+
+class JobStore:
+    """
+    Directory of retraining jobs
+
+    Every job has its own directory holding the uploaded data, a status
+    file replaced atomically on every change, and the job's outputs until
+    they are installed. Any worker can read a job's status or request its
+    cancellation; only the worker that owns the job runs it.
+    """
+
+    def __init__(self, directory: Path):
+        """
+        Args:
+            directory: Parent directory of the job directories
+        """
+        self.directory = Path(directory)
+
+    def new_id(self) -> str:
+        return uuid.uuid4().hex
+
+    def job_dir(self, job_id: str) -> Path:
+        if not JOB_ID_PATTERN.match(job_id):
+            raise ValueError(f"Invalid job id: {job_id}")
+        return self.directory / job_id
+
+    def read(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Read a job's status
+
+        Returns:
+            Status dictionary, or None if there is no such job
+        """
+        try:
+            with open(self.job_dir(job_id) / STATUS_FILE) as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # Jobs of a worker that went away never finish
+        if status["state"] in ACTIVE_STATES and not _pid_alive(status.get("owner")):
+            status["state"] = "failed"
+            status["error"] = "The server worker running this job stopped"
+        return status
+
+    def write(self, job_id: str, status: Dict[str, Any]):
+        path = self.job_dir(job_id) / STATUS_FILE
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(status, f)
+        os.replace(tmp_path, path)
+
+    def update(self, job_id: str, **changes) -> Dict[str, Any]:
+        """Apply changes to a job's status and return the new status"""
+        status = self.read(job_id) or {}
+        status.update(changes)
+        self.write(job_id, status)
+        return status
+
+    def start_stage(self, job_id: str, stage: str) -> Dict[str, Any]:
+        """Finish the current stage and start the next one"""
+        now = datetime.now()
+        stages = (self.read(job_id) or {}).get("stages", {})
+        _close_stages(stages, now)
+        stages[stage] = {"started_at": now.isoformat(), "finished_at": None, "seconds": None}
+        return self.update(
+            job_id,
+            stage=stage,
+            stages=stages,
+            progress=JOB_STAGES.index(stage) / len(JOB_STAGES)
+        )
+
+    def finish_stage(self, job_id: str, **changes) -> Dict[str, Any]:
+        """Finish the current stage, applying other status changes with it"""
+        stages = (self.read(job_id) or {}).get("stages", {})
+        _close_stages(stages, datetime.now())
+        return self.update(job_id, stages=stages, **changes)
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Status of every job, newest first"""
+        if not self.directory.is_dir():
+            return []
+        jobs = []
+        for path in self.directory.iterdir():
+            if JOB_ID_PATTERN.match(path.name):
+                status = self.read(path.name)
+                if status is not None:
+                    jobs.append(status)
+        return sorted(jobs, key=lambda status: status["submitted_at"], reverse=True)
+
+    def request_cancel(self, job_id: str):
+        (self.job_dir(job_id) / CANCEL_FILE).touch()
+
+    def cancel_requested(self, job_id: str) -> bool:
+        return (self.job_dir(job_id) / CANCEL_FILE).exists()
+
+def _exit_on_terminate(signum, frame):
+    # Unwinds the job so it stops any worker processes of its own
+    raise SystemExit(128 + signum)
+
+def run_training_job(directory: str, job_id: str, feature_columns: List[str], params: Dict[str, Any]):
+    """
+    Train a model in a job process
+
+    Reports each stage in the job status and leaves the fitted model and
+    its holdout predictions in the job directory. Installing them is up to
+    the server worker that owns the job.
+
+    Args:
+        directory: JobStore directory
+        job_id: Job to run
+        feature_columns: Feature columns of the training CSV, in model order
+        params: Job parameters: 'test_size' and 'random_state', and for
+            'incremental' mode the 'base_model_path' to grow, 'new_trees'
+            and 'max_trees', for 'tuned' mode the 'tune_seconds' budget and
+            'tune_workers'
+    """
+    signal.signal(signal.SIGTERM, _exit_on_terminate)
+    store = JobStore(Path(directory))
+    job_dir = store.job_dir(job_id)
+
+    try:
+        store.start_stage(job_id, "parse")
+        import joblib
+        import numpy as np
+        import pandas as pd
+        from training import grow_random_forest, summarize_provenance, train_random_forest, train_tuned_model
+
+        try:
+            df = pd.read_csv(job_dir / DATA_FILE)
+        except (pd.errors.ParserError, UnicodeDecodeError):
+            raise JobError("Invalid CSV file format")
+
+        missing_columns = [column for column in feature_columns + ["label"] if column not in df.columns]
+        if missing_columns:
+            raise JobError(f"Missing required columns: {', '.join(missing_columns)}")
+
+        X = df[feature_columns].values
+        y = df["label"].values
+        del df
+
+        # Recorded with every tree grown on this data
+        source = {
+            "dataset": file_digest(job_dir / DATA_FILE),
+            "job_id": job_id,
+            "trained_at": datetime.now().isoformat()
+        }
+
+        def progress(stage: str):
+            store.start_stage(job_id, stage)
+
+        results = {}
+        if params.get("mode") == "incremental":
+            from sklearn.ensemble import RandomForestClassifier
+            model = joblib.load(params["base_model_path"])
+            if not isinstance(model, RandomForestClassifier):
+                raise JobError(f"Incremental training needs a RandomForestClassifier, not {type(model).__name__}")
+            try:
+                model, metrics, holdout = grow_random_forest(
+                    model, X, y, params["new_trees"], params["max_trees"],
+                    params["test_size"], params["random_state"], progress=progress, source=source
+                )
+            except ValueError as e:
+                raise JobError(str(e))
+        elif params.get("mode") == "tuned":
+            model, metrics, holdout, tuning = train_tuned_model(
+                X, y, params["tune_seconds"], params["test_size"], params["random_state"],
+                n_workers=params.get("tune_workers"), progress=progress, source=source
+            )
+            results = {"hyperparameters": tuning["best"], "tuning": tuning}
+        else:
+            model, metrics, holdout = train_random_forest(
+                X, y, params["test_size"], params["random_state"], progress=progress, source=source
+            )
+
+        store.start_stage(job_id, "persist")
+        joblib.dump(model, job_dir / MODEL_FILE)
+        np.savez(job_dir / HOLDOUT_FILE, **holdout)
+        store.finish_stage(
+            job_id, metrics=metrics,
+            tree_provenance=summarize_provenance(getattr(model, "tree_provenance_", [])),
+            **results
+        )
+    except JobError as e:
+        store.update(job_id, error=str(e))
+        raise SystemExit(1)
+    except Exception as e:
+        traceback.print_exc()
+        store.update(job_id, error=f"Retraining error: {e}")
+        raise SystemExit(1)
+
+class TrainingJobs:
+    """
+    Runs retraining jobs in separate processes
+
+    Jobs are queued and at most ``max_concurrent`` of them run at once in
+    this worker, each in its own spawned process so a cancellation can
+    stop it at any point. When a job's process succeeds, ``install`` is
+    called to move its model into place; a failed or cancelled job leaves
+    the served models untouched.
+    """
+
+    def __init__(self, store: JobStore, install: Callable[[Dict[str, Any], Path], Awaitable[Dict[str, Any]]],
+                 max_concurrent: int = 1, poll_seconds: float = 0.5):
+        """
+        Args:
+            store: Job directory
+            install: Coroutine taking a finished job's status and directory
+                and returning status fields to add (e.g. the new model info)
+            max_concurrent: Jobs running at the same time
+            poll_seconds: How often running jobs are checked for completion
+                and cancellation
+        """
+        self.store = store
+        self.install = install
+        self.max_concurrent = max_concurrent
+        self.poll_seconds = poll_seconds
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._processes: Dict[str, multiprocessing.Process] = {}
+
+    def submit(self, data_path: Path, feature_columns: List[str], params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Queue a retraining job
+
+        Args:
+            data_path: Uploaded training CSV, moved into the job directory
+            feature_columns: Feature columns in model order
+            params: Job parameters passed to ``run_training_job`` and kept
+                in the status
+
+        Returns:
+            Initial job status
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+
+        job_id = self.store.new_id()
+        job_dir = self.store.job_dir(job_id)
+        job_dir.mkdir(parents=True)
+        shutil.move(str(data_path), job_dir / DATA_FILE)
+
+        status = {
+            "id": job_id,
+            "state": "queued",
+            "stage": None,
+            "stages": {},
+            "progress": 0.0,
+            "params": params,
+            "submitted_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "metrics": None,
+            "model_info": None,
+            "error": None,
+            "owner": os.getpid()
+        }
+        self.store.write(job_id, status)
+        self._tasks[job_id] = asyncio.create_task(self._run(job_id, feature_columns))
+        return status
+
+    async def _acquire_slot(self, job_id: str) -> bool:
+        """Wait for a free slot; False if the job was cancelled meanwhile"""
+        while True:
+            if self.store.cancel_requested(job_id):
+                return False
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.poll_seconds)
+                return True
+            except asyncio.TimeoutError:
+                continue
+
+    async def _run(self, job_id: str, feature_columns: List[str]):
+        job_dir = self.store.job_dir(job_id)
+
+        try:
+            acquired = await self._acquire_slot(job_id)
+        except asyncio.CancelledError:
+            self._finish(job_id, "cancelled", error="Server shut down")
+            self._tasks.pop(job_id, None)
+            raise
+        if not acquired:
+            self._finish(job_id, "cancelled")
+            self._tasks.pop(job_id, None)
+            return
+
+        try:
+            status = self.store.update(job_id, state="running", started_at=datetime.now().isoformat())
+            params = status["params"]
+
+            process = multiprocessing.get_context("spawn").Process(
+                target=run_training_job,
+                args=(str(self.store.directory.resolve()), job_id, feature_columns, params),
+                name=f"exovision-job-{job_id[:8]}",
+                # Not a daemon, so tuned jobs can start their trial workers;
+                # shutdown() still stops it
+                daemon=False
+            )
+            self._processes[job_id] = process
+            await run_in_pool("training", process.start)
+
+            while process.is_alive():
+                if self.store.cancel_requested(job_id):
+                    process.terminate()
+                    await run_in_pool("training", process.join)
+                    self._finish(job_id, "cancelled")
+                    return
+                await asyncio.sleep(self.poll_seconds)
+            process.join()
+
+            status = self.store.read(job_id)
+            if process.exitcode != 0:
+                self._finish(job_id, "failed", error=status.get("error")
+                             or f"Training process exited with code {process.exitcode}")
+                return
+            if self.store.cancel_requested(job_id):
+                self._finish(job_id, "cancelled")
+                return
+
+            installed = await self.install(status, job_dir)
+            self._finish(job_id, "succeeded", progress=1.0, **installed)
+        except asyncio.CancelledError:
+            self._stop_process(job_id)
+            self._finish(job_id, "cancelled", error="Server shut down")
+            raise
+        except Exception as e:
+            self._finish(job_id, "failed", error=f"Retraining error: {e}")
+        finally:
+            self._processes.pop(job_id, None)
+            self._tasks.pop(job_id, None)
+            self._slots.release()
+
+    def _finish(self, job_id: str, state: str, **changes):
+        """Record a final state and drop the job's intermediate files"""
+        self.store.finish_stage(job_id, state=state, finished_at=datetime.now().isoformat(), **changes)
+
+        job_dir = self.store.job_dir(job_id)
+        for name in [DATA_FILE, MODEL_FILE, HOLDOUT_FILE]:
+            path = job_dir / name
+            if path.exists():
+                path.unlink()
+
+    def _stop_process(self, job_id: str):
+        process = self._processes.get(job_id)
+        if process is not None and process.is_alive():
+            process.terminate()
+            process.join()
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Request a job's cancellation
+
+        The worker that owns the job stops its process within
+        ``poll_seconds``; a queued job never starts.
+
+        Returns:
+            Current job status, or None if there is no such job
+        """
+        status = self.store.read(job_id)
+        if status is not None and status["state"] in ACTIVE_STATES:
+            self.store.request_cancel(job_id)
+        return status
+
+    async def shutdown(self):
+        """Cancel the jobs of this worker and stop their processes"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,25 +1,71 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from startup import startup_report
+from fastapi import FastAPI, File, UploadFile, HTTPException, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response, PlainTextResponse
+import asyncio
+import io
 import joblib
 import os
+import time
 from pathlib import Path
 import shutil
 from datetime import datetime
 import pandas as pd
 import numpy as np
-from models import ExoplanetFeatures, PredictionResponse, BatchPredictionRequest
+from typing import List, Optional
+from batching import PredictionCoalescer
+from executors import process_pool_enabled, run_in_pool, executor_stats, shutdown_executors
+from forest import ENGINES
+from registry import ModelRegistry, ModelEntry, ModelNotFoundError
+from sync import ActiveModelPointer
+from streaming import STREAM_FORMATS, encode_record, read_csv, read_csv_columns, stream_csv_predictions
+from formats import (
+    TimedJSONResponse, BULK_FORMATS, MEDIA_TYPES, SHAP_FORMATS, resolve_input, resolve_output,
+    decode_matrix, encode_results, encode_shap_rows, encode_shap_values, dumps, loads
+)
+from explaining import explain_chunks, explain_matrix, shap_summary, summarize_abs_shap
+from evaluation import EVALUATION_SOURCES, EvaluationStore
+from online import OnlineModelStore
+from jobs import FINISHED_STATES, HOLDOUT_FILE, MODEL_FILE, JobStore, TrainingJobs
+from monitoring import (
+    request_started, request_stages, observe_request, observe_stage, record_validation,
+    render_metrics, server_timing, stage, timed
+)
+from profiling import ProfileStore, SamplingProfiler
+from cache import ResultCache, feature_key
+from models import (
+    ExoplanetFeatures,
+    PredictionResponse,
+    BatchPredictionRequest,
+    ColumnarBatchRequest,
+    ColumnarValidationError,
+    FeedbackRequest,
+    FEATURE_DTYPES,
+    MAX_COLUMNAR_ERRORS,
+    feature_matrix_from_array,
+    feature_matrix_from_columns
+)
 from utils import (
+    FEATURE_ORDER,
     prepare_features, 
+    prepare_feature_matrix,
+    score_matrix,
+    format_predictions,
     calculate_feature_importance,
     create_confusion_matrix_plot,
-    create_feature_importance_plot
+    create_feature_importance_plot,
+    create_shap_explainer,
+    create_shap_explanation,
+    supports_tree_shap
 )
 
+startup_report.mark("imports")
+
 app = FastAPI(
     title="ExoVision API",
     description="AI-powered exoplanet discovery and classification API",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=TimedJSONResponse
 )
 
 # CORS middleware for Next.js frontend
@@ -39,15 +85,253 @@ DATA_DIR = Path("data")
 for directory in [UPLOAD_DIR, MODEL_DIR, DATA_DIR]:
     directory.mkdir(exist_ok=True)
 
-# Global variable to store the current model
-current_model = None
-model_metadata = {}
+# Registry of every model artifact; models are loaded on first use and
+# evicted least-recently-used beyond the memory budget
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("EXOVISION_MODEL_MEMORY_BUDGET_MB", "2048"))
+EXTRA_MODEL_DIRS = [
+    Path(directory)
+    for directory in os.getenv("EXOVISION_EXTRA_MODEL_DIRS", "").split(os.pathsep)
+    if directory
+]
+
+# Compiled forests are published as memory-mappable array stores, so every
+# worker on the host shares one copy and attaches to it without unpickling
+MMAP_MODELS = os.getenv("EXOVISION_MMAP_MODELS", "1") == "1"
+ARRAY_STORE_DIR = MODEL_DIR / "mmap"
+
+# Default inference engine for loaded models ('sklearn' or 'compiled'); only
+# compiled forests have array stores, so it is the default when they are on
+INFERENCE_ENGINE = os.getenv("EXOVISION_INFERENCE_ENGINE", "compiled" if MMAP_MODELS else "sklearn")
+
+model_registry = ModelRegistry(
+    [MODEL_DIR] + EXTRA_MODEL_DIRS,
+    MODEL_MEMORY_BUDGET_MB * 1024 * 1024,
+    INFERENCE_ENGINE,
+    ARRAY_STORE_DIR if MMAP_MODELS else None
+)
+
+# Rows parsed and scored per chunk by streaming CSV predictions
+CSV_CHUNK_ROWS = int(os.getenv("EXOVISION_CSV_CHUNK_ROWS", "10000"))
+
+# Shared active-model pointer; every worker polls it and swaps in the
+# version it names, so all workers serve the same model
+ACTIVE_MODEL_POLL_SECONDS = float(os.getenv("EXOVISION_ACTIVE_MODEL_POLL_SECONDS", "1"))
+
+active_model_pointer = ActiveModelPointer(
+    MODEL_DIR / "active_model.json",
+    MODEL_DIR / "workers",
+    ACTIVE_MODEL_POLL_SECONDS
+)
+active_model_sync = {"synced_at": None, "error": None}
+active_model_watcher = None
+
+# Opt-in micro-batching of concurrent /api/predict calls
+COALESCE_PREDICTIONS = os.getenv("EXOVISION_COALESCE_PREDICTIONS", "0") == "1"
+COALESCE_MAX_BATCH_SIZE = int(os.getenv("EXOVISION_COALESCE_MAX_BATCH_SIZE", "64"))
+COALESCE_MAX_WAIT_MS = float(os.getenv("EXOVISION_COALESCE_MAX_WAIT_MS", "2"))
+
+prediction_coalescer = (
+    PredictionCoalescer(
+        lambda model, X: run_in_pool("inference", score_matrix, model, X),
+        max_batch_size=COALESCE_MAX_BATCH_SIZE,
+        max_wait_ms=COALESCE_MAX_WAIT_MS
+    )
+    if COALESCE_PREDICTIONS else None
+)
+
+# Model-versioned result caches for /api/predict and /api/shap-values
+CACHE_TTL_SECONDS = float(os.getenv("EXOVISION_CACHE_TTL_SECONDS", "0"))
+
+prediction_cache = ResultCache(
+    int(os.getenv("EXOVISION_PREDICTION_CACHE_SIZE", "10000")), CACHE_TTL_SECONDS
+)
+shap_cache = ResultCache(
+    int(os.getenv("EXOVISION_SHAP_CACHE_SIZE", "256")), CACHE_TTL_SECONDS
+)
+
+# Rendered visualizations; keyed by model version, so they stay valid
+# across activations and are not cleared with the result caches
+PLOT_IMAGES = ["png", "svg", "none"]
+
+plot_cache = ResultCache(int(os.getenv("EXOVISION_PLOT_CACHE_SIZE", "256")))
+
+def clear_result_caches():
+    """Drop cached results after the model changes"""
+    prediction_cache.clear()
+    shap_cache.clear()
+
+# SHAP explainers are built once per model version, on the first
+# explanation or, when preloading, as soon as the model becomes active
+PRELOAD_SHAP_EXPLAINER = os.getenv("EXOVISION_PRELOAD_SHAP_EXPLAINER", "0") == "1"
+SHAP_BACKGROUND_PATH = os.getenv("EXOVISION_SHAP_BACKGROUND")
+SHAP_BACKGROUND_ROWS = int(os.getenv("EXOVISION_SHAP_BACKGROUND_ROWS", "100"))
+
+shap_background = {}
+explainer_preloads = set()
+
+# Per-response Server-Timing headers, and sampling profiles of single
+# requests that ask for one with ?profile=1 or an X-Profile: 1 header
+SERVER_TIMING = os.getenv("EXOVISION_SERVER_TIMING", "0") == "1"
+PROFILING_ENABLED = os.getenv("EXOVISION_PROFILING", "0") == "1"
+PROFILE_INTERVAL_MS = float(os.getenv("EXOVISION_PROFILE_INTERVAL_MS", "5"))
+
+profile_store = ProfileStore(Path("profiles"))
+
+# Holdout and ground-truth feedback metrics per model version
+evaluation_store = EvaluationStore(MODEL_DIR / "evaluations")
+
+@app.on_event("startup")
+async def startup():
+    """Index the model artifacts on disk and follow the shared active model"""
+    global active_model_watcher
+    
+    startup_report.mark("app_setup")
+    await run_in_pool("training", model_registry.scan)
+    startup_report.mark("model_scan")
+    await sync_active_model()
+    startup_report.mark("active_model_sync")
+    active_model_watcher = asyncio.create_task(watch_active_model())
+    startup_report.ready()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop following the active model and release the executor pools"""
+    if active_model_watcher is not None:
+        active_model_watcher.cancel()
+    active_model_pointer.remove_heartbeat()
+    await training_jobs.shutdown()
+    shutdown_executors()
+
+def set_active_model(version: Optional[str]):
+    """
+    Serve a model version by default in every worker
+    
+    The shared pointer is written first, so this worker's watcher never
+    sees the new local state paired with the old pointer.
+    
+    Args:
+        version: Registered model version, or None to serve none
+    """
+    active_model_pointer.write(version)
+    model_registry.set_active(version)
+    clear_result_caches()
+    active_model_sync["synced_at"] = datetime.now().isoformat()
+    preload_explainer(version)
+
+async def sync_active_model():
+    """Swap in the model version named by the shared pointer"""
+    pointer = active_model_pointer.read()
+    if pointer is None:
+        return
+    
+    version = pointer.get("version")
+    active = model_registry.active
+    if (active.version if active else None) == version:
+        return
+    
+    if version is not None:
+        try:
+            model_registry.resolve(version)
+        except ModelNotFoundError:
+            # Written by another worker since our last scan
+            await run_in_pool("inference", model_registry.scan)
+        await run_in_pool("inference", model_registry.load, version)
+    
+    model_registry.set_active(version)
+    clear_result_caches()
+    active_model_sync["synced_at"] = datetime.now().isoformat()
+    preload_explainer(version)
+
+async def watch_active_model():
+    """Poll the shared pointer and publish this worker's heartbeat"""
+    while True:
+        try:
+            await sync_active_model()
+            active_model_sync["error"] = None
+        except Exception as e:
+            active_model_sync["error"] = str(e)
+        
+        try:
+            active = model_registry.active
+            active_model_pointer.heartbeat(
+                active.version if active else None, active_model_sync["synced_at"]
+            )
+        except OSError:
+            pass
+        
+        await asyncio.sleep(ACTIVE_MODEL_POLL_SECONDS)
+
+async def get_model(model_id: Optional[str] = None) -> ModelEntry:
+    """
+    Resolve the model a request asks for, loading it on first use
+    
+    Args:
+        model_id: Registered model id, or None for the active model
+        
+    Returns:
+        Loaded registry entry
+    """
+    try:
+        entry = model_registry.loaded(model_id)
+        if entry is None:
+            entry = await run_in_pool("inference", model_registry.load, model_id)
+        return entry
+    except ModelNotFoundError as e:
+        if model_id is None:
+            raise HTTPException(
+                status_code=400,
+                detail="No model loaded. Please upload a model first."
+            )
+        raise HTTPException(status_code=404, detail=str(e))
+
+async def get_estimator(entry: ModelEntry):
+    """Get a model of a loaded entry that feature importances can be read from"""
+    if entry.model is not None:
+        return entry.model
+    return await run_in_pool("inference", model_registry.explainable_model, entry)
+
+def load_shap_background() -> Optional[np.ndarray]:
+    """
+    Sample the SHAP background rows from EXOVISION_SHAP_BACKGROUND
+    
+    Returns:
+        (rows, features) matrix, or None to explain against the trees'
+        own training distribution
+    """
+    if not SHAP_BACKGROUND_PATH:
+        return None
+    
+    if "rows" not in shap_background:
+        df = pd.read_csv(SHAP_BACKGROUND_PATH, usecols=FEATURE_ORDER).dropna()
+        if len(df) > SHAP_BACKGROUND_ROWS:
+            df = df.sample(n=SHAP_BACKGROUND_ROWS, random_state=0)
+        shap_background["rows"] = df[FEATURE_ORDER].to_numpy(dtype=np.float64)
+    
+    return shap_background["rows"]
+
+def build_explainer(model):
+    return create_shap_explainer(model, load_shap_background())
 
-# Store predictions for visualization
-prediction_history = {
-    "y_true": [],
-    "y_pred": []
-}
+async def get_explainer(entry: ModelEntry):
+    """Get the SHAP explainer of a loaded entry, building it on first use"""
+    if entry.explainer is not None:
+        return entry.explainer
+    return await run_in_pool("rendering", model_registry.explainer, entry, build_explainer)
+
+def preload_explainer(version: Optional[str]):
+    """Build the explainer of a newly active model in the background"""
+    if not PRELOAD_SHAP_EXPLAINER or version is None:
+        return
+    
+    task = asyncio.create_task(get_explainer(model_registry.resolve(version)))
+    explainer_preloads.add(task)
+    # Failures surface again on the first explanation request
+    task.add_done_callback(lambda done: explainer_preloads.discard(done) or done.cancelled() or done.exception())
+
+def save_upload(source, file_path: Path):
+    """Copy an uploaded file object to disk"""
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(source, buffer)
 
 @app.get("/")
 async def root():
@@ -56,7 +340,7 @@ async def root():
         "message": "ExoVision API",
         "version": "1.0.0",
         "status": "operational",
-        "model_loaded": current_model is not None
+        "model_loaded": model_registry.active is not None
     }
 
 @app.get("/health")
@@ -65,17 +349,116 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "model_status": "loaded" if current_model else "not_loaded"
+        "model_status": "loaded" if model_registry.active else "not_loaded",
+        "models": model_registry.stats(),
+        "executors": executor_stats()
     }
 
+def profiling_requested(request) -> bool:
+    """Whether a request opted in to a sampling profile"""
+    return PROFILING_ENABLED and (
+        request.headers.get("x-profile") == "1"
+        or request.query_params.get("profile") in ("1", "true")
+    )
+
+@app.middleware("http")
+async def record_request_metrics(request, call_next):
+    """
+    Count requests and time them per endpoint for /metrics, add the
+    Server-Timing header and capture opt-in request profiles
+    """
+    started = time.perf_counter()
+    request_started.set(started)
+    stages = []
+    request_stages.set(stages)
+    
+    profiler = None
+    if profiling_requested(request):
+        profiler = SamplingProfiler(PROFILE_INTERVAL_MS / 1000)
+        profiler.start()
+    
+    status = 500
+    response = None
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - started
+        # Route templates keep the label set bounded; unmatched paths share one
+        route = request.scope.get("route")
+        endpoint = route.path if route is not None else "unmatched"
+        observe_request(endpoint, request.method, status, elapsed)
+        if profiler is not None and response is None:
+            profiler.stop()
+    
+    if SERVER_TIMING or profiler is not None:
+        response.headers["Server-Timing"] = server_timing(stages, elapsed)
+    
+    if profiler is not None:
+        profile_id = profile_store.new_id(endpoint)
+        response.headers["X-Profile-Id"] = profile_id
+        response.body_iterator = profile_body(
+            response.body_iterator, profiler, profile_id,
+            {"endpoint": endpoint, "method": request.method, "status": status, "stages": stages}
+        )
+    
+    return response
+
+async def profile_body(body, profiler: SamplingProfiler, profile_id: str, details: dict):
+    """Pass a response body through and save the profile once it is sent"""
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        profiler.stop()
+        stage_totals = {}
+        for name, seconds in details["stages"]:
+            stage_totals[name] = stage_totals.get(name, 0.0) + seconds
+        details = {**details, "stages": stage_totals}
+        await run_in_pool("rendering", profile_store.save, profile_id, profiler, details)
+
+@app.get("/api/profiles")
+async def list_profiles():
+    """List the captured request profiles"""
+    return {"enabled": PROFILING_ENABLED, "profiles": profile_store.list()}
+
+@app.get("/api/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    """Get a captured request profile as folded stacks for flamegraph tools"""
+    content = profile_store.load(profile_id)
+    if content is None:
+        raise HTTPException(status_code=404, detail=f"Profile not found: {profile_id}")
+    return PlainTextResponse(content)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Request, stage latency, model and cache metrics in the Prometheus text format"""
+    content = render_metrics(
+        model_registry.list(),
+        {
+            "predictions": prediction_cache.stats(),
+            "shap": shap_cache.stats(),
+            "plots": plot_cache.stats()
+        }
+    )
+    return PlainTextResponse(content, media_type="text/plain; version=0.0.4")
+
 @app.post("/api/upload-model")
-async def upload_model(model: UploadFile = File(...)):
+async def upload_model(
+    model: UploadFile = File(...),
+    engine: str = INFERENCE_ENGINE,
+    activate: bool = True
+):
     """
     Upload a machine learning model file
     Supported formats: .pkl, .joblib, .h5, .pt, .pth
-    """
-    global current_model, model_metadata
     
+    Args:
+        model: Model file
+        engine: Inference engine, 'sklearn' or 'compiled' (flat-array forest)
+        activate: Serve this model by default; otherwise it is only
+            registered and used by requests that name it
+    """
     # Validate file extension
     allowed_extensions = [".pkl", ".joblib", ".h5", ".pt", ".pth"]
     file_extension = Path(model.filename).suffix.lower()
@@ -86,30 +469,30 @@ async def upload_model(model: UploadFile = File(...)):
             detail=f"Invalid file format. Allowed formats: {', '.join(allowed_extensions)}"
         )
     
+    if engine not in ENGINES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid inference engine. Allowed engines: {', '.join(ENGINES)}"
+        )
+    
     try:
         # Save the uploaded file
         file_path = MODEL_DIR / model.filename
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(model.file, buffer)
+        await run_in_pool("training", save_upload, model.file, file_path)
         
         # Load the model (assuming scikit-learn/joblib format)
         if file_extension in [".pkl", ".joblib"]:
-            current_model = joblib.load(file_path)
+            entry = await run_in_pool("training", model_registry.register, file_path, engine)
+            entry = await run_in_pool("training", model_registry.load, entry.version)
             
-            # Store metadata
-            model_metadata = {
-                "filename": model.filename,
-                "size": os.path.getsize(file_path),
-                "uploaded_at": datetime.now().isoformat(),
-                "format": file_extension,
-                "type": str(type(current_model).__name__)
-            }
+            if activate:
+                set_active_model(entry.version)
             
             return JSONResponse(
                 status_code=200,
                 content={
                     "message": "Model uploaded and loaded successfully",
-                    "metadata": model_metadata
+                    "metadata": entry.metadata
                 }
             )
         else:
@@ -137,79 +520,104 @@ async def upload_model(model: UploadFile = File(...)):
         )
 
 @app.get("/api/model-info")
-async def get_model_info():
-    """Get information about the currently loaded model"""
-    if not current_model:
+async def get_model_info(model_id: Optional[str] = None):
+    """
+    Get information about the currently loaded model, or a named one,
+    and the model version every worker is serving
+    """
+    active = model_registry.active
+    workers = {
+        "this_worker": {
+            "pid": os.getpid(),
+            "serving_version": active.version if active else None,
+            "synced_at": active_model_sync["synced_at"],
+            "sync_error": active_model_sync["error"]
+        },
+        "pointer": active_model_pointer.read(),
+        "workers": active_model_pointer.workers()
+    }
+    
+    try:
+        entry = model_registry.resolve(model_id)
+    except ModelNotFoundError as e:
+        if model_id is not None:
+            raise HTTPException(status_code=404, detail=str(e))
         return {
             "loaded": False,
-            "message": "No model currently loaded"
+            "message": "No model currently loaded",
+            "workers": workers
         }
     
     return {
         "loaded": True,
-        "metadata": model_metadata
+        "metadata": entry.metadata,
+        "workers": workers
+    }
+
+@app.get("/api/models")
+async def list_models():
+    """List every registered model version and the registry memory usage"""
+    return {
+        "models": model_registry.list(),
+        "registry": model_registry.stats()
+    }
+
+@app.post("/api/models/{model_id}/activate")
+async def activate_model(model_id: str):
+    """Serve a registered model by default"""
+    entry = await get_model(model_id)
+    set_active_model(entry.version)
+    
+    return {
+        "message": "Model activated successfully",
+        "metadata": entry.metadata
     }
 
 @app.delete("/api/model")
 async def delete_model():
     """Remove the currently loaded model"""
-    global current_model, model_metadata
+    entry = model_registry.active
     
-    if not current_model:
+    if not entry:
         raise HTTPException(status_code=404, detail="No model loaded")
     
-    current_model = None
-    model_metadata = {}
+    set_active_model(None)
+    model_registry.unload(entry.version)
     
     return {"message": "Model removed successfully"}
 
 @app.post("/api/predict", response_model=PredictionResponse)
-async def predict_single(features: ExoplanetFeatures):
+async def predict_single(features: ExoplanetFeatures, model_id: Optional[str] = None):
     """
     Make a single prediction for exoplanet classification
     
     Args:
         features: Exoplanet features (orbital period, transit duration, etc.)
+        model_id: Registered model to use instead of the active one
         
     Returns:
         Prediction result with confidence scores
     """
-    if not current_model:
-        raise HTTPException(
-            status_code=400,
-            detail="No model loaded. Please upload a model first."
-        )
+    record_validation()
+    entry = await get_model(model_id)
     
     try:
-        # Prepare features for prediction
-        X = prepare_features(features.model_dump())
-        
-        # Make prediction
-        prediction = current_model.predict(X)[0]
-        
-        # Get probability scores if available
-        if hasattr(current_model, 'predict_proba'):
-            probabilities = current_model.predict_proba(X)[0]
-            confidence = float(max(probabilities))
-            proba_dict = {
-                "false_positive": float(probabilities[0]),
-                "confirmed": float(probabilities[1])
-            }
-        else:
-            confidence = 0.85  # Default confidence if probabilities not available
-            proba_dict = {
-                "false_positive": 0.15 if prediction == 1 else 0.85,
-                "confirmed": 0.85 if prediction == 1 else 0.15
-            }
+        feature_values = features.model_dump()
+        cache_key = feature_key(feature_values, entry.version)
+        result = prediction_cache.get(cache_key)
+        if result is not None:
+            return PredictionResponse(**result)
         
-        # Map prediction to label
-        prediction_label = "confirmed" if prediction == 1 else "false-positive"
+        if prediction_coalescer is not None:
+            result = await prediction_coalescer.submit(feature_values, entry.scorer)
+        else:
+            # Prepare features for prediction
+            X = prepare_features(feature_values)
+            scored = await run_in_pool("inference", score_matrix, entry.scorer, X)
+            result = format_predictions(*scored)[0]
         
-        return PredictionResponse(
-            prediction=prediction_label,
-            confidence=confidence,
-            probabilities=proba_dict
-        )
+        prediction_cache.put(cache_key, result)
+        return PredictionResponse(**result)
         
     except Exception as e:
         raise HTTPException(
@@ -217,54 +625,215 @@ async def predict_single(features: ExoplanetFeatures):
             detail=f"Prediction error: {str(e)}"
         )
 
+@app.get("/api/cache-stats")
+async def get_cache_stats():
+    """Get hit and miss counters of the prediction and SHAP result caches"""
+    return {
+        "predictions": prediction_cache.stats(),
+        "shap": shap_cache.stats(),
+        "plots": plot_cache.stats()
+    }
+
+@app.get("/api/coalescer-stats")
+async def get_coalescer_stats():
+    """Get queue-depth and batch-size metrics of the prediction coalescer"""
+    if prediction_coalescer is None:
+        return {"enabled": False}
+    
+    return {"enabled": True, **prediction_coalescer.stats()}
+
+@app.get("/api/startup-stats")
+async def get_startup_stats():
+    """Get import and startup timings and which heavy libraries are loaded"""
+    return startup_report.report()
+
 @app.post("/api/predict-batch")
-async def predict_batch(request: BatchPredictionRequest):
+async def predict_batch(
+    request: BatchPredictionRequest,
+    output: Optional[str] = None,
+    model_id: Optional[str] = None,
+    accept: Optional[str] = Header(None)
+):
     """
     Make batch predictions for multiple exoplanet candidates
     
     Args:
         request: List of exoplanet features
+        output: Result format, 'json', 'columnar', 'arrow' or 'parquet'
+            (negotiated from the Accept header when omitted)
+        model_id: Registered model to use instead of the active one
+        
+    Returns:
+        List of predictions with confidence scores
+    """
+    record_validation()
+    entry = await get_model(model_id)
+    
+    output = resolve_output(output, accept, ["json"] + BULK_FORMATS)
+    
+    try:
+        X = prepare_feature_matrix([features.model_dump() for features in request.data])
+        return await score_batch(entry.scorer, X, output)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Batch prediction error: {str(e)}"
+        )
+
+async def score_batch(scorer, X: np.ndarray, output: str):
+    """Score a feature matrix and encode the results in the requested format"""
+    scored = await run_in_pool("inference", score_matrix, scorer, X)
+    
+    if output in BULK_FORMATS:
+        return await run_in_pool("inference", encode_results, output, *scored)
+    
+    predictions = format_predictions(*scored)
+    
+    return {"predictions": predictions, "count": len(predictions)}
+
+@timed("validation")
+def decode_columnar_batch(body: bytes, dtype: str) -> np.ndarray:
+    """Parse a columnar JSON body and validate it into a feature matrix"""
+    try:
+        columns = loads(body)
+    except ValueError as e:
+        raise ColumnarValidationError([{"loc": ["body"], "msg": f"Invalid JSON: {e}", "type": "json_invalid"}])
+    return feature_matrix_from_columns(columns, dtype)
+
+@app.post(
+    "/api/predict-columnar",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": ColumnarBatchRequest.model_json_schema()}}
+        }
+    }
+)
+async def predict_columnar(
+    request: Request,
+    dtype: str = "float64",
+    output: Optional[str] = None,
+    model_id: Optional[str] = None,
+    accept: Optional[str] = Header(None)
+):
+    """
+    Make batch predictions from a columnar request body
+    
+    The body holds one array per feature. It is decoded straight into a
+    NumPy matrix and checked with vectorized bounds, instead of building one
+    pydantic model per candidate as /api/predict-batch does.
+    
+    Args:
+        request: Columnar body, e.g. {"orbital_period": [...], ...}
+        dtype: Feature matrix precision, 'float64' or 'float32'
+        output: Result format, 'json', 'columnar', 'arrow' or 'parquet'
+            (negotiated from the Accept header when omitted)
+        model_id: Registered model to use instead of the active one
         
     Returns:
         List of predictions with confidence scores
     """
-    if not current_model:
+    entry = await get_model(model_id)
+    
+    if dtype not in FEATURE_DTYPES:
         raise HTTPException(
             status_code=400,
-            detail="No model loaded. Please upload a model first."
+            detail=f"Invalid dtype. Allowed: {', '.join(FEATURE_DTYPES)}"
         )
+    output = resolve_output(output, accept, ["json"] + BULK_FORMATS)
     
+    body = await request.body()
     try:
-        predictions = []
-        
-        for features in request.data:
-            X = prepare_features(features.model_dump())
-            prediction = current_model.predict(X)[0]
-            
-            if hasattr(current_model, 'predict_proba'):
-                probabilities = current_model.predict_proba(X)[0]
-                confidence = float(max(probabilities))
-                proba_dict = {
-                    "false_positive": float(probabilities[0]),
-                    "confirmed": float(probabilities[1])
-                }
-            else:
-                confidence = 0.85
-                proba_dict = {
-                    "false_positive": 0.15 if prediction == 1 else 0.85,
-                    "confirmed": 0.85 if prediction == 1 else 0.15
-                }
-            
-            prediction_label = "confirmed" if prediction == 1 else "false-positive"
-            
-            predictions.append({
-                "prediction": prediction_label,
-                "confidence": confidence,
-                "probabilities": proba_dict
-            })
-        
-        return {"predictions": predictions, "count": len(predictions)}
+        X = await run_in_pool("inference", decode_columnar_batch, body, dtype)
+    except ColumnarValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors)
+    
+    try:
+        return await score_batch(entry.scorer, X, output)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Batch prediction error: {str(e)}"
+        )
+
+def decode_binary_batch(fmt: str, body: bytes, features: Optional[List[str]],
+                        dtype: Optional[str]) -> np.ndarray:
+    """Decode a binary body and validate it into a feature matrix"""
+    X, columns = decode_matrix(fmt, body, features, FEATURE_ORDER)
+    with stage("validation"):
+        return feature_matrix_from_array(X, columns, dtype)
+
+@app.post(
+    "/api/predict-binary",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                media_type: {"schema": {"type": "string", "format": "binary"}}
+                for media_type in ["application/vnd.apache.arrow.stream", "application/vnd.apache.parquet",
+                                   "application/x-npy"]
+            }
+        }
+    }
+)
+async def predict_binary(
+    request: Request,
+    input: Optional[str] = None,
+    features: Optional[str] = None,
+    dtype: Optional[str] = None,
+    output: Optional[str] = None,
+    model_id: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+    content_type: Optional[str] = Header(None)
+):
+    """
+    Make batch predictions from a binary feature matrix
+    
+    The body is wrapped as a NumPy array without parsing text. A .npy matrix
+    in feature order, or an Arrow stream with a single fixed-size list
+    column, is scored without copying the feature values.
+    
+    Args:
+        request: Arrow IPC stream/file, Parquet file or .npy matrix
+        input: Body format, 'arrow', 'parquet' or 'npy' (taken from the
+            Content-Type header when omitted)
+        features: Comma-separated feature name of each matrix column, for
+            .npy bodies and fixed-size list columns (default: model order)
+        dtype: Convert the matrix to 'float64' or 'float32' (default: keep
+            float input as is)
+        output: Result format, 'json', 'columnar', 'arrow' or 'parquet'
+            (negotiated from the Accept header when omitted)
+        model_id: Registered model to use instead of the active one
         
+    Returns:
+        List of predictions with confidence scores
+    """
+    entry = await get_model(model_id)
+    
+    fmt = resolve_input(input, content_type)
+    if dtype is not None and dtype not in FEATURE_DTYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid dtype. Allowed: {', '.join(FEATURE_DTYPES)}"
+        )
+    output = resolve_output(output, accept, ["json"] + BULK_FORMATS)
+    declared = [name.strip() for name in features.split(",")] if features else None
+    
+    body = await request.body()
+    try:
+        X = await run_in_pool("inference", decode_binary_batch, fmt, body, declared, dtype)
+    except ColumnarValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors)
+    
+    try:
+        return await score_batch(entry.scorer, X, output)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -272,21 +841,29 @@ async def predict_batch(request: BatchPredictionRequest):
         )
 
 @app.post("/api/predict-csv")
-async def predict_csv(file: UploadFile = File(...)):
+async def predict_csv(
+    file: UploadFile = File(...),
+    output: Optional[str] = None,
+    chunk_size: int = CSV_CHUNK_ROWS,
+    model_id: Optional[str] = None,
+    accept: Optional[str] = Header(None)
+):
     """
     Make predictions from a CSV file
     
     Args:
         file: CSV file with exoplanet features
+        output: 'json' for a single response, 'ndjson' / 'csv' to stream
+            results chunk by chunk while the upload is still being parsed, or
+            'columnar' / 'arrow' / 'parquet' for bulk columnar results
+            (negotiated from the Accept header when omitted)
+        chunk_size: Rows parsed and scored per chunk when streaming
+        model_id: Registered model to use instead of the active one
         
     Returns:
         Predictions for all rows in the CSV
     """
-    if not current_model:
-        raise HTTPException(
-            status_code=400,
-            detail="No model loaded. Please upload a model first."
-        )
+    entry = await get_model(model_id)
     
     if not file.filename.endswith('.csv'):
         raise HTTPException(
@@ -294,10 +871,15 @@ async def predict_csv(file: UploadFile = File(...)):
             detail="File must be a CSV file"
         )
     
+    output = resolve_output(output, accept, ["json"] + list(STREAM_FORMATS) + BULK_FORMATS)
+    
+    if output in STREAM_FORMATS:
+        return await stream_predict_csv(file, entry, output, chunk_size)
+    
     try:
         # Read CSV file
         contents = await file.read()
-        df = pd.read_csv(pd.io.common.BytesIO(contents))
+        df = await run_in_pool("inference", read_csv, pd.io.common.BytesIO(contents))
         
         # Expected columns
         expected_columns = [
@@ -315,14 +897,23 @@ async def predict_csv(file: UploadFile = File(...)):
         
         # Make predictions
         X = df[expected_columns].values
-        predictions = current_model.predict(X)
+        predictions, confidences, probabilities = await run_in_pool(
+            "inference", score_matrix, entry.scorer, X
+        )
         
-        if hasattr(current_model, 'predict_proba'):
-            probabilities = current_model.predict_proba(X)
-            confidences = np.max(probabilities, axis=1)
-        else:
-            confidences = np.full(len(predictions), 0.85)
-            probabilities = None
+        # Calculate summary statistics
+        summary = {
+            "total": len(predictions),
+            "confirmed": int(np.sum(predictions == 1)),
+            "false_positive": int(np.sum(predictions == 0)),
+            "avg_confidence": float(np.mean(confidences))
+        }
+        
+        if output in BULK_FORMATS:
+            return await run_in_pool(
+                "inference", encode_results, output,
+                predictions, confidences, probabilities, summary
+            )
         
         # Prepare results
         results = []
@@ -335,28 +926,20 @@ async def predict_csv(file: UploadFile = File(...)):
                 "confidence": float(conf)
             }
             
-            if probabilities is not None:
-                result["probabilities"] = {
-                    "false_positive": float(probabilities[i][0]),
-                    "confirmed": float(probabilities[i][1])
-                }
+            result["probabilities"] = {
+                "false_positive": float(probabilities[i][0]),
+                "confirmed": float(probabilities[i][1])
+            }
             
             results.append(result)
         
-        # Calculate summary statistics
-        confirmed_count = int(np.sum(predictions == 1))
-        false_positive_count = int(np.sum(predictions == 0))
-        
         return {
             "predictions": results,
-            "summary": {
-                "total": len(predictions),
-                "confirmed": confirmed_count,
-                "false_positive": false_positive_count,
-                "avg_confidence": float(np.mean(confidences))
-            }
+            "summary": summary
         }
         
+    except HTTPException:
+        raise
     except pd.errors.ParserError:
         raise HTTPException(
             status_code=400,
@@ -368,21 +951,103 @@ async def predict_csv(file: UploadFile = File(...)):
             detail=f"CSV prediction error: {str(e)}"
         )
 
-@app.get("/api/feature-importance")
-async def get_feature_importance():
+async def stream_predict_csv(file: UploadFile, entry: ModelEntry, output: str, chunk_size: int):
+    """Stream chunked CSV predictions as NDJSON or CSV"""
+    if chunk_size < 1:
+        raise HTTPException(status_code=400, detail="chunk_size must be positive")
+    
+    # FastAPI closes form files once the handler returns, before the body is
+    # streamed, so take over the upload's own spool file and leave an empty
+    # buffer behind; the spool is closed when the stream finishes
+    spool = file.file
+    file.file = io.BytesIO()
+    spool.seek(0)
+    
+    try:
+        columns = await run_in_pool("inference", read_csv_columns, spool)
+    except Exception:
+        spool.close()
+        raise HTTPException(status_code=400, detail="Invalid CSV file format")
+    
+    missing_columns = set(FEATURE_ORDER) - set(columns)
+    if missing_columns:
+        spool.close()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Missing required columns: {', '.join(missing_columns)}"
+        )
+    
+    async def body():
+        try:
+            async for chunk in stream_csv_predictions(spool, entry.scorer, output, chunk_size):
+                yield chunk
+        finally:
+            spool.close()
+    
+    return StreamingResponse(body(), media_type=STREAM_FORMATS[output])
+
+async def cached_visualization(name: str, entry: ModelEntry, image: str,
+                               if_none_match: Optional[str], build,
+                               revision: Optional[int] = None) -> Response:
     """
-    Get feature importance from the current model
+    Serve a visualization rendered once per model version
     
+    Args:
+        name: Visualization name
+        entry: Model the visualization is built from
+        image: 'png', 'svg' or 'none' for the numeric data only
+        if_none_match: If-None-Match header value
+        build: Async callable taking the image format (None for no image)
+            and returning the response content
+        revision: Revision of data that changes within a model version
+        
     Returns:
-        Feature importance scores and visualization
+        JSON response with an ETag, or 304 if the client copy is current
     """
-    if not current_model:
+    if image not in PLOT_IMAGES:
         raise HTTPException(
             status_code=400,
-            detail="No model loaded. Please upload a model first."
+            detail=f"Invalid image format. Allowed formats: {', '.join(PLOT_IMAGES)}"
         )
     
-    try:
+    etag = f'"{entry.version}-{name}-{image}"'
+    if revision is not None:
+        etag = f'"{entry.version}-{name}-{image}-{revision}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    
+    if if_none_match:
+        client_tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if etag in client_tags or "*" in client_tags:
+            return Response(status_code=304, headers=headers)
+    
+    body = plot_cache.get(etag)
+    if body is None:
+        content = await build(None if image == "none" else image)
+        with stage("serialization"):
+            body = dumps(content)
+        plot_cache.put(etag, body)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/api/feature-importance")
+async def get_feature_importance(
+    model_id: Optional[str] = None,
+    image: str = "png",
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Get feature importance from the current model
+    
+    Args:
+        model_id: Model version or filename (defaults to the active model)
+        image: Plot format, 'png', 'svg' or 'none' for the scores only
+        
+    Returns:
+        Feature importance scores and visualization
+    """
+    entry = await get_model(model_id)
+    
+    async def build(image_format: Optional[str]):
         feature_names = [
             'Orbital Period',
             'Transit Duration',
@@ -392,7 +1057,7 @@ async def get_feature_importance():
             'KOI Score'
         ]
         
-        importances = calculate_feature_importance(current_model, feature_names)
+        importances = calculate_feature_importance(await get_estimator(entry), feature_names)
         
         if not importances:
             raise HTTPException(
@@ -401,13 +1066,19 @@ async def get_feature_importance():
             )
         
         # Create visualization
-        plot_base64 = create_feature_importance_plot(importances)
+        plot_base64 = None
+        if image_format is not None:
+            plot_base64 = await run_in_pool(
+                "rendering", create_feature_importance_plot, importances, image_format
+            )
         
         return {
             "importances": importances,
             "plot": plot_base64
         }
-        
+    
+    try:
+        return await cached_visualization("feature-importance", entry, image, if_none_match, build)
     except HTTPException:
         raise
     except Exception as e:
@@ -416,89 +1087,152 @@ async def get_feature_importance():
             detail=f"Feature importance error: {str(e)}"
         )
 
-@app.get("/api/confusion-matrix")
-async def get_confusion_matrix():
-    """
-    Generate confusion matrix from prediction history
-    
-    Returns:
-        Confusion matrix visualization
-    """
-    if not current_model:
+async def get_evaluation(entry: ModelEntry, source: str):
+    """Get the evaluation metrics of a model version, 404 without data"""
+    if source not in EVALUATION_SOURCES:
         raise HTTPException(
             status_code=400,
-            detail="No model loaded. Please upload a model first."
+            detail=f"Invalid source. Allowed sources: {', '.join(EVALUATION_SOURCES)}"
         )
     
-    try:
-        # Generate sample data for demonstration
-        # In production, this would use actual test data
-        np.random.seed(42)
-        n_samples = 100
-        
-        # Simulate predictions
-        y_true = np.random.randint(0, 2, n_samples)
-        y_pred = y_true.copy()
-        
-        # Add some errors
-        error_indices = np.random.choice(n_samples, size=15, replace=False)
-        y_pred[error_indices] = 1 - y_pred[error_indices]
+    evaluation = await run_in_pool("inference", evaluation_store.metrics, entry.version, entry.path, source)
+    if evaluation is None:
+        raise HTTPException(
+            status_code=404,
+            detail="No evaluation data for this model. Retrain it or submit feedback first."
+        )
+    return evaluation
+
+@app.get("/api/confusion-matrix")
+async def get_confusion_matrix(
+    model_id: Optional[str] = None,
+    source: str = "all",
+    image: str = "png",
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Get the confusion matrix of a model from its holdout predictions and
+    ground-truth feedback
+    
+    Args:
+        model_id: Model version or filename (defaults to the active model)
+        source: 'holdout', 'feedback' or 'all' for both combined
+        image: Plot format, 'png', 'svg' or 'none' for the counts only
         
+    Returns:
+        Confusion matrix visualization
+    """
+    entry = await get_model(model_id)
+    evaluation = await get_evaluation(entry, source)
+    
+    async def build(image_format: Optional[str]):
         # Create visualization
-        plot_base64 = create_confusion_matrix_plot(y_true, y_pred)
-        
-        # Calculate metrics
-        from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+        plot_base64 = None
+        if image_format is not None:
+            plot_base64 = await run_in_pool(
+                "rendering", create_confusion_matrix_plot, evaluation["confusion_matrix"], image_format
+            )
         
         metrics = {
-            "accuracy": float(accuracy_score(y_true, y_pred)),
-            "precision": float(precision_score(y_true, y_pred)),
-            "recall": float(recall_score(y_true, y_pred)),
-            "f1_score": float(f1_score(y_true, y_pred))
+            "accuracy": evaluation["accuracy"],
+            "precision": evaluation["precision"],
+            "recall": evaluation["recall"],
+            "f1_score": evaluation["f1_score"]
         }
         
         return {
             "plot": plot_base64,
-            "metrics": metrics
+            "matrix": evaluation["confusion_matrix"],
+            "metrics": metrics,
+            "source": source,
+            "samples": evaluation["count"]
         }
-        
+    
+    try:
+        return await cached_visualization(
+            f"confusion-matrix-{source}", entry, image, if_none_match, build,
+            revision=evaluation["revision"]
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Confusion matrix error: {str(e)}"
         )
 
+@app.post("/api/feedback")
+async def submit_feedback(request: FeedbackRequest, model_id: Optional[str] = None):
+    """
+    Report ground truth for candidates scored by a model
+    
+    The candidates are scored again with the model version and the results
+    are added to its running feedback metrics.
+    
+    Args:
+        request: Candidates with their true labels
+        model_id: Model version or filename (defaults to the active model)
+        
+    Returns:
+        Number of recorded rows and the updated feedback metrics
+    """
+    record_validation()
+    entry = await get_model(model_id)
+    
+    try:
+        X = prepare_feature_matrix([item.features.model_dump() for item in request.data])
+        y_true = np.array([item.label for item in request.data], dtype=np.int64)
+        
+        predictions, _, probabilities = await run_in_pool(
+            "inference", score_matrix, entry.scorer, X
+        )
+        await run_in_pool(
+            "inference", evaluation_store.record_feedback,
+            entry.version, y_true, predictions, probabilities[:, 1]
+        )
+        
+        return {
+            "recorded": len(y_true),
+            "model_version": entry.version,
+            "metrics": await run_in_pool("inference", evaluation_store.metrics, entry.version, None, "feedback")
+        }
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Feedback error: {str(e)}"
+        )
+
 @app.post("/api/shap-values")
-async def get_shap_values(features: ExoplanetFeatures):
+async def get_shap_values(
+    features: ExoplanetFeatures,
+    model_id: Optional[str] = None,
+    plot: bool = True
+):
     """
     Calculate SHAP values for explainability
     
     Args:
         features: Exoplanet features to explain
+        model_id: Model version or filename (defaults to the active model)
+        plot: Render the waterfall plot; false returns only the SHAP values
         
     Returns:
         SHAP values and visualization
     """
-    if not current_model:
-        raise HTTPException(
-            status_code=400,
-            detail="No model loaded. Please upload a model first."
-        )
+    record_validation()
+    entry = await get_model(model_id)
     
     try:
-        import shap
-        import matplotlib.pyplot as plt
-        from io import BytesIO
-        import base64
+        feature_values = features.model_dump()
+        cache_key = feature_key(feature_values, entry.version) + ("" if plot else "-values")
+        result = shap_cache.get(cache_key)
+        if result is not None:
+            return result
         
         # Prepare features
-        X = prepare_features(features.model_dump())
+        X = prepare_features(feature_values)
         
-        # Create SHAP explainer
-        explainer = shap.TreeExplainer(current_model)
-        shap_values = explainer.shap_values(X)
-        
-        # Create waterfall plot
         feature_names = [
             'Orbital Period',
             'Transit Duration',
@@ -508,29 +1242,17 @@ async def get_shap_values(features: ExoplanetFeatures):
             'KOI Score'
         ]
         
-        # Generate plot
-        plt.figure(figsize=(10, 6))
-        shap.waterfall_plot(
-            shap.Explanation(
-                values=shap_values[0] if isinstance(shap_values, list) else shap_values[0],
-                base_values=explainer.expected_value[1] if isinstance(explainer.expected_value, list) else explainer.expected_value,
-                data=X[0],
-                feature_names=feature_names
-            ),
-            show=False
-        )
-        
-        # Convert to base64
-        buffer = BytesIO()
-        plt.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-        buffer.seek(0)
-        plot_base64 = f"data:image/png;base64,{base64.b64encode(buffer.read()).decode()}"
-        plt.close()
+        # Explain and optionally create waterfall plot
+        plot_base64, shap_values = await run_in_pool(
+            "rendering", create_shap_explanation, await get_explainer(entry), X, feature_names, plot
+        )
         
-        return {
+        result = {
             "plot": plot_base64,
             "shap_values": shap_values.tolist() if hasattr(shap_values, 'tolist') else shap_values
         }
+        shap_cache.put(cache_key, result)
+        return result
         
     except ImportError:
         raise HTTPException(
@@ -543,151 +1265,614 @@ async def get_shap_values(features: ExoplanetFeatures):
             detail=f"SHAP calculation error: {str(e)}"
         )
 
+async def explain_batch(entry: ModelEntry, X: np.ndarray, output: str) -> Response:
+    """Compute SHAP values for a batch of rows and encode them with aggregates"""
+    background = load_shap_background()
+    # Worker processes read a compiled forest from the array store it is
+    # served from, instead of unpickling the artifact
+    store_path = await run_in_pool("inference", model_registry.array_store, entry)
+    store_path = str(store_path) if store_path is not None else None
+    
+    if process_pool_enabled("explaining"):
+        # The worker processes build their own explainers; only check that
+        # SHAP can explain the model before any work is dispatched
+        explainer = None
+        model = await run_in_pool("inference", model_registry.explainable_model, entry)
+        if not supports_tree_shap(model):
+            raise ValueError(f"SHAP cannot explain a {type(model).__name__} model")
+    else:
+        explainer = await get_explainer(entry)
+    
+    if output == "ndjson":
+        # Rows are sent chunk by chunk as the workers finish them, with the
+        # batch aggregates as the final record
+        async def body():
+            chunks = explain_chunks(X, entry, explainer, background, store_path)
+            abs_sum = np.zeros(len(FEATURE_ORDER))
+            base_value = 0.0
+            started = time.perf_counter()
+            try:
+                async for start, values, base_value in chunks:
+                    abs_sum += np.abs(values).sum(axis=0, dtype=np.float64)
+                    yield await run_in_pool("rendering", encode_shap_rows, values, FEATURE_ORDER, start + 1)
+            except Exception as e:
+                yield encode_record({"error": f"SHAP calculation error: {str(e)}"}, output)
+                return
+            finally:
+                await chunks.aclose()
+            observe_stage("shap", time.perf_counter() - started)
+            yield encode_record({"summary": summarize_abs_shap(abs_sum, len(X), base_value, FEATURE_ORDER)}, output)
+        
+        return StreamingResponse(body(), media_type=MEDIA_TYPES["ndjson"][0])
+    
+    values, base_value = await explain_matrix(
+        X, entry, explainer=explainer, background=background, store_path=store_path
+    )
+    summary = shap_summary(values, base_value, FEATURE_ORDER)
+    return await run_in_pool("rendering", encode_shap_values, output, values, FEATURE_ORDER, summary)
+
+@app.post("/api/shap-batch")
+async def get_shap_batch(
+    request: BatchPredictionRequest,
+    output: Optional[str] = None,
+    model_id: Optional[str] = None,
+    accept: Optional[str] = Header(None)
+):
+    """
+    Calculate SHAP values for a batch of candidates
+    
+    Args:
+        request: List of exoplanet features
+        output: 'json', 'npy' (float32 matrix) or 'parquet'
+            (negotiated from the Accept header when omitted)
+        model_id: Model version or filename (defaults to the active model)
+        
+    Returns:
+        Confirmed-class SHAP values per row and feature, with the per-feature
+        mean |SHAP| of the batch
+    """
+    record_validation()
+    entry = await get_model(model_id)
+    output = resolve_output(output, accept, SHAP_FORMATS)
+    
+    try:
+        X = prepare_feature_matrix([features.model_dump() for features in request.data])
+        return await explain_batch(entry, X, output)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"SHAP calculation error: {str(e)}"
+        )
+
+@app.post("/api/shap-csv")
+async def get_shap_csv(
+    file: UploadFile = File(...),
+    output: Optional[str] = None,
+    model_id: Optional[str] = None,
+    accept: Optional[str] = Header(None)
+):
+    """
+    Calculate SHAP values for every candidate in a CSV file
+    
+    Args:
+        file: CSV file with exoplanet features
+        output: 'json', 'npy' (float32 matrix) or 'parquet'
+            (negotiated from the Accept header when omitted)
+        model_id: Model version or filename (defaults to the active model)
+        
+    Returns:
+        Confirmed-class SHAP values per row and feature, with the per-feature
+        mean |SHAP| of the batch
+    """
+    entry = await get_model(model_id)
+    
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(
+            status_code=400,
+            detail="File must be a CSV file"
+        )
+    
+    output = resolve_output(output, accept, SHAP_FORMATS)
+    
+    try:
+        columns = await run_in_pool("inference", read_csv_columns, file.file)
+        missing_columns = set(FEATURE_ORDER) - set(columns)
+        if missing_columns:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Missing required columns: {', '.join(missing_columns)}"
+            )
+        
+        df = await run_in_pool("inference", read_csv, file.file, usecols=FEATURE_ORDER)
+        X = np.ascontiguousarray(df[FEATURE_ORDER].to_numpy(dtype=np.float64))
+        return await explain_batch(entry, X, output)
+    except HTTPException:
+        raise
+    except pd.errors.ParserError:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid CSV file format"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"SHAP calculation error: {str(e)}"
+        )
+
 @app.get("/api/model-stats")
-async def get_model_stats():
+async def get_model_stats(model_id: Optional[str] = None, source: str = "all"):
     """
     Get model statistics and performance metrics
     
+    Args:
+        model_id: Model version or filename (defaults to the active model)
+        source: 'holdout', 'feedback' or 'all' for both combined
+        
     Returns:
         Model statistics including accuracy, predictions count, etc.
     """
-    if not current_model:
+    try:
+        entry = model_registry.resolve(model_id)
+    except ModelNotFoundError:
         return {
             "loaded": False,
             "stats": None
         }
     
-    # Generate sample statistics
-    # In production, these would be calculated from actual data
+    try:
+        evaluation = await get_evaluation(entry, source)
+    except HTTPException as e:
+        if e.status_code != 404:
+            raise
+        return {
+            "loaded": True,
+            "stats": None,
+            "metadata": entry.metadata
+        }
+    
+    # Rows are actual classes, columns predicted classes
+    (tn, fp), (fn, tp) = evaluation["confusion_matrix"]
     stats = {
-        "accuracy": 0.94,
-        "precision": 0.92,
-        "recall": 0.96,
-        "f1_score": 0.94,
-        "total_predictions": 1247,
-        "confirmed_count": 856,
-        "false_positive_count": 391
+        "accuracy": evaluation["accuracy"],
+        "precision": evaluation["precision"],
+        "recall": evaluation["recall"],
+        "f1_score": evaluation["f1_score"],
+        "total_predictions": evaluation["count"],
+        "confirmed_count": fp + tp,
+        "false_positive_count": tn + fn,
+        "brier_score": evaluation["brier_score"],
+        "expected_calibration_error": evaluation["expected_calibration_error"],
+        "calibration": evaluation["calibration"],
+        "source": source
     }
     
     return {
         "loaded": True,
         "stats": stats,
-        "metadata": model_metadata
+        "metadata": entry.metadata
     }
 
-@app.post("/api/retrain")
+# Online model learning from streamed labeled rows
+ONLINE_BATCH_ROWS = int(os.getenv("EXOVISION_ONLINE_BATCH_ROWS", "1000"))
+
+online_store = OnlineModelStore(MODEL_DIR / "online" / "state.json", FEATURE_ORDER)
+
+def learn_online_batch(rows: List[dict], first_line: int) -> int:
+    """
+    Validate a batch of labeled NDJSON rows and update the online model
+    
+    Args:
+        rows: Decoded rows with the model features and a 'label'
+        first_line: Line number of the first row, for error locations
+        
+    Returns:
+        Online model revision after the update
+    """
+    with stage("validation"):
+        missing = [
+            {"loc": ["body", first_line + i, name], "msg": "Field required", "type": "missing"}
+            for i, row in enumerate(rows) for name in FEATURE_ORDER + ["label"]
+            if not isinstance(row, dict) or name not in row
+        ]
+        if missing:
+            raise ColumnarValidationError(missing[:MAX_COLUMNAR_ERRORS])
+        try:
+            X = feature_matrix_from_columns(
+                {name: [row.get(name) for row in rows] for name in FEATURE_ORDER}
+            )
+        except ColumnarValidationError as e:
+            # Errors are reported per line: ["body", line, feature]
+            raise ColumnarValidationError([
+                {**error, "loc": ["body", first_line + error["loc"][2], error["loc"][1]]}
+                for error in e.errors
+            ])
+        y = np.array([row.get("label") for row in rows], dtype=object)
+        bad_labels = [i for i, label in enumerate(y.tolist()) if label not in (0, 1) or isinstance(label, bool)]
+        if bad_labels:
+            raise ColumnarValidationError([
+                {"loc": ["body", first_line + i, "label"], "msg": "Input should be 0 or 1", "type": "literal_error"}
+                for i in bad_labels[:MAX_COLUMNAR_ERRORS]
+            ])
+    return online_store.partial_fit(X, y.astype(np.int64))["revision"]
+
+@app.post(
+    "/api/online/ingest",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/x-ndjson": {"schema": {"type": "string"}}}
+        }
+    }
+)
+async def ingest_online(request: Request):
+    """
+    Stream labeled candidates into the online model
+    
+    The body is NDJSON, one object per line with the six model features and
+    a 'label' (1 = confirmed, 0 = false positive). Rows are learned in
+    batches as they arrive; each batch is first scored by the current model
+    for the prequential metrics. If a batch is invalid, ingestion stops
+    there and the earlier batches stay learned.
+    
+    Returns:
+        Rows learned and the online model revision
+    """
+    rows: List[dict] = []
+    first_line = 1
+    learned = 0
+    revision = None
+    line_number = 0
+    pending = b""
+    
+    async def flush():
+        nonlocal rows, first_line, learned, revision
+        if rows:
+            try:
+                revision = await run_in_pool("training", learn_online_batch, rows, first_line)
+            except ColumnarValidationError as e:
+                raise HTTPException(status_code=422, detail={"ingested_rows": learned, "errors": e.errors})
+            learned += len(rows)
+            rows = []
+        first_line = line_number + 1
+    
+    async for chunk in request.stream():
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if not line.strip():
+                continue
+            line_number += 1
+            try:
+                rows.append(loads(line))
+            except ValueError as e:
+                await flush()
+                raise HTTPException(status_code=422, detail={
+                    "ingested_rows": learned,
+                    "errors": [{"loc": ["body", line_number], "msg": f"Invalid JSON: {e}", "type": "json_invalid"}]
+                })
+            if len(rows) >= ONLINE_BATCH_ROWS:
+                await flush()
+    
+    if pending.strip():
+        line_number += 1
+        try:
+            rows.append(loads(pending))
+        except ValueError as e:
+            await flush()
+            raise HTTPException(status_code=422, detail={
+                "ingested_rows": learned,
+                "errors": [{"loc": ["body", line_number], "msg": f"Invalid JSON: {e}", "type": "json_invalid"}]
+            })
+    await flush()
+    
+    return {"message": "Rows learned", "rows": learned, "revision": revision}
+
+@app.get("/api/online/model")
+async def get_online_model():
+    """
+    Get the state of the online model
+    
+    Returns:
+        Revision, whether it can score yet, per-class counts, feature means
+        and standard deviations, and prequential (test-then-train) metrics
+    """
+    return await run_in_pool("inference", online_store.status)
+
+@app.post("/api/online/predict")
+async def predict_online(
+    request: BatchPredictionRequest,
+    output: Optional[str] = None,
+    accept: Optional[str] = Header(None)
+):
+    """
+    Make batch predictions with the online model
+    
+    Args:
+        request: List of exoplanet features
+        output: Result format, 'json', 'columnar', 'arrow' or 'parquet'
+            (negotiated from the Accept header when omitted)
+        
+    Returns:
+        List of predictions with confidence scores
+    """
+    record_validation()
+    output = resolve_output(output, accept, ["json"] + BULK_FORMATS)
+    
+    model = await run_in_pool("inference", online_store.model)
+    if not model.ready():
+        raise HTTPException(
+            status_code=409,
+            detail="The online model has not seen both classes yet"
+        )
+    
+    try:
+        X = prepare_feature_matrix([features.model_dump() for features in request.data])
+        return await score_batch(model, X, output)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Batch prediction error: {str(e)}"
+        )
+
+@app.post("/api/online/publish")
+async def publish_online_model(activate: bool = False):
+    """
+    Save the current online model as a registered model artifact
+    
+    The snapshot can then be used with ?model_id= on every prediction
+    endpoint, next to the forest, or activated.
+    
+    Args:
+        activate: Serve the snapshot by default
+        
+    Returns:
+        Metadata of the registered snapshot
+    """
+    model = await run_in_pool("inference", online_store.model)
+    if not model.ready():
+        raise HTTPException(
+            status_code=409,
+            detail="The online model has not seen both classes yet"
+        )
+    
+    model_path = MODEL_DIR / f"online_model_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.joblib"
+    tmp_path = model_path.with_suffix(".tmp")
+    
+    def save():
+        joblib.dump(model, tmp_path)
+        os.replace(tmp_path, model_path)
+    
+    await run_in_pool("training", save)
+    entry = await run_in_pool(
+        "training", model_registry.register, model_path, "sklearn",
+        model_family="online_gaussian_nb",
+        online_rows=int(model.class_count_.sum())
+    )
+    
+    if activate:
+        set_active_model(entry.version)
+    
+    return {"message": "Online model published", "model_info": entry.metadata}
+
+# Background retraining jobs; each runs in its own process
+MAX_TRAINING_JOBS = int(os.getenv("EXOVISION_MAX_TRAINING_JOBS", "1"))
+JOB_POLL_SECONDS = float(os.getenv("EXOVISION_JOB_POLL_SECONDS", "0.5"))
+
+# Hyperparameter search of 'tuned' retraining jobs
+TUNE_SECONDS = float(os.getenv("EXOVISION_TUNE_SECONDS", "120"))
+TUNE_WORKERS = int(os.getenv("EXOVISION_TUNE_WORKERS", str(os.cpu_count() or 1)))
+
+async def install_trained_model(status: dict, job_dir: Path) -> dict:
+    """
+    Move a finished job's model into the model directory and register it
+    
+    The artifact only appears under MODEL_DIR through an atomic rename once
+    training has succeeded, so no worker ever sees a partial model.
+    
+    Args:
+        status: Job status
+        job_dir: Job directory holding the model and holdout predictions
+        
+    Returns:
+        Status fields with the new model's metadata
+    """
+    model_filename = f"retrained_model_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{status['id'][:8]}.joblib"
+    model_path = MODEL_DIR / model_filename
+    os.replace(job_dir / MODEL_FILE, model_path)
+    
+    params = status["params"]
+    entry = await run_in_pool(
+        "training", model_registry.register, model_path, INFERENCE_ENGINE,
+        trained=True,
+        training_mode=params["mode"],
+        base_version=params.get("base_version"),
+        tree_provenance=status.get("tree_provenance"),
+        hyperparameters=status.get("hyperparameters"),
+        tuning=status.get("tuning")
+    )
+    with np.load(job_dir / HOLDOUT_FILE) as holdout:
+        await run_in_pool(
+            "training", evaluation_store.record_holdout, entry.version, model_path,
+            holdout["y_true"], holdout["y_pred"], holdout["p_confirmed"]
+        )
+    
+    # Update current model
+    if params["activate"]:
+        set_active_model(entry.version)
+    
+    return {"model_info": entry.metadata}
+
+training_jobs = TrainingJobs(
+    JobStore(MODEL_DIR / "jobs"),
+    install_trained_model,
+    max_concurrent=MAX_TRAINING_JOBS,
+    poll_seconds=JOB_POLL_SECONDS
+)
+
+def get_job(job_id: str) -> dict:
+    """Status of a retraining job, or 404"""
+    try:
+        status = training_jobs.store.read(job_id)
+    except ValueError:
+        status = None
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Training job not found: {job_id}")
+    return status
+
+TRAINING_MODES = ["full", "incremental", "tuned"]
+
+@app.post("/api/retrain", status_code=202)
 async def retrain_model(
     file: UploadFile = File(...),
     test_size: float = 0.2,
-    random_state: int = 42
+    random_state: int = 42,
+    activate: bool = True,
+    mode: str = "full",
+    model_id: Optional[str] = None,
+    new_trees: int = 20,
+    max_trees: Optional[int] = None,
+    tune_seconds: Optional[float] = None
 ):
     """
-    Retrain the model with new data
+    Start retraining the model with new data
+    
+    Training runs in a background process; poll the returned status URL
+    for its progress.
     
     Args:
         file: CSV file with training data (must include 'label' column)
         test_size: Proportion of data to use for testing
         random_state: Random seed for reproducibility
+        activate: Serve the retrained model by default once training succeeds
+        mode: 'full' to fit a new forest, 'incremental' to grow trees on
+            the uploaded rows only and add them to an existing forest, or
+            'tuned' to search forest and boosting hyperparameters first
+        model_id: Forest to grow in incremental mode (default: active model)
+        new_trees: Trees added in incremental mode
+        max_trees: Oldest trees are retired beyond this ensemble size in
+            incremental mode (default: no limit)
+        tune_seconds: Wall-clock budget of the search in tuned mode
+            (default: EXOVISION_TUNE_SECONDS)
         
     Returns:
-        Training results and updated model metrics
+        Job id, initial status and status URL
     """
-    global current_model, model_metadata
-    
+
     if not file.filename.endswith('.csv'):
         raise HTTPException(
             status_code=400,
             detail="Training data must be a CSV file"
         )
-    
-    try:
-        # Read training data
-        contents = await file.read()
-        df = pd.read_csv(pd.io.common.BytesIO(contents))
-        
-        # Expected columns
-        feature_columns = [
-            'orbital_period', 'transit_duration', 'transit_depth',
-            'planet_radius', 'signal_to_noise', 'koi_score'
-        ]
-        
-        # Check for required columns
-        required_columns = feature_columns + ['label']
-        missing_columns = set(required_columns) - set(df.columns)
-        if missing_columns:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Missing required columns: {', '.join(missing_columns)}"
-            )
-        
-        # Prepare data
-        X = df[feature_columns].values
-        y = df['label'].values
-        
-        # Split data
-        from sklearn.model_selection import train_test_split
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=test_size, random_state=random_state
-        )
-        
-        # Train a new Random Forest model
-        from sklearn.ensemble import RandomForestClassifier
-        from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
-        
-        new_model = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=10,
-            random_state=random_state,
-            n_jobs=-1
+    if not 0 < test_size < 1:
+        raise HTTPException(
+            status_code=400,
+            detail="test_size must be between 0 and 1"
         )
-        
-        # Train the model
-        new_model.fit(X_train, y_train)
-        
-        # Evaluate on test set
-        y_pred = new_model.predict(X_test)
-        
-        metrics = {
-            "accuracy": float(accuracy_score(y_test, y_pred)),
-            "precision": float(precision_score(y_test, y_pred)),
-            "recall": float(recall_score(y_test, y_pred)),
-            "f1_score": float(f1_score(y_test, y_pred)),
-            "train_samples": len(X_train),
-            "test_samples": len(X_test)
-        }
-        
-        # Save the new model
-        model_filename = f"retrained_model_{datetime.now().strftime('%Y%m%d_%H%M%S')}.joblib"
-        model_path = MODEL_DIR / model_filename
-        joblib.dump(new_model, model_path)
-        
-        # Update current model
-        current_model = new_model
-        model_metadata = {
-            "filename": model_filename,
-            "size": os.path.getsize(model_path),
-            "uploaded_at": datetime.now().isoformat(),
-            "format": ".joblib",
-            "type": "RandomForestClassifier",
-            "trained": True
-        }
-        
-        return {
-            "message": "Model retrained successfully",
-            "metrics": metrics,
-            "model_info": model_metadata
-        }
-        
-    except pd.errors.ParserError:
+    if mode not in TRAINING_MODES:
         raise HTTPException(
             status_code=400,
-            detail="Invalid CSV file format"
+            detail=f"Invalid mode. Allowed: {', '.join(TRAINING_MODES)}"
         )
-    except Exception as e:
+    
+    params = {
+        "filename": file.filename,
+        "mode": mode,
+        "test_size": test_size,
+        "random_state": random_state,
+        "activate": activate
+    }
+    
+    if mode == "incremental":
+        if new_trees < 1:
+            raise HTTPException(status_code=400, detail="new_trees must be positive")
+        if max_trees is not None and max_trees < new_trees:
+            raise HTTPException(status_code=400, detail="max_trees must be at least new_trees")
+        try:
+            base = model_registry.resolve(model_id)
+        except ModelNotFoundError as e:
+            if model_id is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail="No model loaded. Please upload a model first."
+                )
+            raise HTTPException(status_code=404, detail=str(e))
+        params.update({
+            "base_version": base.version,
+            "base_model_path": str(base.path.resolve()),
+            "new_trees": new_trees,
+            "max_trees": max_trees
+        })
+    
+    if mode == "tuned":
+        tune_seconds = TUNE_SECONDS if tune_seconds is None else tune_seconds
+        if tune_seconds <= 0:
+            raise HTTPException(status_code=400, detail="tune_seconds must be positive")
+        params.update({"tune_seconds": tune_seconds, "tune_workers": TUNE_WORKERS})
+    
+    data_path = UPLOAD_DIR / f"retrain_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.csv"
+    await run_in_pool("training", save_upload, file.file, data_path)
+    
+    status = training_jobs.submit(data_path, FEATURE_ORDER, params)
+    
+    return {
+        "message": "Retraining job submitted",
+        "job_id": status["id"],
+        "status_url": f"/api/retrain/jobs/{status['id']}",
+        "job": status
+    }
+
+@app.get("/api/retrain/jobs")
+async def list_training_jobs():
+    """
+    List retraining jobs
+    
+    Returns:
+        Status of every job, newest first
+    """
+    jobs = await run_in_pool("training", training_jobs.store.list)
+    return {"jobs": jobs, "count": len(jobs), "max_concurrent": MAX_TRAINING_JOBS}
+
+@app.get("/api/retrain/jobs/{job_id}")
+async def get_training_job(job_id: str):
+    """
+    Get a retraining job's status
+    
+    Args:
+        job_id: Job id returned by /api/retrain
+        
+    Returns:
+        State ('queued', 'running', 'succeeded', 'failed' or 'cancelled'),
+        current stage, per-stage timings, progress, and once finished the
+        holdout metrics and new model info or the error
+    """
+    return get_job(job_id)
+
+@app.post("/api/retrain/jobs/{job_id}/cancel", status_code=202)
+async def cancel_training_job(job_id: str):
+    """
+    Cancel a queued or running retraining job
+    
+    The job's process is stopped and no model is installed.
+    
+    Args:
+        job_id: Job id returned by /api/retrain
+        
+    Returns:
+        Job status at the time of the request
+    """
+    status = get_job(job_id)
+    if status["state"] in FINISHED_STATES:
         raise HTTPException(
-            status_code=500,
-            detail=f"Retraining error: {str(e)}"
+            status_code=409,
+            detail=f"Training job already {status['state']}"
         )
+    
+    training_jobs.cancel(job_id)
+    return {"message": "Cancellation requested", "job": status}
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,5 +1,8 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
+import numpy as np
+
+from utils import FEATURE_ORDER
 
 class ExoplanetFeatures(BaseModel):
     """Input features for exoplanet classification"""
@@ -32,6 +35,217 @@ class BatchPredictionRequest(BaseModel):
     """Request model for batch predictions"""
     data: List[ExoplanetFeatures]
 
+class FeedbackItem(BaseModel):
+    """A scored candidate with its ground-truth label"""
+    features: ExoplanetFeatures
+    label: int = Field(..., description="True class: 1 = confirmed, 0 = false positive", ge=0, le=1)
+
+class FeedbackRequest(BaseModel):
+    """Request model for ground-truth feedback"""
+    data: List[FeedbackItem]
+
+class ColumnarBatchRequest(BaseModel):
+    """
+    Columnar batch request: one array per feature, all of the same length
+    
+    Documents the body of /api/predict-columnar. The endpoint does not
+    validate it with pydantic; it decodes the arrays straight into a NumPy
+    matrix with feature_matrix_from_columns.
+    """
+    orbital_period: List[float]
+    transit_duration: List[float]
+    transit_depth: List[float]
+    planet_radius: List[float]
+    signal_to_noise: List[float]
+    koi_score: List[float]
+
+FEATURE_DTYPES = {
+    "float64": np.float64,
+    "float32": np.float32
+}
+
+# Vectorized check, message and error type of each pydantic bound
+BOUND_CHECKS = {
+    "gt": (np.greater, "greater than", "greater_than"),
+    "ge": (np.greater_equal, "greater than or equal to", "greater_than_equal"),
+    "lt": (np.less, "less than", "less_than"),
+    "le": (np.less_equal, "less than or equal to", "less_than_equal")
+}
+
+# Errors listed per rejected columnar request
+MAX_COLUMNAR_ERRORS = 20
+
+class ColumnarValidationError(ValueError):
+    """Columnar batch rejected; ``errors`` are in FastAPI's 422 detail format"""
+    
+    def __init__(self, errors: List[Dict[str, Any]]):
+        super().__init__(errors[0]["msg"])
+        self.errors = errors
+
+def _feature_bounds(name: str) -> List[tuple]:
+    """(operator, bound) constraints declared on an ExoplanetFeatures field"""
+    bounds = []
+    for constraint in ExoplanetFeatures.model_fields[name].metadata:
+        for operator in BOUND_CHECKS:
+            bound = getattr(constraint, operator, None)
+            if bound is not None:
+                bounds.append((operator, bound))
+    return bounds
+
+FEATURE_BOUNDS = {name: _feature_bounds(name) for name in FEATURE_ORDER}
+
+def _bound_errors(loc: List[Any], column: np.ndarray, name: str,
+                  values: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Errors for the values of a feature column that are not finite or outside its declared bounds
+    
+    Each rejected value yields one error, as it does in pydantic: null is
+    not a number, NaN and infinity are not finite, and only finite values
+    are compared with the bounds. ``values`` are the column's decoded JSON
+    values, which tell null apart from NaN; binary matrices have none.
+    """
+    errors = []
+    # null parses as NaN; non-finite values are not valid JSON and are reported as null
+    reported = ~np.isfinite(column)
+    for i in np.flatnonzero(reported)[:MAX_COLUMNAR_ERRORS].tolist():
+        if values is not None and values[i] is None:
+            errors.append({"loc": loc + [i], "msg": "Input should be a valid number", "type": "float_type", "input": None})
+        else:
+            errors.append({"loc": loc + [i], "msg": "Input should be a finite number", "type": "finite_number", "input": None})
+    
+    for operator, bound in FEATURE_BOUNDS[name]:
+        check, message, error_type = BOUND_CHECKS[operator]
+        failed = ~reported & ~check(column, bound)
+        reported |= failed
+        for i in np.flatnonzero(failed)[:MAX_COLUMNAR_ERRORS].tolist():
+            errors.append({
+                "loc": loc + [i],
+                "msg": f"Input should be {message} {bound}",
+                "type": error_type,
+                "input": float(column[i])
+            })
+    errors.sort(key=lambda error: error["loc"][-1])
+    return errors
+
+def feature_matrix_from_columns(columns: Any, dtype: str = "float64") -> np.ndarray:
+    """
+    Decode a columnar batch into a feature matrix
+    
+    Enforces the same constraints as ExoplanetFeatures with one vectorized
+    comparison per feature instead of one pydantic model per row.
+    
+    Args:
+        columns: Decoded JSON body, mapping each feature to an array
+        dtype: 'float64' or 'float32'
+        
+    Returns:
+        C-contiguous (n_rows, n_features) matrix in FEATURE_ORDER
+        
+    Raises:
+        ColumnarValidationError: If a feature is missing, not numeric,
+            of a different length or out of bounds
+    """
+    if not isinstance(columns, dict):
+        raise ColumnarValidationError([{
+            "loc": ["body"], "msg": "Input should be an object with one array per feature", "type": "dict_type"
+        }])
+    
+    missing = [name for name in FEATURE_ORDER if name not in columns]
+    if missing:
+        raise ColumnarValidationError([
+            {"loc": ["body", name], "msg": "Field required", "type": "missing"} for name in missing
+        ])
+    
+    n_rows = len(columns[FEATURE_ORDER[0]]) if isinstance(columns[FEATURE_ORDER[0]], list) else 0
+    X = np.empty((n_rows, len(FEATURE_ORDER)), dtype=FEATURE_DTYPES[dtype])
+    errors = []
+    
+    for j, name in enumerate(FEATURE_ORDER):
+        values = columns[name]
+        if not isinstance(values, list):
+            errors.append({"loc": ["body", name], "msg": "Input should be a valid list", "type": "list_type"})
+            continue
+        if len(values) != n_rows:
+            errors.append({
+                "loc": ["body", name],
+                "msg": f"List should have {n_rows} items like {FEATURE_ORDER[0]}, not {len(values)}",
+                "type": "length_mismatch"
+            })
+            continue
+        
+        try:
+            column = np.asarray(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            errors.append({"loc": ["body", name], "msg": "Input should be a list of numbers", "type": "float_type"})
+            continue
+        if column.ndim != 1:
+            errors.append({"loc": ["body", name], "msg": "Input should be a list of numbers", "type": "float_type"})
+            continue
+        
+        errors.extend(_bound_errors(["body", name], column, name, values))
+        X[:, j] = column
+    
+    if errors:
+        raise ColumnarValidationError(errors[:MAX_COLUMNAR_ERRORS])
+    
+    return X
+
+def feature_matrix_from_array(X: np.ndarray, features: List[str], dtype: Optional[str] = None) -> np.ndarray:
+    """
+    Validate a decoded binary feature matrix
+    
+    The matrix is returned as is, without a copy, when its columns are
+    already in FEATURE_ORDER and of the requested dtype. Otherwise the
+    columns are reordered and cast in one pass.
+    
+    Args:
+        X: (n_rows, n_columns) numeric matrix
+        features: Feature name of each column of X
+        dtype: 'float64' or 'float32', or None to keep a float input's dtype
+        
+    Returns:
+        (n_rows, n_features) matrix in FEATURE_ORDER
+        
+    Raises:
+        ColumnarValidationError: If the matrix is not numeric and 2-D, a
+            feature is missing or a value is not finite or out of bounds
+    """
+    if X.ndim != 2 or X.dtype.kind not in "fiu":
+        raise ColumnarValidationError([{
+            "loc": ["body"], "msg": "Input should be a 2-D numeric matrix", "type": "matrix_type"
+        }])
+    if len(features) != X.shape[1]:
+        raise ColumnarValidationError([{
+            "loc": ["features"],
+            "msg": f"{len(features)} feature names declared for a matrix with {X.shape[1]} columns",
+            "type": "length_mismatch"
+        }])
+    
+    missing = [name for name in FEATURE_ORDER if name not in features]
+    if missing:
+        raise ColumnarValidationError([
+            {"loc": ["body", name], "msg": "Field required", "type": "missing"} for name in missing
+        ])
+    
+    if dtype is not None:
+        target = np.dtype(FEATURE_DTYPES[dtype])
+    else:
+        target = X.dtype if X.dtype in (np.float32, np.float64) else np.dtype(np.float64)
+    
+    columns = [features.index(name) for name in FEATURE_ORDER]
+    if columns != list(range(X.shape[1])):
+        X = np.take(X, columns, axis=1).astype(target, copy=False)
+    elif X.dtype != target:
+        X = X.astype(target)
+    
+    errors = []
+    for j, name in enumerate(FEATURE_ORDER):
+        errors.extend(_bound_errors(["body", name], X[:, j], name))
+    if errors:
+        raise ColumnarValidationError(errors[:MAX_COLUMNAR_ERRORS])
+    
+    return X
+
 class ModelMetadata(BaseModel):
     """Model metadata information"""
     filename: str
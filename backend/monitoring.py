@@ -0,0 +1,214 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Histogram upper bounds in seconds, from sub-millisecond cache hits up to
+# multi-second CSV and SHAP batches
+LATENCY_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+# Stages timed inside request handling
+STAGES = [
+    "csv_parse",         # pandas CSV parsing
+    "validation",        # request body parsing and pydantic validation
+    "prepare_features",  # feature dictionaries to the model's input matrix
+    "inference",         # model scoring
+    "serialization",     # response encoding (JSON, CSV, Arrow, Parquet, npy)
+    "rendering",         # matplotlib/seaborn plots
+    "shap",              # SHAP values and waterfall plots
+]
+
+# Start time of the request being handled, set by the HTTP middleware
+request_started: ContextVar[Optional[float]] = ContextVar("request_started", default=None)
+
+# (stage, seconds) timings of the request being handled, for Server-Timing;
+# run_in_pool carries the context into the thread pools
+request_stages: ContextVar[Optional[list]] = ContextVar("request_stages", default=None)
+
+class Histogram:
+    """Cumulative latency histogram per label set, in the Prometheus model"""
+
+    def __init__(self, buckets: List[float] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], seconds: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Bucket counts, then +Inf count and sum
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += seconds
+
+    def items(self) -> List[Tuple[Tuple[str, ...], List[float]]]:
+        with self._lock:
+            return [(labels, list(series)) for labels, series in self._series.items()]
+
+class Counter:
+    """Monotonic counter per label set"""
+
+    def __init__(self):
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def items(self) -> List[Tuple[Tuple[str, ...], float]]:
+        with self._lock:
+            return list(self._values.items())
+
+requests_total = Counter()
+request_errors_total = Counter()
+request_duration = Histogram()
+stage_duration = Histogram()
+
+def observe_request(endpoint: str, method: str, status: int, seconds: float):
+    """Record a finished HTTP request"""
+    requests_total.inc((endpoint, method, str(status)))
+    if status >= 500:
+        request_errors_total.inc((endpoint, method))
+    request_duration.observe((endpoint, method), seconds)
+
+def observe_stage(stage: str, seconds: float):
+    """Record the duration of one request stage"""
+    stage_duration.observe((stage,), seconds)
+    stages = request_stages.get()
+    if stages is not None:
+        stages.append((stage, seconds))
+
+@contextmanager
+def stage(name: str):
+    """Time a block of code as a request stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - start)
+
+def timed(name: str) -> Callable:
+    """Decorator timing every call of a function as a request stage"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_validation():
+    """
+    Record the time from the start of the request to the handler body,
+    i.e. reading, parsing and validating the request
+
+    Called first thing in handlers taking a pydantic request body.
+    """
+    started = request_started.get()
+    if started is not None:
+        observe_stage("validation", time.perf_counter() - started)
+
+def server_timing(stages: List[Tuple[str, float]], total_seconds: float) -> str:
+    """
+    Build a Server-Timing header value
+
+    Args:
+        stages: (stage, seconds) timings recorded during the request
+        total_seconds: Time until the response started
+
+    Returns:
+        Header value with the summed duration and call count per stage
+    """
+    totals: Dict[str, List[float]] = {}
+    for name, seconds in stages:
+        total = totals.setdefault(name, [0.0, 0])
+        total[0] += seconds
+        total[1] += 1
+
+    metrics = [
+        f'{name};dur={seconds * 1000:.3f};desc="{int(count)} call{"s" if count != 1 else ""}"'
+        for name, (seconds, count) in sorted(totals.items(), key=lambda item: STAGES.index(item[0]))
+    ]
+    metrics.append(f"total;dur={total_seconds * 1000:.3f}")
+    return ", ".join(metrics)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _render_histogram(lines: List[str], name: str, help_text: str,
+                      label_names: List[str], histogram: Histogram):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, series in sorted(histogram.items()):
+        bounds = [str(bound) for bound in histogram.buckets] + ["+Inf"]
+        for bound, count in zip(bounds, series):
+            le = f'le="{bound}"'
+            lines.append(f"{name}_bucket{_labels(label_names, labels, le)} {count}")
+        lines.append(f"{name}_count{_labels(label_names, labels)} {series[-2]}")
+        lines.append(f"{name}_sum{_labels(label_names, labels)} {series[-1]}")
+
+def _render_samples(lines: List[str], name: str, kind: str, help_text: str,
+                    label_names: List[str], samples: Iterable[Tuple[Tuple[str, ...], float]]):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in sorted(samples):
+        lines.append(f"{name}{_labels(label_names, labels)} {value}")
+
+def render_metrics(models: List[dict], caches: Dict[str, dict]) -> str:
+    """
+    Render all metrics in the Prometheus text exposition format
+
+    Args:
+        models: Model metadata dictionaries from the registry
+        caches: Result cache stats by cache name
+
+    Returns:
+        Exposition text
+    """
+    lines: List[str] = []
+
+    _render_samples(lines, "exovision_requests_total", "counter",
+                    "HTTP requests by endpoint, method and status",
+                    ["endpoint", "method", "status"], requests_total.items())
+    _render_samples(lines, "exovision_request_errors_total", "counter",
+                    "HTTP requests that failed with a 5xx status",
+                    ["endpoint", "method"], request_errors_total.items())
+    _render_histogram(lines, "exovision_request_duration_seconds",
+                      "HTTP request latency by endpoint and method",
+                      ["endpoint", "method"], request_duration)
+    _render_histogram(lines, "exovision_stage_duration_seconds",
+                      "Time spent per request stage", ["stage"], stage_duration)
+
+    loaded = [model for model in models if model.get("loaded")]
+    _render_samples(lines, "exovision_model_loaded", "gauge",
+                    "Whether a registered model version is loaded in this worker",
+                    ["version", "filename"],
+                    [((model["version"], model["filename"]), int(bool(model.get("loaded")))) for model in models])
+    _render_samples(lines, "exovision_model_load_seconds", "gauge",
+                    "Time taken to load a model version",
+                    ["version", "filename"],
+                    [((model["version"], model["filename"]), model.get("load_seconds") or 0.0) for model in loaded])
+    _render_samples(lines, "exovision_model_resident_bytes", "gauge",
+                    "Private memory held by a loaded model version",
+                    ["version", "filename"],
+                    [((model["version"], model["filename"]), model.get("resident_bytes", 0)) for model in loaded])
+
+    _render_samples(lines, "exovision_cache_hits_total", "counter", "Result cache hits",
+                    ["cache"], [((name,), stats["hits"]) for name, stats in caches.items()])
+    _render_samples(lines, "exovision_cache_misses_total", "counter", "Result cache misses",
+                    ["cache"], [((name,), stats["misses"]) for name, stats in caches.items()])
+
+    return "\n".join(lines) + "\n"
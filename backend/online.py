@@ -0,0 +1,252 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from evaluation import RunningMetrics
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+# Added to every variance, relative to the largest one, as in GaussianNB
+VAR_SMOOTHING = 1e-9
+
+class RunningStats:
+    """
+    Per-feature running count, mean and sum of squared deviations
+
+    Batches are merged with the parallel form of Welford's algorithm
+    (Chan et al.), which stays numerically stable and costs O(features)
+    per row however many rows were seen before.
+    """
+
+    def __init__(self, n_features: int):
+        self.count = 0
+        self.mean = np.zeros(n_features, dtype=np.float64)
+        self.m2 = np.zeros(n_features, dtype=np.float64)
+
+    @property
+    def variance(self) -> np.ndarray:
+        return self.m2 / self.count if self.count else np.zeros_like(self.m2)
+
+    def update(self, X: np.ndarray):
+        """Add a batch of rows"""
+        n = len(X)
+        if n == 0:
+            return
+        batch_mean = X.mean(axis=0)
+        batch_m2 = ((X - batch_mean) ** 2).sum(axis=0)
+
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.m2 = self.m2 + batch_m2 + delta ** 2 * (self.count * n / total)
+        self.count = total
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"count": self.count, "mean": self.mean.tolist(), "m2": self.m2.tolist()}
+
+    @classmethod
+    def from_dict(cls, content: Dict[str, Any]) -> "RunningStats":
+        stats = cls(len(content["mean"]))
+        stats.count = int(content["count"])
+        stats.mean = np.asarray(content["mean"], dtype=np.float64)
+        stats.m2 = np.asarray(content["m2"], dtype=np.float64)
+        return stats
+
+class OnlineGaussianNB:
+    """
+    Gaussian naive Bayes classifier updated one batch at a time
+
+    Keeps a RunningStats per class, so ``partial_fit`` costs O(features)
+    per row and the model size does not grow with the data. Exposes the
+    scikit-learn ``classes_``/``predict_proba``/``predict`` interface used
+    by the scoring code, and pickles like any other model artifact.
+    """
+
+    def __init__(self, feature_names: List[str], classes: List[int] = (0, 1)):
+        """
+        Args:
+            feature_names: Feature names in column order
+            classes: Class labels
+        """
+        self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        self.n_features_in_ = len(feature_names)
+        self.classes_ = np.asarray(classes)
+        self.stats_ = [RunningStats(self.n_features_in_) for _ in self.classes_]
+
+    @property
+    def class_count_(self) -> np.ndarray:
+        return np.array([stats.count for stats in self.stats_], dtype=np.int64)
+
+    def partial_fit(self, X: np.ndarray, y: np.ndarray) -> "OnlineGaussianNB":
+        """
+        Update the class statistics with a batch of labeled rows
+
+        Args:
+            X: (rows, features) feature matrix
+            y: Labels, each one of ``classes_``
+        """
+        y = np.asarray(y)
+        unknown = np.setdiff1d(np.unique(y), self.classes_)
+        if len(unknown):
+            raise ValueError(f"Unknown labels: {unknown.tolist()}")
+        for stats, label in zip(self.stats_, self.classes_):
+            stats.update(X[y == label])
+        return self
+
+    def _joint_log_likelihood(self, X: np.ndarray) -> np.ndarray:
+        counts = self.class_count_
+        if (counts == 0).any():
+            raise ValueError("Online model has not seen every class yet")
+
+        variances = np.array([stats.variance for stats in self.stats_])
+        variances = variances + VAR_SMOOTHING * max(float(variances.max()), 1e-12)
+        means = np.array([stats.mean for stats in self.stats_])
+
+        log_prior = np.log(counts / counts.sum())
+        log_norm = -0.5 * np.log(2 * np.pi * variances).sum(axis=1)
+        # (rows, classes)
+        squared = ((X[:, None, :] - means[None, :, :]) ** 2 / variances[None, :, :]).sum(axis=2)
+        return log_prior + log_norm - 0.5 * squared
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Class probabilities, columns ordered as ``classes_``"""
+        X = np.asarray(X, dtype=np.float64)
+        jll = self._joint_log_likelihood(X)
+        jll -= jll.max(axis=1, keepdims=True)
+        probabilities = np.exp(jll)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def ready(self) -> bool:
+        """Whether every class has been seen, so the model can score"""
+        return bool((self.class_count_ > 0).all())
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-class row counts, feature means and standard deviations"""
+        return {
+            str(label): {
+                "count": stats.count,
+                "means": dict(zip(self.feature_names_in_.tolist(), stats.mean.tolist())),
+                "stds": dict(zip(self.feature_names_in_.tolist(), np.sqrt(stats.variance).tolist()))
+            }
+            for label, stats in zip(self.classes_.tolist(), self.stats_)
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "features": self.feature_names_in_.tolist(),
+            "classes": self.classes_.tolist(),
+            "stats": [stats.to_dict() for stats in self.stats_]
+        }
+
+    @classmethod
+    def from_dict(cls, content: Dict[str, Any]) -> "OnlineGaussianNB":
+        model = cls(content["features"], content["classes"])
+        model.stats_ = [RunningStats.from_dict(stats) for stats in content["stats"]]
+        return model
+
+class OnlineModelStore:
+    """
+    Shared state of the online model
+
+    The class statistics and the prequential metrics (every batch scored
+    before it is learned from) are kept in one small JSON file, so all
+    workers serve the same model. Updates from different processes are
+    serialized with a file lock where available, as in EvaluationStore.
+    """
+
+    def __init__(self, path: Path, feature_names: List[str]):
+        """
+        Args:
+            path: State file
+            feature_names: Feature names in column order
+        """
+        self.path = Path(path)
+        self.feature_names = list(feature_names)
+        self._lock = threading.Lock()
+        # (state file mtime, state)
+        self._state: Optional[tuple] = None
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except OSError:
+            return {"revision": 0, "model": OnlineGaussianNB(self.feature_names), "prequential": RunningMetrics()}
+
+        if self._state is not None and self._state[0] == mtime:
+            return self._state[1]
+
+        with open(self.path) as f:
+            content = json.load(f)
+        state = {
+            "revision": content["revision"],
+            "model": OnlineGaussianNB.from_dict(content["model"]),
+            "prequential": RunningMetrics.from_dict(content["prequential"])
+        }
+        self._state = (mtime, state)
+        return state
+
+    def _write(self, state: Dict[str, Any]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "revision": state["revision"],
+                "model": state["model"].to_dict(),
+                "prequential": state["prequential"].to_dict()
+            }, f)
+        os.replace(tmp_path, self.path)
+        self._state = (self.path.stat().st_mtime_ns, state)
+
+    def model(self) -> OnlineGaussianNB:
+        """Current online model; do not modify it"""
+        return self._read()["model"]
+
+    def partial_fit(self, X: np.ndarray, y: np.ndarray) -> Dict[str, Any]:
+        """
+        Score a batch of labeled rows with the current model, then learn it
+
+        Args:
+            X: (rows, features) matrix in ``feature_names`` order
+            y: Labels (1 = confirmed, 0 = false positive)
+
+        Returns:
+            Dictionary with the new revision and the rows learned
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.path.with_name(self.path.name + ".lock"), "w") as lock_file:
+            if HAS_FCNTL:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            current = self._read()
+            model = OnlineGaussianNB.from_dict(current["model"].to_dict())
+            prequential = RunningMetrics().merge(current["prequential"])
+
+            if model.ready() and len(X):
+                p_confirmed = model.predict_proba(X)[:, list(model.classes_).index(1)]
+                prequential.update(y, (p_confirmed > 0.5).astype(np.int64), p_confirmed)
+
+            model.partial_fit(X, y)
+            state = {"revision": current["revision"] + 1, "model": model, "prequential": prequential}
+            self._write(state)
+        return {"revision": state["revision"], "rows": len(X)}
+
+    def status(self) -> Dict[str, Any]:
+        """Class statistics and prequential metrics of the online model"""
+        state = self._read()
+        prequential = state["prequential"]
+        return {
+            "revision": state["revision"],
+            "ready": state["model"].ready(),
+            "classes": state["model"].summary(),
+            "prequential": prequential.snapshot() if prequential.count else None
+        }
@@ -0,0 +1,130 @@
+import json
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Deepest stack recorded per sample
+MAX_STACK_DEPTH = 64
+
+# Innermost frames of threads waiting for work, left out of the samples
+IDLE_FRAMES = {("_worker", "thread.py"), ("select", "selectors.py")}
+
+PROFILE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler for one request
+
+    A background thread snapshots the stacks of every thread (event loop
+    and executor pools) at a fixed interval and counts identical stacks.
+    The result is written in the folded-stack format read by flamegraph
+    tools (speedscope, flamegraph.pl). Other requests running at the same
+    time share those threads and show up in the profile too.
+    """
+
+    def __init__(self, interval_seconds: float = 0.005):
+        """
+        Args:
+            interval_seconds: Time between samples
+        """
+        self.interval = interval_seconds
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+        self.duration = 0.0
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="exovision-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def _run(self):
+        own_thread = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own_thread and not self._idle(frame):
+                    self.samples[self._fold(names.get(ident, "thread"), frame)] += 1
+            self.sample_count += 1
+
+    @staticmethod
+    def _idle(frame) -> bool:
+        """Whether a thread is an executor worker or event loop waiting for work"""
+        code = frame.f_code
+        return (code.co_name, Path(code.co_filename).name) in IDLE_FRAMES
+
+    @staticmethod
+    def _fold(thread_name: str, frame) -> str:
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            stack.append(f"{Path(code.co_filename).name}:{code.co_name}:{frame.f_lineno}")
+            frame = frame.f_back
+        # Threads of one pool are merged under the pool name
+        return ";".join([re.sub(r"_\d+$", "", thread_name)] + stack[::-1])
+
+    def folded(self) -> str:
+        """Folded stacks, one 'frame;frame;... count' line per distinct stack"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+class ProfileStore:
+    """Directory of captured request profiles"""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def new_id(self, endpoint: str) -> str:
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", endpoint).strip("-") or "root"
+        return f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{slug}"
+
+    def save(self, profile_id: str, profiler: SamplingProfiler, details: Dict[str, Any]):
+        """
+        Write a profile and its request details
+
+        Args:
+            profile_id: Id from ``new_id``
+            profiler: Stopped profiler
+            details: Request details (endpoint, status, timings)
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / f"{profile_id}.folded").write_text(profiler.folded())
+        (self.directory / f"{profile_id}.json").write_text(json.dumps({
+            "id": profile_id,
+            "created_at": datetime.now().isoformat(),
+            "duration_seconds": profiler.duration,
+            "samples": profiler.sample_count,
+            "interval_seconds": profiler.interval,
+            **details
+        }))
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Details of every stored profile, newest first"""
+        if not self.directory.is_dir():
+            return []
+        profiles = []
+        for path in sorted(self.directory.glob("*.json"), reverse=True):
+            try:
+                profiles.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+    def load(self, profile_id: str) -> Optional[str]:
+        """Folded stacks of a profile, or None if there is no such profile"""
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        path = self.directory / f"{profile_id}.folded"
+        return path.read_text() if path.exists() else None
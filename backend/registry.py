@@ -0,0 +1,537 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import joblib
+
+from forest import CompiledForest, load_inference_engine, save_forest, load_forest
+from utils import file_digest
+
+# Artifact formats the registry can load
+MODEL_EXTENSIONS = [".pkl", ".joblib"]
+
+# Sidecar index caching content hashes by path, size and mtime
+INDEX_FILENAME = "registry.json"
+
+class ModelNotFoundError(LookupError):
+    """Raised when a model id does not match any registered artifact"""
+
+class ModelEntry:
+    """
+    A registered model artifact and, once loaded, its in-memory model
+
+    ``scorer`` is what predictions run on. ``model`` is the deserialized
+    estimator; it can be None while the entry is loaded when the scorer was
+    attached from a memory-mapped array store, which then also serves SHAP
+    and feature importances. ``ModelRegistry.full_model`` loads it on demand.
+    
+    A loaded entry is never emptied: unloading replaces it in the registry
+    with a new unloaded entry, so a request that already holds it keeps a
+    working scorer until it is done.
+    """
+
+    def __init__(self, version: str, path: Path, size: int, registered_at: str,
+                 engine: str = "sklearn", extra: Optional[Dict[str, Any]] = None):
+        self.version = version
+        self.path = path
+        self.size = size
+        self.registered_at = registered_at
+        self.engine = engine
+        self.extra = extra or {}
+
+        self.model = None
+        self.scorer = None
+        self.engine_info: Dict[str, Any] = {}
+        self.resident_bytes = 0
+        self.load_seconds: Optional[float] = None
+        self.last_used = 0.0
+        self.lock = threading.Lock()
+
+        # SHAP explainer, built on first use and dropped on unload
+        self.explainer = None
+        self.explainer_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.scorer is not None
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Model metadata in the /api/model-info format"""
+        metadata = {
+            "filename": self.path.name,
+            "size": self.size,
+            "uploaded_at": self.registered_at,
+            "format": self.path.suffix.lower(),
+            "version": self.version,
+            "loaded": self.loaded,
+            **self.extra
+        }
+        if self.loaded:
+            metadata.update({
+                "type": type(self.model).__name__ if self.model is not None else self.extra.get("type"),
+                "resident_bytes": self.resident_bytes,
+                "load_seconds": self.load_seconds,
+                **self.engine_info
+            })
+        else:
+            metadata["engine"] = self.engine
+        return metadata
+
+class ModelRegistry:
+    """
+    Registry of every model artifact in the model directories
+
+    Artifacts are indexed by content hash (their version id) and loaded
+    lazily on first use. Loaded models are evicted least-recently-used
+    first whenever their resident size exceeds the memory budget; the
+    active model is never evicted.
+    """
+
+    def __init__(self, model_dirs: List[Path], memory_budget_bytes: int,
+                 default_engine: str = "sklearn", array_store_dir: Optional[Path] = None):
+        """
+        Args:
+            model_dirs: Directories scanned for artifacts; the first one
+                receives uploads and holds the index
+            memory_budget_bytes: Resident size allowed for loaded models
+            default_engine: Inference engine for models registered by scanning
+            array_store_dir: Directory of memory-mappable compiled forests
+                shared by all workers on the host; None disables it
+        """
+        self.model_dirs = [Path(directory) for directory in model_dirs]
+        self.memory_budget = memory_budget_bytes
+        self.default_engine = default_engine
+        self.array_store_dir = Path(array_store_dir) if array_store_dir is not None else None
+
+        self._entries: Dict[str, ModelEntry] = {}
+        self._paths: Dict[str, str] = {}
+        self._active: Optional[str] = None
+        self._lock = threading.RLock()
+        self.evictions = 0
+
+    @property
+    def index_path(self) -> Path:
+        return self.model_dirs[0] / INDEX_FILENAME
+
+    def _read_index(self) -> Dict[str, Any]:
+        try:
+            with open(self.index_path) as f:
+                return json.load(f).get("artifacts", {})
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self):
+        artifacts = {}
+        for path, version in self._paths.items():
+            entry = self._entries[version]
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            artifacts[path] = {
+                "version": version,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "registered_at": entry.registered_at,
+                "engine": entry.engine,
+                "extra": entry.extra
+            }
+
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"artifacts": artifacts}, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def scan(self) -> int:
+        """
+        Index every artifact in the model directories
+
+        Files whose size and mtime match the index are not hashed again.
+
+        Returns:
+            Number of registered model versions
+        """
+        index = self._read_index()
+
+        with self._lock:
+            for directory in self.model_dirs:
+                if not directory.is_dir():
+                    continue
+                for path in sorted(directory.iterdir()):
+                    if path.suffix.lower() not in MODEL_EXTENSIONS or not path.is_file():
+                        continue
+
+                    stat = path.stat()
+                    known = index.get(str(path))
+                    if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime:
+                        self._add(path, known["version"], known.get("registered_at"),
+                                  known.get("engine"), known.get("extra"))
+                    else:
+                        self._add(path, file_digest(path), None, None, None)
+
+            # Forget artifacts that were removed from disk
+            for path in list(self._paths):
+                if not os.path.exists(path):
+                    self._forget_path(path)
+
+            self._write_index()
+            return len(self._entries)
+
+    def _forget_path(self, path: str):
+        """Drop a path mapping, and its entry once no file and no memory backs it"""
+        version = self._paths.pop(path)
+        entry = self._entries[version]
+        remaining = [other for other, other_version in self._paths.items() if other_version == version]
+
+        if remaining:
+            entry.path = Path(remaining[0])
+        elif not entry.loaded and version != self._active:
+            del self._entries[version]
+
+    def _add(self, path: Path, version: str, registered_at: Optional[str],
+             engine: Optional[str], extra: Optional[Dict[str, Any]]) -> ModelEntry:
+        if self._paths.get(str(path), version) != version:
+            # The file was overwritten with different content
+            self._forget_path(str(path))
+
+        entry = self._entries.get(version)
+        if entry is None:
+            if registered_at is None:
+                registered_at = datetime.fromtimestamp(path.stat().st_mtime).isoformat()
+            entry = ModelEntry(
+                version, path, path.stat().st_size, registered_at,
+                engine or self.default_engine, extra
+            )
+            self._entries[version] = entry
+        self._paths[str(path)] = version
+        return entry
+
+    def register(self, path: Path, engine: Optional[str] = None, **extra) -> ModelEntry:
+        """
+        Register a newly written artifact
+
+        Args:
+            path: Path to the artifact
+            engine: Inference engine for this model
+            **extra: Additional metadata stored with the entry
+
+        Returns:
+            Registry entry for the artifact's content
+        """
+        version = file_digest(path)
+
+        with self._lock:
+            entry = self._add(path, version, datetime.now().isoformat(), engine, extra)
+            entry.registered_at = datetime.now().isoformat()
+            entry.extra.update(extra)
+            if engine is not None and engine != entry.engine:
+                entry = self._unload(entry)
+                entry.engine = engine
+            self._write_index()
+            return entry
+
+    def resolve(self, model_id: Optional[str] = None) -> ModelEntry:
+        """
+        Find a registered model
+
+        Args:
+            model_id: Version id (or unique prefix of at least 6 characters),
+                filename or filename stem; None or 'active' for the active model
+
+        Returns:
+            Registry entry
+        """
+        with self._lock:
+            if model_id is None or model_id == "active":
+                if self._active is None:
+                    raise ModelNotFoundError("No active model")
+                return self._entries[self._active]
+
+            if model_id in self._entries:
+                return self._entries[model_id]
+
+            for path, version in self._paths.items():
+                name = Path(path)
+                if model_id in (name.name, name.stem):
+                    return self._entries[version]
+
+            if len(model_id) >= 6:
+                matches = [version for version in self._entries if version.startswith(model_id)]
+                if len(matches) == 1:
+                    return self._entries[matches[0]]
+
+        raise ModelNotFoundError(f"Model not found: {model_id}")
+
+    def loaded(self, model_id: Optional[str] = None) -> Optional[ModelEntry]:
+        """
+        Get a model only if it is already in memory
+
+        Returns:
+            Loaded registry entry, or None if it still has to be loaded
+        """
+        entry = self.resolve(model_id)
+        if not entry.loaded:
+            return None
+        entry.last_used = time.monotonic()
+        return entry
+
+    def _store_path(self, entry: ModelEntry) -> Optional[Path]:
+        if self.array_store_dir is None or entry.engine != "compiled":
+            return None
+        return self.array_store_dir / f"{entry.version}.forest"
+
+    def array_store(self, entry: ModelEntry) -> Optional[Path]:
+        """Array store of a compiled forest, if one was published for the entry"""
+        store_path = self._store_path(entry)
+        if store_path is None or not store_path.exists():
+            return None
+        return store_path
+
+    def load(self, model_id: Optional[str] = None) -> ModelEntry:
+        """
+        Get a model, loading it from disk on first use
+
+        Compiled models with an array store are attached by memory-mapping
+        the store; the estimator itself is only deserialized when needed.
+
+        Returns:
+            Loaded registry entry
+        """
+        entry = self.resolve(model_id)
+
+        with entry.lock:
+            if not entry.loaded:
+                started = time.perf_counter()
+                store_path = self._store_path(entry)
+                if store_path is not None and store_path.exists():
+                    self._attach(entry, store_path)
+                else:
+                    self._install(entry, joblib.load(entry.path))
+                entry.load_seconds = time.perf_counter() - started
+
+        entry.last_used = time.monotonic()
+        self._evict(keep=entry)
+        return entry
+
+    def install(self, entry: ModelEntry, model) -> ModelEntry:
+        """
+        Attach an already fitted model to its registered artifact
+
+        Args:
+            entry: Registry entry of the artifact the model was saved to
+            model: Fitted model
+
+        Returns:
+            Loaded registry entry
+        """
+        with entry.lock:
+            self._install(entry, model)
+            entry.load_seconds = 0.0
+
+        entry.last_used = time.monotonic()
+        self._evict(keep=entry)
+        return entry
+
+    def _install(self, entry: ModelEntry, model):
+        scorer, engine_info = load_inference_engine(model, entry.engine)
+        if entry.extra.get("type") != type(model).__name__:
+            # Recorded so workers attaching to the array store can report it
+            entry.extra["type"] = type(model).__name__
+            with self._lock:
+                self._write_index()
+
+        store_path = self._store_path(entry)
+        if store_path is not None and engine_info["engine"] == "compiled":
+            # Publish the compiled arrays so other workers can attach to them,
+            # and serve from the shared mapping here as well
+            if not store_path.exists():
+                save_forest(scorer, store_path)
+            self._attach(entry, store_path)
+            entry.model = entry.scorer.estimator = model
+            entry.engine_info.update({
+                key: value for key, value in engine_info.items() if key not in entry.engine_info
+            })
+            entry.resident_bytes = entry.size
+            return
+
+        entry.model, entry.scorer, entry.engine_info = model, scorer, engine_info
+        entry.resident_bytes = entry.size + engine_info.get("engine_size", 0)
+
+    def _attach(self, entry: ModelEntry, store_path: Path):
+        """Serve a model from its memory-mapped array store"""
+        forest = load_forest(store_path)
+        entry.scorer = forest
+        entry.engine_info = {
+            "engine": "compiled",
+            "engine_size": forest.nbytes,
+            "engine_mmap": True
+        }
+        # Mapped pages are shared page cache, not private memory
+        entry.resident_bytes = 0
+
+    def full_model(self, entry: ModelEntry):
+        """
+        Get the deserialized estimator of a loaded entry
+
+        Entries attached from an array store only load it when the store
+        cannot serve a request itself (a store written without node weights).
+
+        Args:
+            entry: Registry entry
+
+        Returns:
+            Fitted model
+        """
+        with entry.lock:
+            if entry.model is None:
+                entry.model = joblib.load(entry.path)
+                entry.resident_bytes += entry.size
+                if isinstance(entry.scorer, CompiledForest):
+                    # Large batches can now go to the estimator as well
+                    entry.scorer.estimator = entry.model
+
+        entry.last_used = time.monotonic()
+        self._evict(keep=entry)
+        return entry.model
+
+    def explainable_model(self, entry: ModelEntry):
+        """
+        Get a model of a loaded entry that SHAP and feature importances can read
+
+        A forest attached from an array store is read from the shared
+        mapping; the estimator is only deserialized for other models.
+
+        Args:
+            entry: Registry entry
+
+        Returns:
+            Fitted model or compiled forest
+        """
+        if entry.model is not None:
+            return entry.model
+        scorer = entry.scorer
+        if isinstance(scorer, CompiledForest) and scorer.node_weight is not None:
+            return scorer
+        return self.full_model(entry)
+
+    def explainer(self, entry: ModelEntry, build):
+        """
+        Get the SHAP explainer of a loaded entry, building it once
+
+        Args:
+            entry: Registry entry
+            build: Callable building the explainer from ``explainable_model``
+
+        Returns:
+            Explainer reused by every request for this model version
+        """
+        model = self.explainable_model(entry)
+        with entry.explainer_lock:
+            if entry.explainer is None:
+                entry.explainer = build(model)
+            return entry.explainer
+
+    def _unload(self, entry: ModelEntry) -> ModelEntry:
+        """
+        Replace an entry with an unloaded copy
+        
+        The old entry keeps its model, scorer and explainer for the requests
+        still using it; its memory is freed once the last of them finishes.
+        
+        Returns:
+            The entry now registered for the version
+        """
+        with self._lock:
+            current = self._entries.get(entry.version)
+            if current is not entry:
+                return current
+            if not entry.loaded:
+                return entry
+            fresh = ModelEntry(
+                entry.version, entry.path, entry.size, entry.registered_at, entry.engine, entry.extra
+            )
+            fresh.last_used = entry.last_used
+            self._entries[entry.version] = fresh
+            return fresh
+
+    def _evict(self, keep: ModelEntry):
+        """Unload least recently used models until the budget is met"""
+        with self._lock:
+            loaded = sorted(
+                (entry for entry in self._entries.values() if entry.loaded),
+                key=lambda entry: entry.last_used
+            )
+            resident = sum(entry.resident_bytes for entry in loaded)
+
+            for entry in loaded:
+                if resident <= self.memory_budget:
+                    break
+                if entry is keep or entry.version == self._active:
+                    continue
+                # Skip entries another thread is loading into right now
+                if not entry.lock.acquire(blocking=False):
+                    continue
+                try:
+                    resident -= entry.resident_bytes
+                    self._unload(entry)
+                    self.evictions += 1
+                    if entry.version not in self._paths.values():
+                        # Its artifact is gone, so it could not be loaded again
+                        del self._entries[entry.version]
+                finally:
+                    entry.lock.release()
+
+    def unload(self, model_id: Optional[str] = None):
+        """
+        Release a model's memory once the requests using it are done; it
+        is loaded again on next use
+
+        Args:
+            model_id: Model to unload
+        """
+        entry = self.resolve(model_id)
+        with entry.lock:
+            self._unload(entry)
+
+    @property
+    def active(self) -> Optional[ModelEntry]:
+        """Entry of the model served when a request names none"""
+        with self._lock:
+            return self._entries.get(self._active) if self._active else None
+
+    def set_active(self, model_id: Optional[str]):
+        """
+        Make a registered model the default, or clear it with None
+
+        Args:
+            model_id: Model to activate
+        """
+        with self._lock:
+            self._active = self.resolve(model_id).version if model_id is not None else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Metadata of every registered model, most recently registered first"""
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda entry: entry.registered_at, reverse=True)
+            return [
+                {**entry.metadata, "active": entry.version == self._active}
+                for entry in entries
+            ]
+
+    def stats(self) -> Dict[str, Any]:
+        """Memory usage of the loaded models"""
+        with self._lock:
+            loaded = [entry for entry in self._entries.values() if entry.loaded]
+            return {
+                "registered": len(self._entries),
+                "loaded": len(loaded),
+                "resident_bytes": sum(entry.resident_bytes for entry in loaded),
+                "memory_budget_bytes": self.memory_budget,
+                "evictions": self.evictions,
+                "active": self._active
+            }
@@ -0,0 +1,48 @@
+import sys
+import time
+from typing import Any, Dict, Optional
+
+# Libraries that are slow to import and only needed by some endpoints
+HEAVY_MODULES = ["matplotlib", "seaborn", "scipy", "sklearn", "shap", "pyarrow"]
+
+class StartupReport:
+    """
+    Timing of the API's imports and startup stages
+
+    Created when this module is first imported, which main.py does before
+    anything else, so the 'imports' stage covers the whole import path.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.stages: Dict[str, float] = {}
+        self.ready_seconds: Optional[float] = None
+
+    def mark(self, stage: str):
+        """Record the time spent since the previous stage"""
+        now = time.perf_counter()
+        self.stages[stage] = now - self._last
+        self._last = now
+
+    def ready(self):
+        """Record that the API is ready to serve requests"""
+        self.ready_seconds = time.perf_counter() - self.started
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Get the startup timing report
+
+        Returns:
+            Dictionary of stage durations, time to ready and the heavy
+            libraries imported so far
+        """
+        return {
+            "stages": {stage: round(seconds, 4) for stage, seconds in self.stages.items()},
+            "ready_seconds": round(self.ready_seconds, 4) if self.ready_seconds is not None else None,
+            "uptime_seconds": round(time.perf_counter() - self.started, 1),
+            "modules_loaded": len(sys.modules),
+            "heavy_modules": {name: name in sys.modules for name in HEAVY_MODULES}
+        }
+
+startup_report = StartupReport()
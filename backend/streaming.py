@@ -0,0 +1,158 @@
+import json
+from typing import Any, AsyncIterator, BinaryIO, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from executors import run_in_pool
+from monitoring import timed
+from utils import FEATURE_ORDER, score_matrix
+
+STREAM_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+CSV_COLUMNS = ["row", "prediction", "confidence", "p_false_positive", "p_confirmed"]
+
+class RunningSummary:
+    """Constant-size running summary of streamed predictions"""
+
+    def __init__(self):
+        self.total = 0
+        self.confirmed = 0
+        self.false_positive = 0
+        self.confidence_sum = 0.0
+
+    def update(self, predictions: np.ndarray, confidences: np.ndarray):
+        self.total += len(predictions)
+        self.confirmed += int(np.sum(predictions == 1))
+        self.false_positive += int(np.sum(predictions == 0))
+        self.confidence_sum += float(np.sum(confidences))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "confirmed": self.confirmed,
+            "false_positive": self.false_positive,
+            "avg_confidence": self.confidence_sum / self.total if self.total else 0.0
+        }
+
+# pandas CSV parsing, timed as the csv_parse stage
+read_csv = timed("csv_parse")(pd.read_csv)
+
+@timed("csv_parse")
+def next_chunk(reader) -> Optional[pd.DataFrame]:
+    """Parse the next chunk of a chunked CSV reader, None at the end"""
+    return next(reader, None)
+
+def read_csv_columns(file_obj: BinaryIO) -> List[str]:
+    """
+    Read the header of a CSV upload and rewind it
+
+    Args:
+        file_obj: Seekable binary file object
+
+    Returns:
+        List of column names
+    """
+    columns = read_csv(file_obj, nrows=0).columns.tolist()
+    file_obj.seek(0)
+    return columns
+
+@timed("serialization")
+def encode_chunk(predictions: np.ndarray, confidences: np.ndarray,
+                 probabilities: np.ndarray, first_row: int, output: str) -> bytes:
+    """
+    Encode one scored chunk as NDJSON lines or CSV rows
+
+    Args:
+        predictions: Predicted class per row
+        confidences: Confidence per row
+        probabilities: Probability matrix, columns [false_positive, confirmed]
+        first_row: 1-based row number of the first row in the chunk
+        output: 'ndjson' or 'csv'
+
+    Returns:
+        Encoded chunk
+    """
+    rows = np.arange(first_row, first_row + len(predictions))
+    labels = np.where(predictions == 1, "confirmed", "false-positive")
+
+    if output == "csv":
+        frame = pd.DataFrame({
+            "row": rows,
+            "prediction": labels,
+            "confidence": confidences,
+            "p_false_positive": probabilities[:, 0],
+            "p_confirmed": probabilities[:, 1]
+        })
+        return frame.to_csv(header=False, index=False).encode()
+
+    lines = [
+        json.dumps({
+            "row": row,
+            "prediction": label,
+            "confidence": conf,
+            "probabilities": {"false_positive": fp, "confirmed": cf}
+        })
+        for row, label, conf, fp, cf in zip(
+            rows.tolist(), labels.tolist(), confidences.astype(float).tolist(),
+            probabilities[:, 0].astype(float).tolist(), probabilities[:, 1].astype(float).tolist()
+        )
+    ]
+    return ("\n".join(lines) + "\n").encode()
+
+def score_chunk(model, chunk: pd.DataFrame, first_row: int, output: str):
+    """Score and encode one parsed chunk; runs in the inference pool"""
+    predictions, confidences, probabilities = score_matrix(model, chunk[FEATURE_ORDER].values)
+    return encode_chunk(predictions, confidences, probabilities, first_row, output), predictions, confidences
+
+def encode_record(record: Dict[str, Any], output: str) -> bytes:
+    """Encode a summary or error record; CSV streams carry it as a '#' comment line"""
+    if output == "csv":
+        return f"# {json.dumps(record)}\n".encode()
+    return (json.dumps(record) + "\n").encode()
+
+async def stream_csv_predictions(file_obj: BinaryIO, model, output: str,
+                                 chunk_rows: int) -> AsyncIterator[bytes]:
+    """
+    Parse, score and encode a CSV upload in fixed-size row chunks
+
+    Only one chunk is held in memory at a time; the running summary of
+    the whole file is sent as the final record.
+
+    Args:
+        file_obj: Seekable binary file object with the CSV upload
+        model: Model used for scoring
+        output: 'ndjson' or 'csv'
+        chunk_rows: Number of rows parsed and scored per chunk
+
+    Yields:
+        Encoded result chunks
+    """
+    summary = RunningSummary()
+
+    if output == "csv":
+        yield (",".join(CSV_COLUMNS) + "\n").encode()
+
+    try:
+        reader = await run_in_pool(
+            "inference", read_csv, file_obj, usecols=FEATURE_ORDER, chunksize=chunk_rows
+        )
+        with reader:
+            while True:
+                chunk = await run_in_pool("inference", next_chunk, reader)
+                if chunk is None:
+                    break
+
+                encoded, predictions, confidences = await run_in_pool(
+                    "inference", score_chunk, model, chunk, summary.total + 1, output
+                )
+                summary.update(predictions, confidences)
+                yield encoded
+    except Exception as e:
+        yield encode_record({"error": f"CSV prediction error: {str(e)}", "rows_scored": summary.total}, output)
+        return
+
+    yield encode_record({"summary": summary.to_dict()}, output)
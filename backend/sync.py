@@ -0,0 +1,102 @@
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+class ActiveModelPointer:
+    """
+    Shared "active model" pointer for all workers on a host
+
+    The pointer is a small JSON file replaced atomically whenever a worker
+    activates a model. Every worker polls it and swaps in the version it
+    names, and publishes a heartbeat file with the version it is serving.
+    """
+
+    def __init__(self, path: Path, workers_dir: Path, poll_seconds: float = 1.0):
+        """
+        Args:
+            path: Pointer file
+            workers_dir: Directory of per-worker heartbeat files
+            poll_seconds: How often workers check the pointer
+        """
+        self.path = Path(path)
+        self.workers_dir = Path(workers_dir)
+        self.poll_seconds = poll_seconds
+        self.pid = os.getpid()
+
+    def _write_json(self, path: Path, content: Dict[str, Any]):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{self.pid}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(content, f)
+        os.replace(tmp_path, path)
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        """
+        Read the pointer
+
+        Returns:
+            Pointer content, or None if no model was ever activated
+        """
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write(self, version: Optional[str]):
+        """
+        Point all workers at a model version
+
+        Args:
+            version: Model version to serve, or None to serve none
+        """
+        self._write_json(self.path, {
+            "version": version,
+            "updated_at": datetime.now().isoformat(),
+            "updated_by": self.pid
+        })
+
+    def heartbeat(self, serving_version: Optional[str], synced_at: Optional[str]):
+        """Publish the version this worker is serving"""
+        self._write_json(self.workers_dir / f"{self.pid}.json", {
+            "pid": self.pid,
+            "serving_version": serving_version,
+            "synced_at": synced_at,
+            "heartbeat": time.time()
+        })
+
+    def remove_heartbeat(self):
+        try:
+            (self.workers_dir / f"{self.pid}.json").unlink()
+        except OSError:
+            pass
+
+    def workers(self) -> List[Dict[str, Any]]:
+        """
+        Versions served by the workers with a recent heartbeat
+
+        Returns:
+            One dictionary per live worker
+        """
+        stale_after = max(5.0, 5 * self.poll_seconds)
+        now = time.time()
+        workers = []
+
+        if not self.workers_dir.is_dir():
+            return workers
+
+        for path in sorted(self.workers_dir.glob("*.json")):
+            try:
+                with open(path) as f:
+                    worker = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if now - worker.get("heartbeat", 0) > stale_after:
+                continue
+            worker["this_worker"] = worker.get("pid") == self.pid
+            workers.append(worker)
+
+        return workers
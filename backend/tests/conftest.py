@@ -0,0 +1,55 @@
+import io
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Backend modules are imported flat, as when the server runs from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+FEATURES = ["orbital_period", "transit_duration", "transit_depth",
+            "planet_radius", "signal_to_noise", "koi_score"]
+
+@pytest.fixture(scope="session")
+def training_data():
+    """Feature matrix in FEATURE_ORDER and labels driven by the signal-to-noise ratio"""
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0.1, 100, size=(400, 6))
+    X[:, 5] = rng.uniform(0, 1, 400)
+    y = (X[:, 4] + rng.normal(0, 10, 400) > 50).astype(int)
+    return X, y
+
+@pytest.fixture(scope="session")
+def forest(training_data):
+    from sklearn.ensemble import RandomForestClassifier
+    X, y = training_data
+    return RandomForestClassifier(n_estimators=30, max_depth=8, random_state=0).fit(X, y)
+
+@pytest.fixture(scope="session")
+def api(tmp_path_factory, forest):
+    """
+    Test client of the app running in its own working directory, with the
+    session's forest uploaded as the active model
+    """
+    import joblib
+
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("server"))
+    try:
+        import main
+        from fastapi.testclient import TestClient
+
+        client = TestClient(main.app)
+        buffer = io.BytesIO()
+        joblib.dump(forest, buffer)
+        response = client.post("/api/upload-model", files={"model": ("forest.joblib", buffer.getvalue())})
+        assert response.status_code == 200, response.text
+        yield client
+    finally:
+        os.chdir(cwd)
+
+def feature_rows(X):
+    """Request rows of a feature matrix"""
+    return [dict(zip(FEATURES, map(float, row))) for row in X]
@@ -0,0 +1,113 @@
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from forest import CompiledForest, load_forest, save_forest
+from registry import ModelRegistry
+from utils import calculate_feature_importance, create_shap_explainer, positive_class_shap
+
+def make_data(n_rows=400, missing=False, random_state=0):
+    rng = np.random.default_rng(random_state)
+    X = rng.normal(size=(n_rows, 4)) * [1, 10, 100, 0.01]
+    y = (X[:, 0] + X[:, 1] / 10 + rng.normal(scale=0.5, size=n_rows) > 0).astype(int)
+    if missing:
+        X[rng.random(X.shape) < 0.1] = np.nan
+    return X, y
+
+@pytest.fixture
+def fitted():
+    X, y = make_data()
+    return RandomForestClassifier(n_estimators=15, max_depth=6, random_state=0).fit(X, y)
+
+@pytest.fixture
+def model_dir(tmp_path, fitted):
+    directory = tmp_path / "models"
+    directory.mkdir()
+    joblib.dump(fitted, directory / "model_0.joblib")
+    return directory
+
+def test_round_trip(fitted, tmp_path):
+    forest = CompiledForest.from_sklearn(fitted)
+    path = tmp_path / "store" / "model.forest"
+    save_forest(forest, path)
+    assert [p.name for p in path.parent.iterdir()] == ["model.forest"]
+
+    attached = load_forest(path)
+    for name in ["feature", "threshold", "children_left", "children_right", "value", "roots", "node_weight"]:
+        array = getattr(attached, name)
+        assert isinstance(array, np.memmap) and not array.flags.writeable
+        np.testing.assert_array_equal(array, getattr(forest, name))
+    assert attached.max_depth == forest.max_depth
+    np.testing.assert_array_equal(attached.classes_, fitted.classes_)
+
+    # The store holds the arrays only, not the estimator
+    assert attached.estimator is None and forest.estimator is fitted
+    X, _ = make_data(500, random_state=5)
+    np.testing.assert_array_equal(attached.predict_proba(X), forest.flat_predict_proba(X))
+
+def test_round_trip_with_missing_values(tmp_path):
+    X, y = make_data(missing=True)
+    model = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+    save_forest(CompiledForest.from_sklearn(model), tmp_path / "model.forest")
+    attached = load_forest(tmp_path / "model.forest")
+    X_test, _ = make_data(300, missing=True, random_state=6)
+    np.testing.assert_allclose(attached.predict_proba(X_test), model.predict_proba(X_test), atol=1e-5)
+
+def test_load_rejects_other_files(tmp_path):
+    joblib.dump({"not": "a forest"}, tmp_path / "other.forest")
+    with pytest.raises(ValueError):
+        load_forest(tmp_path / "other.forest")
+
+@pytest.mark.parametrize("background", [False, True])
+def test_shap_from_the_store_matches_the_estimator(fitted, tmp_path, background):
+    save_forest(CompiledForest.from_sklearn(fitted), tmp_path / "model.forest")
+    attached = load_forest(tmp_path / "model.forest")
+    X, _ = make_data(50, random_state=7)
+    rows = make_data(30, random_state=8)[0] if background else None
+
+    expected = positive_class_shap(*explain(create_shap_explainer(fitted, rows), X))
+    actual = positive_class_shap(*explain(create_shap_explainer(attached, rows), X))
+    np.testing.assert_allclose(actual[0], expected[0], atol=1e-6)
+    assert actual[1] == pytest.approx(expected[1], abs=1e-6)
+
+def explain(explainer, X):
+    return explainer.shap_values(X), explainer.expected_value
+
+def test_feature_importances_from_the_store(fitted, tmp_path):
+    save_forest(CompiledForest.from_sklearn(fitted), tmp_path / "model.forest")
+    attached = load_forest(tmp_path / "model.forest")
+    names = ["a", "b", "c", "d"]
+    assert calculate_feature_importance(attached, names) == calculate_feature_importance(fitted, names)
+
+def test_workers_attach_without_unpickling(model_dir, tmp_path, fitted):
+    store_dir = tmp_path / "mmap"
+    first = ModelRegistry([model_dir], 1 << 30, "compiled", array_store_dir=store_dir)
+    first.scan()
+    entry = first.load("model_0")
+    assert isinstance(entry.scorer, CompiledForest) and entry.scorer.estimator is entry.model
+    assert (store_dir / f"{entry.version}.forest").exists()
+
+    # Another worker maps the published store instead of unpickling the model
+    second = ModelRegistry([model_dir], 1 << 30, "compiled", array_store_dir=store_dir)
+    second.scan()
+    attached = second.load("model_0")
+    assert attached.engine_info["engine_mmap"] is True
+    assert isinstance(attached.scorer.threshold, np.memmap)
+    X = make_data(200, random_state=1)[0]
+    np.testing.assert_array_equal(attached.scorer.predict_proba(X), entry.scorer.flat_predict_proba(X))
+
+    # SHAP and feature importances are read from the mapping as well
+    assert second.explainable_model(attached) is attached.scorer
+    explainer = second.explainer(attached, lambda model: create_shap_explainer(model))
+    assert explainer is second.explainer(attached, None)
+    assert attached.model is None and attached.resident_bytes == 0
+
+    assert type(second.full_model(attached)).__name__ == "RandomForestClassifier"
+    assert attached.scorer.estimator is attached.model
+
+def test_sklearn_models_have_no_store(model_dir, tmp_path):
+    registry = ModelRegistry([model_dir], 1 << 30, "sklearn", array_store_dir=tmp_path / "mmap")
+    registry.scan()
+    registry.load("model_0")
+    assert not (tmp_path / "mmap").exists()
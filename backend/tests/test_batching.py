@@ -0,0 +1,69 @@
+import asyncio
+
+from batching import PredictionCoalescer
+from conftest import feature_rows
+from utils import format_predictions, score_matrix
+
+def recording_scorer(batches):
+    """Score function that records the size of every matrix it scores"""
+    async def score(model, X):
+        batches.append(len(X))
+        return score_matrix(model, X)
+    return score
+
+def test_concurrent_requests_are_scored_together(forest, training_data):
+    X, _ = training_data
+    rows = feature_rows(X[:10])
+    batches = []
+    coalescer = PredictionCoalescer(recording_scorer(batches), max_batch_size=4, max_wait_ms=50)
+
+    async def run():
+        return await asyncio.gather(*(coalescer.submit(row, forest) for row in rows))
+
+    results = asyncio.run(run())
+
+    # Two full batches flush on size, the remaining two rows on the timer
+    assert batches == [4, 4, 2]
+    assert results == format_predictions(*score_matrix(forest, X[:10]))
+    stats = coalescer.stats()
+    assert stats["batches"] == 3 and stats["rows"] == 10
+    assert stats["flush_reasons"] == {"size": 2, "timeout": 1}
+    assert stats["max_queue_depth"] == 4 and stats["queue_depth"] == 0
+    assert stats["batch_size_histogram"]["le_2"] == 1 and stats["batch_size_histogram"]["le_4"] == 2
+
+def test_models_are_scored_separately(forest, training_data):
+    from sklearn.dummy import DummyClassifier
+    X, y = training_data
+    dummy = DummyClassifier(strategy="prior").fit(X, y)
+    rows = feature_rows(X[:4])
+    batches = []
+    coalescer = PredictionCoalescer(recording_scorer(batches), max_batch_size=8, max_wait_ms=10)
+
+    async def run():
+        return await asyncio.gather(*(
+            coalescer.submit(row, model) for row, model in zip(rows, [forest, dummy, forest, dummy])
+        ))
+
+    results = asyncio.run(run())
+
+    assert sorted(batches) == [2, 2]
+    assert coalescer.stats()["batches"] == 1
+    assert results[0] == format_predictions(*score_matrix(forest, X[:1]))[0]
+    assert results[1] == format_predictions(*score_matrix(dummy, X[1:2]))[0]
+
+def test_scoring_errors_reach_every_caller(training_data):
+    X, _ = training_data
+
+    async def fail(model, X):
+        raise RuntimeError("model unavailable")
+
+    coalescer = PredictionCoalescer(fail, max_batch_size=2, max_wait_ms=10)
+
+    async def run():
+        return await asyncio.gather(
+            *(coalescer.submit(row, None) for row in feature_rows(X[:3])), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert len(results) == 3
+    assert all(isinstance(result, RuntimeError) for result in results)
@@ -0,0 +1,74 @@
+import io
+
+from cache import ResultCache, feature_key
+from conftest import feature_rows
+
+def test_feature_key_depends_on_values_and_version(training_data):
+    X, _ = training_data
+    row = feature_rows(X[:1])[0]
+    assert feature_key(row, "a") == feature_key(dict(reversed(list(row.items()))), "a")
+    assert feature_key(row, "a") != feature_key(row, "b")
+    assert feature_key(row, "a") != feature_key(dict(row, koi_score=row["koi_score"] + 1e-12), "a")
+
+def test_lru_eviction():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["size"] == 2 and stats["evictions"] == 1
+    assert stats["hits"] == 3 and stats["misses"] == 1
+
+def test_ttl_expiry(monkeypatch):
+    import cache as cache_module
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = ResultCache(max_entries=10, ttl_seconds=5)
+    cache.put("a", 1)
+
+    now[0] += 4
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1 and cache.stats()["size"] == 0
+
+def test_disabled_cache_stores_nothing():
+    cache = ResultCache(max_entries=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+def test_model_change_invalidates_predictions(api, training_data):
+    import joblib
+    import main
+    from sklearn.dummy import DummyClassifier
+
+    X, y = training_data
+    row = feature_rows(X[:1])[0]
+    original = main.model_registry.active.version
+    main.prediction_cache.clear()
+
+    first = api.post("/api/predict", json=row).json()
+    assert api.post("/api/predict", json=row).json() == first
+    assert main.prediction_cache.stats()["hits"] >= 1
+
+    # A model that always predicts the other class of the cached result
+    flipped = 1 - int(first["prediction"] == "confirmed")
+    other = DummyClassifier(strategy="constant", constant=flipped).fit(X, y)
+    buffer = io.BytesIO()
+    joblib.dump(other, buffer)
+    try:
+        response = api.post("/api/upload-model", files={"model": ("flipped.joblib", buffer.getvalue())})
+        assert response.status_code == 200, response.text
+        assert main.prediction_cache.stats()["size"] == 0
+
+        second = api.post("/api/predict", json=row).json()
+        assert second["prediction"] != first["prediction"]
+    finally:
+        assert api.post(f"/api/models/{original}/activate").status_code == 200
+
+    assert main.prediction_cache.stats()["size"] == 0
+    assert api.post("/api/predict", json=row).json() == first
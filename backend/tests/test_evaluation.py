@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from sklearn.metrics import accuracy_score, brier_score_loss, confusion_matrix, f1_score, precision_score, recall_score
+
+from evaluation import EvaluationStore, RunningMetrics, holdout_path, save_holdout
+
+def predictions(n_rows, random_state):
+    rng = np.random.default_rng(random_state)
+    y_true = rng.integers(0, 2, n_rows)
+    p_confirmed = np.clip(y_true * 0.6 + rng.uniform(0, 0.5, n_rows), 0, 1)
+    return y_true, (p_confirmed > 0.5).astype(int), p_confirmed
+
+def assert_matches_sklearn(snapshot, y_true, y_pred, p_confirmed):
+    assert snapshot["count"] == len(y_true)
+    assert snapshot["confusion_matrix"] == confusion_matrix(y_true, y_pred, labels=[0, 1]).tolist()
+    assert snapshot["accuracy"] == pytest.approx(accuracy_score(y_true, y_pred))
+    assert snapshot["precision"] == pytest.approx(precision_score(y_true, y_pred, zero_division=0))
+    assert snapshot["recall"] == pytest.approx(recall_score(y_true, y_pred, zero_division=0))
+    assert snapshot["f1_score"] == pytest.approx(f1_score(y_true, y_pred, zero_division=0))
+    assert snapshot["brier_score"] == pytest.approx(brier_score_loss(y_true, p_confirmed))
+
+def test_batches_accumulate_to_the_full_metrics():
+    y_true, y_pred, p_confirmed = predictions(1000, 0)
+    metrics = RunningMetrics()
+    for start in range(0, 1000, 137):
+        metrics.update(y_true[start:start + 137], y_pred[start:start + 137], p_confirmed[start:start + 137])
+    assert_matches_sklearn(metrics.snapshot(), y_true, y_pred, p_confirmed)
+
+    calibration = metrics.snapshot()["calibration"]
+    assert sum(bin["count"] for bin in calibration) == 1000
+    top = p_confirmed >= 0.9
+    assert calibration[-1]["observed_rate"] == pytest.approx(y_true[top].mean())
+
+def test_merge_and_serialization():
+    first, second = predictions(300, 1), predictions(200, 2)
+    a, b = RunningMetrics(), RunningMetrics()
+    a.update(*first)
+    b.update(*second)
+    merged = RunningMetrics.from_dict(a.merge(b).to_dict())
+    both = [np.concatenate(parts) for parts in zip(first, second)]
+    assert_matches_sklearn(merged.snapshot(), *both)
+
+def test_empty_metrics():
+    assert RunningMetrics().snapshot()["accuracy"] == 0.0
+
+def test_store_combines_holdout_and_feedback(tmp_path):
+    store = EvaluationStore(tmp_path / "evaluations")
+    holdout, feedback = predictions(200, 3), predictions(50, 4)
+    assert store.metrics("v1") is None
+
+    store.record_holdout("v1", tmp_path / "model.pkl", *holdout)
+    assert holdout_path(tmp_path / "model.pkl").exists()
+    store.record_feedback("v1", *feedback)
+    store.record_feedback("v1", *feedback)
+
+    assert store.metrics("v1", source="holdout")["count"] == 200
+    assert store.metrics("v1", source="feedback")["count"] == 100
+    combined = store.metrics("v1")
+    assert combined["count"] == 300 and combined["revision"] == 3
+    with pytest.raises(ValueError):
+        store.metrics("v1", source="bogus")
+
+    # Another worker reads the same state from disk
+    assert EvaluationStore(tmp_path / "evaluations").metrics("v1")["count"] == 300
+
+def test_store_imports_script_holdouts(tmp_path):
+    y_true, y_pred, p_confirmed = predictions(120, 5)
+    save_holdout(tmp_path / "script_model.pkl", y_true, y_pred, p_confirmed)
+    store = EvaluationStore(tmp_path / "evaluations")
+    snapshot = store.metrics("v2", tmp_path / "script_model.pkl", source="holdout")
+    assert_matches_sklearn(snapshot, y_true, y_pred, p_confirmed.astype(np.float32))
@@ -0,0 +1,91 @@
+import io
+import json
+
+import joblib
+import numpy as np
+import pytest
+
+from conftest import FEATURES, feature_rows
+from explaining import explain_rows_in_process, shap_summary
+from forest import CompiledForest, save_forest
+from utils import create_shap_explainer, positive_class_shap, supports_tree_shap
+
+def expected_shap(forest, X):
+    explainer = create_shap_explainer(forest)
+    return positive_class_shap(explainer.shap_values(X), explainer.expected_value)
+
+def test_batch_matches_a_direct_explanation(api, forest, training_data):
+    X, _ = training_data
+    response = api.post("/api/shap-batch", json={"data": feature_rows(X[:300])})
+    assert response.status_code == 200, response.text
+    content = response.json()
+
+    values, base_value = expected_shap(forest, X[:300])
+    np.testing.assert_allclose(content["shap_values"], values, atol=1e-5)
+    assert content["summary"]["base_value"] == pytest.approx(base_value, abs=1e-6)
+    assert content["summary"]["rows"] == 300
+
+def test_ndjson_streams_rows_then_the_summary(api, training_data):
+    X, _ = training_data
+    full = api.post("/api/shap-batch", json={"data": feature_rows(X[:300])}).json()
+    response = api.post("/api/shap-batch?output=ndjson", json={"data": feature_rows(X[:300])})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    *rows, last = [json.loads(line) for line in response.text.strip().split("\n")]
+    assert [row["row"] for row in rows] == list(range(1, 301))
+    np.testing.assert_allclose(
+        [[row["shap_values"][name] for name in FEATURES] for row in rows], full["shap_values"], atol=1e-6
+    )
+    assert last["summary"]["rows"] == 300
+    for name in FEATURES:
+        assert last["summary"]["mean_abs_shap"][name] == pytest.approx(full["summary"]["mean_abs_shap"][name])
+
+def test_models_shap_cannot_explain_are_rejected(api, training_data):
+    from sklearn.linear_model import LogisticRegression
+    X, y = training_data
+    buffer = io.BytesIO()
+    joblib.dump(LogisticRegression(max_iter=1000).fit(X, y), buffer)
+    uploaded = api.post("/api/upload-model?activate=false", files={"model": ("linear.joblib", buffer.getvalue())})
+    version = uploaded.json()["metadata"]["version"]
+
+    response = api.post(f"/api/shap-batch?model_id={version}", json={"data": feature_rows(X[:5])})
+    assert response.status_code == 500
+    assert "SHAP cannot explain a LogisticRegression model" in response.json()["detail"]
+
+def test_worker_explainers_read_the_array_store(forest, training_data, tmp_path):
+    X, _ = training_data
+    save_forest(CompiledForest.from_sklearn(forest), tmp_path / "model.forest")
+    # No artifact at the model path: the store alone has to be enough
+    values, base_value = explain_rows_in_process(
+        "store-only", str(tmp_path / "model.forest"), str(tmp_path / "missing.joblib"), None, X[:20]
+    )
+    expected, expected_base = expected_shap(forest, X[:20])
+    np.testing.assert_allclose(values, expected, atol=1e-5)
+    assert base_value == pytest.approx(expected_base, abs=1e-6)
+
+def test_supported_models(forest):
+    from sklearn.ensemble import GradientBoostingClassifier, HistGradientBoostingClassifier
+    from sklearn.linear_model import LogisticRegression
+    assert supports_tree_shap(forest)
+    assert supports_tree_shap(CompiledForest.from_sklearn(forest))
+    assert supports_tree_shap(forest.estimators_[0])
+    assert supports_tree_shap(GradientBoostingClassifier(n_estimators=2).fit([[0], [1]], [0, 1]))
+    assert supports_tree_shap(HistGradientBoostingClassifier())
+    assert not supports_tree_shap(LogisticRegression())
+
+def test_summary_of_an_empty_batch():
+    summary = shap_summary(np.empty((0, 2), dtype=np.float32), 0.5, ["a", "b"])
+    assert summary == {"rows": 0, "base_value": 0.5, "mean_abs_shap": {"a": 0.0, "b": 0.0}}
+
+def test_threads_share_the_registry_explainer(api, training_data, monkeypatch):
+    import executors
+    X, _ = training_data
+    monkeypatch.setitem(executors.POOL_SIZES, "explaining", 0)
+    threaded = api.post("/api/shap-batch?output=ndjson", json={"data": feature_rows(X[:300])})
+    monkeypatch.undo()
+    processes = api.post("/api/shap-batch?output=ndjson", json={"data": feature_rows(X[:300])})
+
+    def rows(response):
+        records = [json.loads(line) for line in response.text.strip().split("\n")[:-1]]
+        return [[record["shap_values"][name] for name in FEATURES] for record in records]
+    np.testing.assert_allclose(rows(threaded), rows(processes), atol=1e-6)
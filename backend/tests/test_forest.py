@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+
+from forest import (
+    COMPILED_MAX_ROWS, PARITY_TOLERANCE, CompiledForest, load_inference_engine, parity_probe
+)
+
+N_FEATURES = 6
+
+def make_data(n_rows=600, missing=False, random_state=0):
+    rng = np.random.default_rng(random_state)
+    X = rng.normal(size=(n_rows, N_FEATURES)) * [1, 10, 100, 0.01, 1e4, 1]
+    y = (X[:, 0] + X[:, 1] / 10 + rng.normal(scale=0.5, size=n_rows) > 0).astype(int)
+    if missing:
+        X[rng.random(X.shape) < 0.1] = np.nan
+    return X, y
+
+@pytest.fixture(params=[RandomForestClassifier, ExtraTreesClassifier])
+def fitted(request):
+    X, y = make_data()
+    return request.param(n_estimators=25, max_depth=8, random_state=0).fit(X, y)
+
+def assert_parity(model, forest, X):
+    probabilities = forest.flat_predict_proba(X)
+    np.testing.assert_allclose(probabilities, model.predict_proba(X), rtol=0, atol=PARITY_TOLERANCE)
+    np.testing.assert_array_equal(forest.classes_[np.argmax(probabilities, axis=1)], model.predict(X))
+
+def test_parity_on_random_rows(fitted):
+    forest = CompiledForest.from_sklearn(fitted)
+    X, _ = make_data(2000, random_state=1)
+    assert_parity(fitted, forest, X)
+
+def test_parity_across_chunks(fitted, monkeypatch):
+    import forest as forest_module
+    monkeypatch.setattr(forest_module, "CHUNK_ROWS", 7)
+    forest = CompiledForest.from_sklearn(fitted)
+    X, _ = make_data(100, random_state=2)
+    assert_parity(fitted, forest, X)
+
+def test_parity_on_float32_threshold_edges(fitted):
+    forest = CompiledForest.from_sklearn(fitted)
+    assert_parity(fitted, forest, parity_probe(forest, n_rows=2000, random_state=3))
+
+    # float64 inputs on and one float64 step around the original thresholds,
+    # which scikit-learn and the compiled forest both round to float32
+    thresholds = np.concatenate([
+        estimator.tree_.threshold[estimator.tree_.children_left != -1] for estimator in fitted.estimators_
+    ])
+    features = np.concatenate([
+        estimator.tree_.feature[estimator.tree_.children_left != -1] for estimator in fitted.estimators_
+    ])
+    X = np.zeros((len(thresholds) * 3, N_FEATURES))
+    for i, (feature, threshold) in enumerate(zip(features, thresholds)):
+        for k, value in enumerate([np.nextafter(threshold, -np.inf), threshold, np.nextafter(threshold, np.inf)]):
+            X[3 * i + k, feature] = value
+    assert_parity(fitted, forest, X)
+
+def test_parity_with_missing_values():
+    X, y = make_data(missing=True)
+    model = RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0).fit(X, y)
+    forest = CompiledForest.from_sklearn(model)
+    assert forest.missing_left is not None
+
+    X_test, _ = make_data(2000, missing=True, random_state=4)
+    assert_parity(model, forest, X_test)
+    X_test[:, 2] = np.nan
+    assert_parity(model, forest, X_test)
+
+class RecordingEstimator:
+    """Stands in for the scikit-learn model and records the batches it scores"""
+
+    def __init__(self, model):
+        self.model = model
+        self.batches = []
+
+    def predict_proba(self, X):
+        self.batches.append(len(X))
+        return self.model.predict_proba(X)
+
+def test_large_batches_go_to_the_estimator(fitted):
+    forest = CompiledForest.from_sklearn(fitted)
+    assert forest.estimator is fitted
+    forest.estimator = RecordingEstimator(fitted)
+    X, _ = make_data(COMPILED_MAX_ROWS + 1, random_state=7)
+
+    small = X[:COMPILED_MAX_ROWS]
+    np.testing.assert_array_equal(forest.predict_proba(small), forest.flat_predict_proba(small))
+    assert forest.estimator.batches == []
+    np.testing.assert_array_equal(forest.predict_proba(X), fitted.predict_proba(X))
+    assert forest.estimator.batches == [COMPILED_MAX_ROWS + 1]
+
+    # Without an estimator every batch is walked on the flat arrays
+    forest.estimator = None
+    assert_parity(fitted, forest, X)
+    np.testing.assert_array_equal(forest.predict_proba(X), forest.flat_predict_proba(X))
+
+def test_inference_engine_uses_compiled_forest(fitted):
+    scorer, info = load_inference_engine(fitted, "compiled")
+    assert isinstance(scorer, CompiledForest), info.get("engine_error")
+    assert info["engine"] == "compiled"
+    assert info["engine_parity_max_diff"] <= PARITY_TOLERANCE
+
+def test_inference_engine_falls_back_for_other_models():
+    from sklearn.dummy import DummyClassifier
+    X, y = make_data()
+    model = DummyClassifier().fit(X, y)
+    scorer, info = load_inference_engine(model, "compiled")
+    assert scorer is model
+    assert info["engine"] == "sklearn" and "engine_error" in info
+
+def test_rejects_wrong_feature_count(fitted):
+    forest = CompiledForest.from_sklearn(fitted)
+    with pytest.raises(ValueError):
+        forest.predict_proba(np.zeros((3, N_FEATURES + 1)))
@@ -0,0 +1,157 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+from conftest import FEATURES, feature_rows
+from formats import encode_results, negotiate_format, resolve_output
+from utils import score_matrix
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, "json"),
+    ("application/vnd.apache.arrow.stream", "arrow"),
+    ("application/json;q=0.5, application/vnd.apache.parquet", "parquet"),
+    ("application/vnd.apache.parquet;q=0, application/vnd.exovision.columnar+json;q=0.1", "columnar"),
+    ("text/html", "json")
+])
+def test_negotiate_format(accept, expected):
+    assert negotiate_format(accept, ["json", "columnar", "arrow", "parquet"]) == expected
+
+def test_explicit_output_must_be_allowed():
+    from fastapi import HTTPException
+    assert resolve_output("arrow", "application/json", ["json", "arrow"]) == "arrow"
+    with pytest.raises(HTTPException) as raised:
+        resolve_output("csv", None, ["json", "arrow"])
+    assert raised.value.status_code == 400
+
+def read_table(fmt, body):
+    pa = pytest.importorskip("pyarrow")
+    if fmt == "arrow":
+        return pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+    import pyarrow.parquet as pq
+    return pq.read_table(pa.BufferReader(body))
+
+def test_columnar_results(forest, training_data):
+    X, _ = training_data
+    predictions, confidences, probabilities = score_matrix(forest, X[:20])
+    response = encode_results("columnar", predictions, confidences, probabilities, summary={"rows": 20})
+    content = json.loads(response.body)
+
+    assert response.media_type == "application/vnd.exovision.columnar+json"
+    assert content["row"] == list(range(1, 21)) and content["count"] == 20
+    assert content["prediction"] == np.where(predictions == 1, "confirmed", "false-positive").tolist()
+    np.testing.assert_array_equal(content["confidence"], confidences)
+    np.testing.assert_array_equal(content["p_confirmed"], probabilities[:, 1])
+    assert content["summary"] == {"rows": 20}
+
+@pytest.mark.parametrize("fmt", ["arrow", "parquet"])
+def test_arrow_and_parquet_results(fmt, forest, training_data):
+    X, _ = training_data
+    predictions, confidences, probabilities = score_matrix(forest, X[:20])
+    response = encode_results(fmt, predictions, confidences, probabilities, summary={"rows": 20})
+    table = read_table(fmt, response.body)
+
+    assert table.column_names == ["row", "prediction", "confidence", "p_confirmed"]
+    assert table.column("row").to_pylist() == list(range(1, 21))
+    assert table.column("prediction").to_pylist() == \
+        np.where(predictions == 1, "confirmed", "false-positive").tolist()
+    np.testing.assert_array_equal(table.column("p_confirmed").to_numpy(), probabilities[:, 1])
+    assert json.loads(table.schema.metadata[b"summary"]) == {"rows": 20}
+
+@pytest.mark.parametrize("fmt", ["columnar", "arrow", "parquet"])
+def test_batch_endpoint_negotiates_formats(api, training_data, fmt):
+    from formats import MEDIA_TYPES
+    X, _ = training_data
+    rows = feature_rows(X[:15])
+    expected = api.post("/api/predict-batch", json={"data": rows}).json()["predictions"]
+
+    response = api.post("/api/predict-batch", json={"data": rows}, headers={"Accept": MEDIA_TYPES[fmt][0]})
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith(MEDIA_TYPES[fmt][0])
+    if fmt == "columnar":
+        p_confirmed = response.json()["p_confirmed"]
+    else:
+        p_confirmed = read_table(fmt, response.content).column("p_confirmed").to_pylist()
+    assert p_confirmed == [row["probabilities"]["confirmed"] for row in expected]
+
+def npy_body(X):
+    buffer = io.BytesIO()
+    np.save(buffer, X, allow_pickle=False)
+    return buffer.getvalue()
+
+def test_npy_input_is_not_copied(training_data):
+    from formats import decode_matrix
+    X, _ = training_data
+    body = npy_body(X)
+    matrix, columns = decode_matrix("npy", body, None, FEATURES)
+
+    np.testing.assert_array_equal(matrix, X)
+    assert columns == FEATURES
+    assert not matrix.flags.writeable and not matrix.flags.owndata
+
+    from models import feature_matrix_from_array
+    assert np.shares_memory(feature_matrix_from_array(matrix, columns), matrix)
+
+def test_invalid_npy_bodies():
+    from fastapi import HTTPException
+    from formats import read_npy
+    from numpy.lib import format as npy_format
+    header = io.BytesIO()
+    npy_format.write_array_header_1_0(header, {"descr": "|O", "fortran_order": False, "shape": (2,)})
+
+    for body in [b"not a matrix", npy_body(np.zeros((4, 6)))[:-8], header.getvalue() + bytes(16)]:
+        with pytest.raises(HTTPException) as raised:
+            read_npy(body)
+        assert raised.value.status_code == 400
+
+def test_arrow_fixed_size_list_is_a_view(training_data):
+    pa = pytest.importorskip("pyarrow")
+    from formats import decode_matrix
+    X, _ = training_data
+    values = pa.array(X.ravel())
+    table = pa.table({"features": pa.FixedSizeListArray.from_arrays(values, 6)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    matrix, columns = decode_matrix("arrow", sink.getvalue().to_pybytes(), None, FEATURES)
+    np.testing.assert_array_equal(matrix, X)
+    assert columns == FEATURES and not matrix.flags.owndata
+
+def test_parquet_columns_in_any_order(training_data):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    from formats import decode_matrix
+    X, _ = training_data
+    table = pa.table({name: X[:, j] for j, name in reversed(list(enumerate(FEATURES)))})
+    table = table.append_column("kepid", pa.array(np.arange(len(X))))
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer)
+
+    matrix, columns = decode_matrix("parquet", buffer.getvalue(), None, FEATURES)
+    assert columns == FEATURES
+    np.testing.assert_array_equal(matrix, X)
+
+def test_binary_endpoint_matches_batch(api, training_data):
+    X, _ = training_data
+    expected = api.post("/api/predict-batch", json={"data": feature_rows(X[:25])}).json()["predictions"]
+
+    # Columns declared in a different order than the model's
+    order = FEATURES[::-1]
+    body = npy_body(np.ascontiguousarray(X[:25, ::-1]))
+    response = api.post(
+        "/api/predict-binary", content=body,
+        params={"features": ",".join(order)}, headers={"Content-Type": "application/x-npy"}
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["predictions"] == expected
+
+    response = api.post("/api/predict-binary", content=body, headers={"Content-Type": "text/plain"})
+    assert response.status_code == 415
+
+    bad = X[:3].copy()
+    bad[1, 5] = 2.0
+    response = api.post("/api/predict-binary?input=npy", content=npy_body(bad))
+    assert response.status_code == 422
+    assert [error["loc"] for error in response.json()["detail"]] == [["body", "koi_score", 1]]
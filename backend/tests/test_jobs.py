@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import pandas as pd
+import pytest
+
+from conftest import FEATURES
+from jobs import DATA_FILE, JOB_STAGES, MODEL_FILE, JobStore, TrainingJobs
+
+def write_csv(path, training_data, label=True):
+    X, y = training_data
+    df = pd.DataFrame(X, columns=FEATURES)
+    if label:
+        df["label"] = y
+    df.to_csv(path, index=False)
+    return path
+
+async def wait_for(jobs, job_id, condition, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = jobs.store.read(job_id)
+        if condition(status):
+            return status
+        await asyncio.sleep(0.05)
+    raise AssertionError(f"Job {job_id} stuck in {jobs.store.read(job_id)}")
+
+def finished(status):
+    return status["state"] in ("succeeded", "failed", "cancelled")
+
+def make_jobs(tmp_path, installed):
+    async def install(status, job_dir):
+        installed.append((status["id"], (job_dir / MODEL_FILE).exists()))
+        return {"model_info": {"filename": "model.joblib"}}
+    return TrainingJobs(JobStore(tmp_path / "jobs"), install, max_concurrent=1, poll_seconds=0.05)
+
+PARAMS = {"mode": "full", "test_size": 0.2, "random_state": 0, "activate": True}
+
+def test_job_reports_every_stage_and_installs_the_model(tmp_path, training_data):
+    installed = []
+
+    async def scenario():
+        jobs = make_jobs(tmp_path, installed)
+        status = jobs.submit(write_csv(tmp_path / "train.csv", training_data), FEATURES, PARAMS)
+        assert status["state"] == "queued"
+        return await wait_for(jobs, status["id"], finished)
+
+    status = asyncio.run(scenario())
+    assert status["state"] == "succeeded", status["error"]
+    assert status["progress"] == 1.0
+    assert list(status["stages"]) == [stage for stage in JOB_STAGES if stage != "tune"]
+    assert all(timing["seconds"] is not None for timing in status["stages"].values())
+    assert status["metrics"]["test_samples"] == 80
+    assert installed == [(status["id"], True)]
+    assert status["model_info"] == {"filename": "model.joblib"}
+    # Intermediate files go once the job is done
+    assert not (tmp_path / "jobs" / status["id"] / DATA_FILE).exists()
+
+def test_bad_input_fails_the_job(tmp_path, training_data):
+    installed = []
+
+    async def scenario():
+        jobs = make_jobs(tmp_path, installed)
+        status = jobs.submit(write_csv(tmp_path / "train.csv", training_data, label=False), FEATURES, PARAMS)
+        return await wait_for(jobs, status["id"], finished)
+
+    status = asyncio.run(scenario())
+    assert status["state"] == "failed"
+    assert status["error"] == "Missing required columns: label"
+    assert installed == []
+
+def test_cancel_running_and_queued_jobs(tmp_path, training_data):
+    installed = []
+    tuned = {**PARAMS, "mode": "tuned", "tune_seconds": 60, "tune_workers": 1}
+
+    async def scenario():
+        jobs = make_jobs(tmp_path, installed)
+        running = jobs.submit(write_csv(tmp_path / "a.csv", training_data), FEATURES, tuned)
+        queued = jobs.submit(write_csv(tmp_path / "b.csv", training_data), FEATURES, PARAMS)
+        await wait_for(jobs, running["id"], lambda status: status["stage"] == "tune")
+
+        assert jobs.cancel(queued["id"])["state"] == "queued"
+        jobs.cancel(running["id"])
+        started = time.monotonic()
+        running = await wait_for(jobs, running["id"], finished)
+        assert time.monotonic() - started < 10
+        return running, await wait_for(jobs, queued["id"], finished)
+
+    running, queued = asyncio.run(scenario())
+    assert running["state"] == "cancelled" and running["stage"] == "tune"
+    assert queued["state"] == "cancelled" and queued["started_at"] is None
+    assert installed == []
+
+def test_store_rejects_invalid_ids(tmp_path):
+    store = JobStore(tmp_path)
+    with pytest.raises(ValueError):
+        store.job_dir("../etc")
+    assert store.read("0" * 32) is None
@@ -0,0 +1,53 @@
+import functools
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from sklearn.model_selection import StratifiedKFold
+
+# The training scripts import their helpers flat from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+
+from kfold import METRICS, SharedArray, cross_validate, fold_metrics, format_summary
+from tuning import build_model
+
+def test_shared_array_is_attached_without_copying():
+    X = np.arange(12, dtype=np.float64).reshape(3, 4)
+    with SharedArray(X) as owner:
+        attached = SharedArray(handle=owner.handle)
+        np.testing.assert_array_equal(attached.array, X)
+        owner.array[1, 2] = -1
+        assert attached.array[1, 2] == -1
+        attached.close()
+        name = owner.handle["name"]
+
+    # The owner unlinks the block when done
+    with pytest.raises(FileNotFoundError):
+        SharedArray(handle={"name": name, "shape": (3, 4), "dtype": "<f8"})
+
+def test_parallel_folds_match_sequential_fits(training_data):
+    X, y = training_data
+    factories = {
+        "shallow": functools.partial(build_model, "random_forest", {"max_depth": 3}, 15, 0),
+        "deep": functools.partial(build_model, "random_forest", {"max_depth": None}, 15, 0)
+    }
+    result = cross_validate(factories, X, y, n_folds=4, random_state=7, n_workers=2)
+
+    assert result["n_folds"] == 4 and result["workers"] == 2
+    splits = list(StratifiedKFold(4, shuffle=True, random_state=7).split(X, y))
+    for name, factory in factories.items():
+        folds = result["models"][name]["folds"]
+        assert [fold["fold"] for fold in folds] == [0, 1, 2, 3]
+        for fold, (train, test) in zip(folds, splits):
+            model = factory(1).fit(X[train], y[train])
+            p_confirmed = model.predict_proba(X[test])[:, 1]
+            expected = fold_metrics(y[test], (p_confirmed > 0.5).astype(int), p_confirmed)
+            assert {metric: fold[metric] for metric in METRICS} == pytest.approx(expected)
+            assert fold["train_samples"] == len(train) and fold["test_samples"] == len(test)
+
+        metrics = result["models"][name]["metrics"]
+        accuracies = [fold["accuracy"] for fold in folds]
+        assert metrics["accuracy"]["mean"] == pytest.approx(np.mean(accuracies))
+        assert metrics["accuracy"]["std"] == pytest.approx(np.std(accuracies, ddof=1))
+        assert format_summary(name, result["models"][name]).startswith(f"{name} (4 folds):")
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from conftest import FEATURES
+from models import (
+    ColumnarValidationError, ExoplanetFeatures, feature_matrix_from_array, feature_matrix_from_columns
+)
+
+VALID = {"orbital_period": 10.0, "transit_duration": 3.0, "transit_depth": 500.0,
+         "planet_radius": 1.5, "signal_to_noise": 20.0, "koi_score": 0.5}
+
+def columns_of(rows):
+    return {name: [row[name] for row in rows] for name in FEATURES}
+
+def columnar_errors(columns):
+    with pytest.raises(ColumnarValidationError) as raised:
+        feature_matrix_from_columns(columns)
+    return [(error["loc"], error["type"]) for error in raised.value.errors]
+
+def test_valid_columns_decode_in_feature_order():
+    X = feature_matrix_from_columns(columns_of([VALID, VALID]), "float32")
+    assert X.dtype == np.float32 and X.flags.c_contiguous
+    np.testing.assert_array_equal(X[0], [VALID[name] for name in FEATURES])
+
+@pytest.mark.parametrize("name, value", [
+    ("koi_score", None), ("orbital_period", None), ("koi_score", 1.5), ("transit_depth", 0.0)
+])
+def test_errors_match_pydantic(name, value):
+    row = dict(VALID, **{name: value})
+    with pytest.raises(ValidationError) as raised:
+        ExoplanetFeatures(**row)
+    expected = [(["body", name, 1], error["type"]) for error in raised.value.errors()]
+
+    assert columnar_errors(columns_of([VALID, row])) == expected
+
+@pytest.mark.parametrize("value", [float("nan"), float("inf"), -float("inf")])
+def test_non_finite_values_give_one_error(value):
+    row = dict(VALID, koi_score=value)
+    assert columnar_errors(columns_of([row])) == [(["body", "koi_score", 0], "finite_number")]
+
+def test_one_error_per_bad_cell_in_row_order():
+    rows = [dict(VALID) for _ in range(5)]
+    rows[0]["koi_score"] = 2.0
+    rows[1]["koi_score"] = None
+    rows[3]["koi_score"] = -1.0
+    rows[4]["koi_score"] = float("nan")
+    rows[2]["planet_radius"] = None
+
+    assert columnar_errors(columns_of(rows)) == [
+        (["body", "planet_radius", 2], "float_type"),
+        (["body", "koi_score", 0], "less_than_equal"),
+        (["body", "koi_score", 1], "float_type"),
+        (["body", "koi_score", 3], "greater_than_equal"),
+        (["body", "koi_score", 4], "finite_number")
+    ]
+
+def test_column_shape_errors():
+    columns = columns_of([VALID, VALID])
+    columns["transit_depth"] = [1.0]
+    columns["koi_score"] = "0.5"
+    del columns["orbital_period"]
+    assert columnar_errors(columns) == [(["body", "orbital_period"], "missing")]
+
+    columns["orbital_period"] = [1.0, 2.0]
+    assert columnar_errors(columns) == [
+        (["body", "transit_depth"], "length_mismatch"), (["body", "koi_score"], "list_type")
+    ]
+
+def test_binary_matrix_errors():
+    X = np.array([[VALID[name] for name in FEATURES]] * 3)
+    X[0, 5] = np.nan
+    X[2, 0] = -1.0
+    with pytest.raises(ColumnarValidationError) as raised:
+        feature_matrix_from_array(X, FEATURES)
+    assert [(error["loc"], error["type"]) for error in raised.value.errors] == [
+        (["body", "orbital_period", 2], "greater_than"), (["body", "koi_score", 0], "finite_number")
+    ]
+
+def test_columnar_endpoint_reports_cell_locations(api):
+    rows = [dict(VALID), dict(VALID, koi_score=None)]
+    response = api.post("/api/predict-columnar", json=columns_of(rows))
+    assert response.status_code == 422
+    assert response.json()["detail"] == [{
+        "loc": ["body", "koi_score", 1], "msg": "Input should be a valid number", "type": "float_type", "input": None
+    }]
+
+    response = api.post("/api/predict-columnar", json=columns_of([VALID]))
+    assert response.status_code == 200, response.text
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from sklearn.naive_bayes import GaussianNB
+
+from conftest import FEATURES
+from online import OnlineGaussianNB, OnlineModelStore
+
+def test_partial_fit_matches_gaussian_nb(training_data):
+    X, y = training_data
+    model = OnlineGaussianNB(FEATURES)
+    for start in range(0, len(X), 37):
+        model.partial_fit(X[start:start + 37], y[start:start + 37])
+    reference = GaussianNB().fit(X, y)
+
+    np.testing.assert_array_equal(model.class_count_, reference.class_count_)
+    np.testing.assert_allclose([stats.mean for stats in model.stats_], reference.theta_, rtol=1e-10)
+    np.testing.assert_allclose(
+        [stats.variance for stats in model.stats_], reference.var_ - reference.epsilon_, rtol=1e-8
+    )
+    np.testing.assert_allclose(model.predict_proba(X), reference.predict_proba(X), atol=1e-9)
+    np.testing.assert_array_equal(model.predict(X), reference.predict(X))
+
+def test_unknown_labels_and_unseen_classes(training_data):
+    X, y = training_data
+    model = OnlineGaussianNB(FEATURES)
+    with pytest.raises(ValueError):
+        model.partial_fit(X[:2], [0, 2])
+
+    model.partial_fit(X[y == 0][:5], np.zeros(5, dtype=int))
+    assert not model.ready()
+    with pytest.raises(ValueError):
+        model.predict_proba(X[:1])
+
+def test_store_scores_each_batch_before_learning_it(tmp_path, training_data):
+    X, y = training_data
+    store = OnlineModelStore(tmp_path / "online" / "state.json", FEATURES)
+    assert store.partial_fit(X[:200], y[:200]) == {"revision": 1, "rows": 200}
+    assert store.status()["prequential"] is None
+
+    before = store.model()
+    assert store.partial_fit(X[200:], y[200:])["revision"] == 2
+    status = store.status()
+    assert status["ready"] and status["prequential"]["count"] == 200
+    expected_accuracy = np.mean(before.predict(X[200:]) == y[200:])
+    assert status["prequential"]["accuracy"] == pytest.approx(expected_accuracy)
+
+    # Another worker reads the same state from disk
+    other = OnlineModelStore(tmp_path / "online" / "state.json", FEATURES)
+    assert other.status()["revision"] == 2
+    np.testing.assert_allclose(
+        other.model().predict_proba(X), GaussianNB().fit(X, y).predict_proba(X), atol=1e-9
+    )
@@ -0,0 +1,93 @@
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from registry import INDEX_FILENAME, ModelNotFoundError, ModelRegistry
+from utils import file_digest
+
+@pytest.fixture
+def model_dir(tmp_path):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 4))
+    y = (X[:, 0] > 0).astype(int)
+    directory = tmp_path / "models"
+    directory.mkdir()
+    for i in range(3):
+        model = RandomForestClassifier(n_estimators=10 + i, max_depth=6, random_state=i).fit(X, y)
+        joblib.dump(model, directory / f"model_{i}.joblib")
+    return directory
+
+def test_eviction_keeps_handed_out_entries_usable(model_dir):
+    registry = ModelRegistry([model_dir], 1, "sklearn")
+    registry.scan()
+    in_use = registry.load("model_0")
+    registry.load("model_1")
+
+    assert registry.stats()["evictions"] == 1
+    assert not registry.resolve("model_0").loaded
+    assert in_use.scorer is not None
+    in_use.scorer.predict_proba(np.zeros((1, 4)))
+
+    reloaded = registry.load("model_0")
+    assert reloaded is not in_use and reloaded.loaded
+
+def test_active_model_is_not_evicted(model_dir):
+    registry = ModelRegistry([model_dir], 1, "sklearn")
+    registry.scan()
+    registry.set_active("model_0")
+    registry.load("model_0")
+    registry.load("model_1")
+    registry.load("model_2")
+    assert registry.resolve("model_0").loaded
+    assert not registry.resolve("model_1").loaded
+
+def test_resolve_unknown_model(model_dir):
+    registry = ModelRegistry([model_dir], 1 << 30)
+    registry.scan()
+    with pytest.raises(ModelNotFoundError):
+        registry.resolve("missing")
+
+def test_scan_indexes_by_content_without_loading(model_dir):
+    import shutil
+    shutil.copy(model_dir / "model_0.joblib", model_dir / "copy_of_0.pkl")
+    (model_dir / "notes.txt").write_text("not a model")
+
+    registry = ModelRegistry([model_dir], 1 << 30)
+    assert registry.scan() == 3
+    entry = registry.resolve("model_0")
+    assert entry.version == file_digest(model_dir / "model_0.joblib")
+    assert registry.resolve("copy_of_0.pkl") is entry
+    assert registry.resolve(entry.version[:8]) is entry
+    assert registry.stats()["loaded"] == 0
+
+def test_index_skips_hashing_unchanged_files(model_dir, monkeypatch):
+    ModelRegistry([model_dir], 1 << 30).scan()
+    assert (model_dir / INDEX_FILENAME).exists()
+
+    import registry as registry_module
+    def fail(path):
+        raise AssertionError(f"{path} hashed again")
+    monkeypatch.setattr(registry_module, "file_digest", fail)
+    registry = ModelRegistry([model_dir], 1 << 30)
+    assert registry.scan() == 3
+
+    (model_dir / "model_2.joblib").unlink()
+    assert registry.scan() == 2
+    with pytest.raises(ModelNotFoundError):
+        registry.resolve("model_2")
+
+def test_loaded_models_stay_within_the_memory_budget(model_dir):
+    registry = ModelRegistry([model_dir], 1 << 30)
+    registry.scan()
+    sizes = [registry.load(f"model_{i}").resident_bytes for i in range(3)]
+    assert min(sizes) > 0 and registry.stats()["loaded"] == 3
+
+    registry = ModelRegistry([model_dir], sizes[0] + sizes[1] + sizes[2] - 1)
+    registry.scan()
+    for i in range(3):
+        registry.load(f"model_{i}")
+    stats = registry.stats()
+    assert stats["loaded"] == 2 and stats["evictions"] == 1
+    assert stats["resident_bytes"] <= stats["memory_budget_bytes"]
+    assert registry.loaded("model_0") is None
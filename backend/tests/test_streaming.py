@@ -0,0 +1,50 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import FEATURES
+
+def csv_upload(X):
+    return pd.DataFrame(X, columns=FEATURES).to_csv(index=False).encode()
+
+def test_ndjson_stream_matches_the_model(api, forest, training_data):
+    X, _ = training_data
+    response = api.post("/api/predict-csv?output=ndjson&chunk_size=64", files={"file": ("a.csv", csv_upload(X))})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    *records, last = [json.loads(line) for line in response.text.strip().split("\n")]
+    assert [record["row"] for record in records] == list(range(1, len(X) + 1))
+    np.testing.assert_allclose(
+        [record["probabilities"]["confirmed"] for record in records], forest.predict_proba(X)[:, 1]
+    )
+
+    # The last record summarizes the whole file, like the buffered endpoint
+    predictions = forest.predict(X)
+    assert last["summary"]["total"] == len(X)
+    assert last["summary"]["confirmed"] == int(predictions.sum())
+    buffered = api.post("/api/predict-csv", files={"file": ("a.csv", csv_upload(X))}).json()
+    assert last["summary"]["confirmed"] == buffered["summary"]["confirmed"]
+    assert last["summary"]["avg_confidence"] == pytest.approx(buffered["summary"]["avg_confidence"])
+
+def test_csv_stream_ends_with_a_summary_comment(api, training_data):
+    X, _ = training_data
+    response = api.post("/api/predict-csv?output=csv&chunk_size=100", files={"file": ("a.csv", csv_upload(X[:250]))})
+    lines = response.text.strip().split("\n")
+    assert lines[0] == "row,prediction,confidence,p_false_positive,p_confirmed"
+    assert len(lines) == 1 + 250 + 1
+    assert lines[-1].startswith("# ")
+    assert json.loads(lines[-1][2:])["summary"]["total"] == 250
+
+def test_stream_reads_the_upload_in_place(api, training_data):
+    X, _ = training_data
+    api.post("/api/predict-csv?output=ndjson", files={"file": ("a.csv", csv_upload(X))})
+    assert os.listdir("uploads") == []
+
+def test_stream_rejects_missing_columns(api):
+    response = api.post("/api/predict-csv?output=ndjson", files={"file": ("a.csv", b"a,b\n1,2\n")})
+    assert response.status_code == 400
+    assert "Missing required columns" in response.json()["detail"]
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from training import grow_random_forest, summarize_provenance, train_random_forest
+
+def test_growth_adds_trees_fitted_on_the_new_rows_only(training_data):
+    X, y = training_data
+    model, _, _ = train_random_forest(X[:200], y[:200], random_state=0, source={"dataset": "base"})
+    base_trees = list(model.estimators_)
+
+    model, metrics, holdout = grow_random_forest(
+        model, X[200:], y[200:], new_trees=10, random_state=0, source={"dataset": "new"}
+    )
+    assert metrics["trees_added"] == 10 and metrics["trees_retired"] == 0
+    assert len(model.estimators_) == len(base_trees) + 10 == model.n_estimators
+    # Existing trees are kept as they were
+    assert all(old is new for old, new in zip(base_trees, model.estimators_))
+    assert len(holdout["y_true"]) == metrics["test_samples"] == 40
+    assert not model.warm_start
+
+    runs = summarize_provenance(model.tree_provenance_)
+    assert [(run["dataset"], run["trees"], run["rows"]) for run in runs] == [
+        ("base", len(base_trees), 160), ("new", 10, 160)
+    ]
+
+def test_growth_retires_the_oldest_trees(training_data):
+    X, y = training_data
+    model, _, _ = train_random_forest(X[:200], y[:200], random_state=0)
+    model, _, _ = grow_random_forest(model, X[200:], y[200:], new_trees=10, max_trees=50)
+    model, metrics, _ = grow_random_forest(model, X[200:], y[200:], new_trees=10, max_trees=50)
+
+    assert len(model.estimators_) == 50 == model.n_estimators
+    assert metrics["trees_retired"] == 10
+    assert len(model.tree_provenance_) == 50
+    # Successive updates draw different bootstrap seeds
+    assert model.estimators_[-1].random_state != model.estimators_[-11].random_state
+
+def test_growth_needs_every_class(training_data):
+    X, y = training_data
+    model, _, _ = train_random_forest(X, y, random_state=0)
+    with pytest.raises(ValueError, match="every class"):
+        grow_random_forest(model, X[y == 1], y[y == 1])
+    with pytest.raises(ValueError, match="Not enough new rows"):
+        grow_random_forest(model, X[:6], np.array([0, 1, 1, 1, 1, 1]))
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+import tuning
+from tuning import (
+    DEFAULT_PARAMS, FoldCache, final_estimators, load_hyperparameters, sample_configs,
+    save_hyperparameters, successive_halving
+)
+
+@pytest.fixture
+def small_search(monkeypatch):
+    """Two rungs of three configurations with few trees, to finish quickly"""
+    monkeypatch.setattr(tuning, "N_RUNGS", 2)
+    monkeypatch.setattr(tuning, "MAX_TREES", {"random_forest": 12, "hist_gradient_boosting": 12})
+
+def test_search_finishes_within_budget(small_search, training_data):
+    X, y = training_data
+    progress = []
+    result = successive_halving(X, y, budget_seconds=120, n_workers=1, progress=progress.append)
+
+    assert [rung["complete"] for rung in result["rungs"]] == [True, True]
+    assert [rung["trials"] for rung in result["rungs"]] == [3, 1]
+    assert progress == result["rungs"]
+    assert result["elapsed_seconds"] < 120
+    assert result["rungs"][1]["rows"] == len(y)
+
+    best = result["best"]
+    assert best["family"] in tuning.SEARCH_SPACES
+    assert best["scored_with"] == {"n_estimators": 12, "rows": len(y)}
+    assert result["cv_scores"]["log_loss"] == result["rungs"][-1]["best_log_loss"]
+
+def test_exhausted_budget_stops_the_search(training_data):
+    X, y = training_data
+    result = successive_halving(X, y, budget_seconds=0.01, n_workers=1)
+
+    assert result["best"] == DEFAULT_PARAMS
+    assert result["cv_scores"] == {"log_loss": None, "accuracy": None}
+    assert result["rungs"][-1]["complete"] is False
+    # Trials still running are terminated rather than awaited
+    assert result["elapsed_seconds"] < 10
+
+def test_sample_configs_are_distinct_and_alternate():
+    configs = sample_configs(9, ["random_forest", "hist_gradient_boosting"])
+    assert len(configs) == 9
+    assert len({repr(config) for config in configs}) == 9
+    assert [config["family"] for config in configs[:2]] == ["random_forest", "hist_gradient_boosting"]
+
+def test_fold_cache_stratifies_subsamples(training_data):
+    _, y = training_data
+    folds = FoldCache(y)
+    splits = folds.splits(120)
+    assert folds.splits(120) is splits
+    rows = np.concatenate([test for _, test in splits])
+    assert len(rows) == len(np.unique(rows)) == 120
+    assert abs(y[rows].mean() - y.mean()) < 0.02
+
+def test_final_estimators():
+    assert final_estimators("random_forest", 50, 100, 300) == 150
+    assert final_estimators("random_forest", 300, 100, 1000) == tuning.MAX_TREES["random_forest"]
+    assert final_estimators("hist_gradient_boosting", 50, 100, 300) == 50
+
+def test_hyperparameters_round_trip(tmp_path):
+    path = tmp_path / "tuning" / "best.json"
+    assert load_hyperparameters(path) == DEFAULT_PARAMS
+    best = {"family": "random_forest", "params": {"max_depth": 8}, "n_estimators": 120}
+    save_hyperparameters(path, {"best": best})
+    assert load_hyperparameters(path) == best
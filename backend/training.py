@@ -0,0 +1,237 @@
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+def _evaluate(model, X_test: np.ndarray, y_test: np.ndarray,
+              train_samples: int) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """Holdout metrics and predictions of a fitted model"""
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+    
+    p_confirmed = model.predict_proba(X_test)[:, list(model.classes_).index(1)]
+    y_pred = (p_confirmed > 0.5).astype(int)
+    
+    metrics = {
+        "accuracy": float(accuracy_score(y_test, y_pred)),
+        "precision": float(precision_score(y_test, y_pred, zero_division=0)),
+        "recall": float(recall_score(y_test, y_pred, zero_division=0)),
+        "f1_score": float(f1_score(y_test, y_pred, zero_division=0)),
+        "train_samples": train_samples,
+        "test_samples": len(X_test)
+    }
+    
+    holdout = {
+        "y_true": np.asarray(y_test),
+        "y_pred": y_pred,
+        "p_confirmed": p_confirmed
+    }
+    
+    return metrics, holdout
+
+def summarize_provenance(provenance: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Group per-tree provenance records into runs of trees grown together
+    
+    Args:
+        provenance: One record per tree, oldest tree first
+    
+    Returns:
+        One record per training run with its tree count, oldest first
+    """
+    runs = []
+    for record in provenance:
+        if runs and all(runs[-1].get(key) == value for key, value in record.items()):
+            runs[-1]["trees"] += 1
+        else:
+            runs.append({**record, "trees": 1})
+    return runs
+
+def train_random_forest(X: np.ndarray, y: np.ndarray, test_size: float = 0.2,
+                        random_state: int = 42,
+                        progress: Optional[Callable[[str], None]] = None,
+                        source: Optional[Dict[str, Any]] = None
+                        ) -> Tuple[Any, Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Fit a Random Forest on a train split and evaluate it on the holdout
+    
+    Args:
+        X: Feature matrix
+        y: Labels (1 = confirmed, 0 = false positive)
+        test_size: Proportion of data to use for testing
+        random_state: Random seed for reproducibility
+        progress: Called with 'split', 'fit' and 'evaluate' as each step starts
+        source: Description of the training data (e.g. dataset hash), kept
+            per tree in the model's ``tree_provenance_``
+    
+    Returns:
+        Tuple of (fitted model, holdout metrics, holdout predictions with
+        y_true, y_pred and p_confirmed arrays)
+    """
+    from sklearn.model_selection import train_test_split
+    from tuning import DEFAULT_PARAMS, build_model
+    
+    if progress is not None:
+        progress("split")
+    
+    # Split data
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=random_state
+    )
+    
+    if progress is not None:
+        progress("fit")
+    
+    # Train a new Random Forest model
+    model = build_model(
+        DEFAULT_PARAMS["family"], DEFAULT_PARAMS["params"], DEFAULT_PARAMS["n_estimators"],
+        random_state, n_jobs=-1
+    )
+    model.fit(X_train, y_train)
+    model.tree_provenance_ = [{**(source or {}), "rows": len(X_train)}] * len(model.estimators_)
+    
+    if progress is not None:
+        progress("evaluate")
+    
+    # Evaluate on test set
+    metrics, holdout = _evaluate(model, X_test, y_test, len(X_train))
+    
+    return model, metrics, holdout
+
+def train_tuned_model(X: np.ndarray, y: np.ndarray, budget_seconds: float,
+                      test_size: float = 0.2, random_state: int = 42,
+                      n_workers: Optional[int] = None,
+                      progress: Optional[Callable[[str], None]] = None,
+                      source: Optional[Dict[str, Any]] = None
+                      ) -> Tuple[Any, Dict[str, Any], Dict[str, np.ndarray], Dict[str, Any]]:
+    """
+    Search hyperparameters on a train split, then fit and evaluate the best
+    
+    The search only sees the train split, so the holdout metrics are not
+    biased by the tuning.
+    
+    Args:
+        X: Feature matrix
+        y: Labels (1 = confirmed, 0 = false positive)
+        budget_seconds: Wall-clock budget of the search
+        test_size: Proportion of data to use for testing
+        random_state: Random seed for reproducibility
+        n_workers: Parallel trials (default: CPU count)
+        progress: Called with 'split', 'tune', 'fit' and 'evaluate' as each
+            step starts
+        source: Description of the training data, kept per tree of a forest
+            in ``tree_provenance_``
+    
+    Returns:
+        Tuple of (fitted model, holdout metrics, holdout predictions, tuning
+        result of ``tuning.successive_halving``)
+    """
+    from sklearn.model_selection import train_test_split
+    from tuning import build_model, successive_halving
+    
+    if progress is not None:
+        progress("split")
+    
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=random_state
+    )
+    
+    if progress is not None:
+        progress("tune")
+    
+    tuning = successive_halving(
+        X_train, y_train, budget_seconds, n_workers=n_workers, random_state=random_state
+    )
+    best = tuning["best"]
+    
+    if progress is not None:
+        progress("fit")
+    
+    model = build_model(best["family"], best["params"], best["n_estimators"], random_state, n_jobs=-1)
+    model.fit(X_train, y_train)
+    if hasattr(model, "estimators_"):
+        model.tree_provenance_ = [{**(source or {}), "rows": len(X_train)}] * len(model.estimators_)
+    
+    if progress is not None:
+        progress("evaluate")
+    
+    metrics, holdout = _evaluate(model, X_test, y_test, len(X_train))
+    
+    return model, metrics, holdout, tuning
+
+def grow_random_forest(model, X: np.ndarray, y: np.ndarray, new_trees: int = 20,
+                       max_trees: Optional[int] = None, test_size: float = 0.2,
+                       random_state: int = 42,
+                       progress: Optional[Callable[[str], None]] = None,
+                       source: Optional[Dict[str, Any]] = None
+                       ) -> Tuple[Any, Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Add trees fitted on new labeled rows to an existing Random Forest
+    
+    Only the new trees are fitted, on the new rows only, so the cost grows
+    with the new data rather than with everything the forest has seen.
+    The oldest trees are retired when the forest would exceed ``max_trees``.
+    
+    Args:
+        model: Fitted RandomForestClassifier; it is modified in place
+        X: New feature matrix
+        y: New labels (1 = confirmed, 0 = false positive)
+        new_trees: Trees to add
+        max_trees: Largest ensemble to keep, or None for no limit
+        test_size: Proportion of the new rows used to evaluate the result
+        random_state: Random seed, combined with the forest's size so that
+            successive updates do not reuse bootstrap seeds
+        progress: Called with 'split', 'fit' and 'evaluate' as each step starts
+        source: Description of the new data, kept per tree in
+            ``tree_provenance_``
+    
+    Returns:
+        Tuple of (grown model, holdout metrics on the new rows with the
+        added and retired tree counts, holdout predictions)
+    """
+    from sklearn.model_selection import train_test_split
+    
+    if set(np.unique(y).tolist()) != set(model.classes_.tolist()):
+        raise ValueError(
+            f"New data must contain every class the model knows: {model.classes_.tolist()}"
+        )
+    
+    if progress is not None:
+        progress("split")
+    
+    # Stratified, so both classes reach the new trees whenever possible
+    try:
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=test_size, stratify=y, random_state=random_state
+        )
+    except ValueError:
+        raise ValueError("Not enough new rows of each class to train on after the holdout split")
+    if len(np.unique(y_train)) != len(model.classes_):
+        raise ValueError("Not enough new rows of each class to train on after the holdout split")
+    
+    if progress is not None:
+        progress("fit")
+    
+    provenance = list(getattr(model, "tree_provenance_", None) or [{"source": "base"}] * len(model.estimators_))
+    old_trees = len(model.estimators_)
+    
+    model.set_params(
+        warm_start=True,
+        n_estimators=old_trees + new_trees,
+        random_state=int(np.random.SeedSequence([random_state, old_trees]).generate_state(1)[0])
+    )
+    model.fit(X_train, y_train)
+    provenance += [{**(source or {}), "rows": len(X_train)}] * new_trees
+    
+    retired = 0
+    if max_trees is not None and len(model.estimators_) > max_trees:
+        retired = len(model.estimators_) - max_trees
+        model.estimators_ = model.estimators_[retired:]
+        provenance = provenance[retired:]
+    model.set_params(warm_start=False, n_estimators=len(model.estimators_))
+    model.tree_provenance_ = provenance
+    
+    if progress is not None:
+        progress("evaluate")
+    
+    metrics, holdout = _evaluate(model, X_test, y_test, len(X_train))
+    metrics.update({"trees_added": new_trees, "trees_retired": retired, "trees": len(model.estimators_)})
+    
+    return model, metrics, holdout
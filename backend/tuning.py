@@ -0,0 +1,317 @@
+import json
+import math
+import multiprocessing
+import os
+import queue
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Hyperparameters searched per model family; the tree count is not
+# searched, it is the resource successive halving allocates
+SEARCH_SPACES = {
+    "random_forest": {
+        "max_depth": [6, 8, 10, 14, None],
+        "min_samples_leaf": [1, 2, 4, 8],
+        "max_features": ["sqrt", "log2", 0.5, None],
+        "class_weight": [None, "balanced"]
+    },
+    "hist_gradient_boosting": {
+        "learning_rate": [0.03, 0.06, 0.1, 0.2],
+        "max_leaf_nodes": [15, 31, 63],
+        "min_samples_leaf": [5, 20, 50],
+        "l2_regularization": [0.0, 0.1, 1.0]
+    }
+}
+
+# Trees (forest) or boosting iterations (gradient boosting) at the last rung
+MAX_TREES = {"random_forest": 400, "hist_gradient_boosting": 400}
+
+# Configuration used without a search, or when no rung of it finished
+DEFAULT_PARAMS = {"family": "random_forest", "params": {"max_depth": 10}, "n_estimators": 100}
+
+# Configuration of the training scripts when no search result is saved
+SCRIPT_DEFAULT_PARAMS = {"family": "random_forest", "params": {"max_depth": 10}, "n_estimators": 200}
+
+# Survivors per rung are 1 / ETA of the trials, and each rung gets ETA
+# times the rows and trees of the previous one
+ETA = 3
+N_RUNGS = 4
+CV_FOLDS = 3
+
+def build_model(family: str, params: Dict[str, Any], n_estimators: int,
+                random_state: int = 42, n_jobs: int = 1):
+    """
+    Build an untrained model from a configuration
+
+    Args:
+        family: 'random_forest' or 'hist_gradient_boosting'
+        params: Hyperparameters from SEARCH_SPACES
+        n_estimators: Trees or boosting iterations
+        random_state: Random seed
+        n_jobs: Threads for the forest
+
+    Returns:
+        scikit-learn classifier
+    """
+    if family == "random_forest":
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(
+            n_estimators=n_estimators, random_state=random_state, n_jobs=n_jobs, **params
+        )
+    if family == "hist_gradient_boosting":
+        from sklearn.ensemble import HistGradientBoostingClassifier
+        return HistGradientBoostingClassifier(
+            max_iter=n_estimators, early_stopping=False, random_state=random_state, **params
+        )
+    raise ValueError(f"Unknown model family: {family}")
+
+def load_hyperparameters(path: Path, default: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Read a configuration saved by ``save_hyperparameters``
+
+    Args:
+        path: JSON file
+        default: Returned when there is no file (default: DEFAULT_PARAMS)
+
+    Returns:
+        Dictionary with 'family', 'params' and 'n_estimators'
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)["best"]
+    except FileNotFoundError:
+        return dict(default or DEFAULT_PARAMS)
+
+def save_hyperparameters(path: Path, tuning: Dict[str, Any]):
+    """Save the result of ``successive_halving`` for later trainings"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({**tuning, "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S")}, f, indent=2)
+    os.replace(tmp_path, path)
+
+class FoldCache:
+    """
+    Stratified fold splits computed once per subsample size
+
+    Every trial of a rung is scored on the same row subsample and the same
+    folds, which also makes their scores comparable.
+    """
+
+    def __init__(self, y: np.ndarray, n_folds: int = CV_FOLDS, random_state: int = 42):
+        self.y = np.asarray(y)
+        self.n_folds = n_folds
+        self.random_state = random_state
+        self._splits: Dict[int, List[Tuple[np.ndarray, np.ndarray]]] = {}
+
+    def splits(self, n_rows: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """(train, test) row indices of the folds over a stratified subsample of n_rows"""
+        if n_rows not in self._splits:
+            from sklearn.model_selection import StratifiedKFold
+            from sklearn.model_selection import train_test_split
+
+            rows = np.arange(len(self.y))
+            if n_rows < len(rows):
+                rows, _ = train_test_split(
+                    rows, train_size=n_rows, stratify=self.y, random_state=self.random_state
+                )
+            folds = StratifiedKFold(self.n_folds, shuffle=True, random_state=self.random_state)
+            self._splits[n_rows] = [
+                (rows[train], rows[test]) for train, test in folds.split(rows, self.y[rows])
+            ]
+        return self._splits[n_rows]
+
+# Training data of a trial worker process, set once by the pool initializer
+_worker_data: Dict[str, np.ndarray] = {}
+
+def _init_worker(X: np.ndarray, y: np.ndarray):
+    _worker_data["X"] = X
+    _worker_data["y"] = y
+
+def run_trial(config: Dict[str, Any], n_estimators: int,
+              splits: List[Tuple[np.ndarray, np.ndarray]], random_state: int) -> Dict[str, float]:
+    """
+    Cross-validate one configuration in a worker process
+
+    Returns:
+        Mean log loss and accuracy over the folds
+    """
+    from sklearn.metrics import accuracy_score, log_loss
+
+    X, y = _worker_data["X"], _worker_data["y"]
+    losses, accuracies = [], []
+    for train, test in splits:
+        model = build_model(config["family"], config["params"], n_estimators, random_state)
+        model.fit(X[train], y[train])
+        probabilities = model.predict_proba(X[test])
+        losses.append(log_loss(y[test], probabilities, labels=model.classes_))
+        accuracies.append(accuracy_score(y[test], model.classes_[np.argmax(probabilities, axis=1)]))
+    return {"log_loss": float(np.mean(losses)), "accuracy": float(np.mean(accuracies))}
+
+def sample_configs(n_configs: int, families: List[str], random_state: int = 42) -> List[Dict[str, Any]]:
+    """Draw distinct random configurations, alternating between model families"""
+    rng = np.random.default_rng(random_state)
+    configs, seen = [], set()
+    attempts = 0
+    while len(configs) < n_configs and attempts < n_configs * 20:
+        attempts += 1
+        family = families[len(configs) % len(families)]
+        space = SEARCH_SPACES[family]
+        params = {name: values[rng.integers(len(values))] for name, values in space.items()}
+        params = {name: value.item() if isinstance(value, np.generic) else value for name, value in params.items()}
+        key = (family, tuple(sorted((name, repr(value)) for name, value in params.items())))
+        if key not in seen:
+            seen.add(key)
+            configs.append({"family": family, "params": params})
+    return configs
+
+def final_estimators(family: str, n_estimators: int, rows: int, total_rows: int) -> int:
+    """
+    Trees or boosting iterations of the final fit of a configuration scored
+    with ``n_estimators`` on a subsample of ``rows``
+
+    A forest keeps the schedule's trees-per-row ratio, scaled up to the
+    full data and capped at MAX_TREES; more trees only lower its variance.
+    Boosting keeps exactly the iterations it was scored with, since more
+    iterations than were evaluated can overfit.
+    """
+    if family == "random_forest":
+        return min(MAX_TREES[family], max(n_estimators, math.ceil(n_estimators * total_rows / rows)))
+    return n_estimators
+
+def successive_halving(X: np.ndarray, y: np.ndarray, budget_seconds: float,
+                       families: Optional[List[str]] = None, n_workers: Optional[int] = None,
+                       random_state: int = 42,
+                       progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Search hyperparameters under a wall-clock budget
+
+    Starts ETA ** (N_RUNGS - 1) random configurations on a small row
+    subsample with few trees and keeps the best 1 / ETA of them for the
+    next rung, which gets ETA times the rows and trees. Trials of a rung
+    run in parallel in worker processes that receive the training data
+    once. When the budget runs out, unfinished trials are stopped and the
+    best configuration of the last complete rung wins (DEFAULT_PARAMS if
+    not even the first rung finished).
+
+    Args:
+        X: Feature matrix
+        y: Labels
+        budget_seconds: Wall-clock budget of the search
+        families: Model families to search (default: all of SEARCH_SPACES)
+        n_workers: Trial processes (default: CPU count)
+        random_state: Random seed of configurations, subsamples and models
+        progress: Called with each finished rung's summary
+
+    Returns:
+        Dictionary with the best configuration ('family', 'params',
+        'n_estimators' per ``final_estimators``, and the trees and rows it
+        was scored with under 'scored_with'), its scores, and a summary
+        per rung
+    """
+    started = time.perf_counter()
+    deadline = started + budget_seconds
+    families = families or list(SEARCH_SPACES)
+    n_workers = n_workers or os.cpu_count() or 1
+
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    y = np.asarray(y)
+    folds = FoldCache(y, random_state=random_state)
+
+    # Smallest rung: enough rows for every fold to hold both classes
+    min_rows = min(len(y), max(CV_FOLDS * 20, len(y) // ETA ** (N_RUNGS - 1)))
+    configs = sample_configs(ETA ** (N_RUNGS - 1), families, random_state)
+
+    best: Optional[Dict[str, Any]] = None
+    rungs = []
+
+    # Workers are stopped, not drained, when the budget runs out, so the
+    # final fit does not compete with abandoned trials
+    pool = multiprocessing.get_context("spawn").Pool(
+        processes=n_workers, initializer=_init_worker, initargs=(X, y)
+    )
+    try:
+        for rung in range(N_RUNGS):
+            scale = ETA ** rung / ETA ** (N_RUNGS - 1)
+            n_rows = min(len(y), max(min_rows, math.ceil(len(y) * scale)))
+            splits = folds.splits(n_rows)
+            rung_started = time.perf_counter()
+
+            finished: queue.Queue = queue.Queue()
+            for i, config in enumerate(configs):
+                n_estimators = max(10, math.ceil(MAX_TREES[config["family"]] * scale))
+                pool.apply_async(
+                    run_trial, (config, n_estimators, splits, random_state),
+                    callback=lambda scores, i=i, n=n_estimators: finished.put((i, n, scores)),
+                    error_callback=lambda error: finished.put(error)
+                )
+
+            results = []
+            while len(results) < len(configs):
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = finished.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                i, n_estimators, scores = item
+                results.append({**configs[i], "n_estimators": n_estimators, "rows": n_rows, **scores})
+
+            if len(results) < len(configs):
+                # Out of time: a partial rung does not compare configurations fairly
+                rungs.append({"rung": rung, "rows": n_rows, "trials": len(configs),
+                              "completed": len(results), "complete": False,
+                              "seconds": round(time.perf_counter() - rung_started, 3)})
+                break
+
+            results.sort(key=lambda result: result["log_loss"])
+            best = results[0]
+            summary = {
+                "rung": rung,
+                "rows": n_rows,
+                "trials": len(configs),
+                "completed": len(results),
+                "complete": True,
+                "best_log_loss": best["log_loss"],
+                "best_accuracy": best["accuracy"],
+                "seconds": round(time.perf_counter() - rung_started, 3)
+            }
+            rungs.append(summary)
+            if progress is not None:
+                progress(summary)
+
+            survivors = max(1, len(results) // ETA)
+            configs = [{"family": result["family"], "params": result["params"]} for result in results[:survivors]]
+            if len(results) == 1:
+                break
+    finally:
+        pool.terminate()
+        pool.join()
+
+    if best is None:
+        best_config = dict(DEFAULT_PARAMS)
+        scores = {"log_loss": None, "accuracy": None}
+    else:
+        best_config = {
+            "family": best["family"],
+            "params": best["params"],
+            "n_estimators": final_estimators(best["family"], best["n_estimators"], best["rows"], len(y)),
+            "scored_with": {"n_estimators": best["n_estimators"], "rows": best["rows"]}
+        }
+        scores = {"log_loss": best["log_loss"], "accuracy": best["accuracy"]}
+
+    return {
+        "best": best_config,
+        "cv_scores": scores,
+        "rungs": rungs,
+        "budget_seconds": budget_seconds,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+        "workers": n_workers
+    }
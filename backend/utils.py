@@ -1,13 +1,40 @@
 import numpy as np
 import pandas as pd
-from typing import List, Dict, Any
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
-import seaborn as sns
+from typing import List, Dict, Any, Optional
+import threading
 from io import BytesIO
+from monitoring import timed
 import base64
 
+# pyplot keeps global figure state, so plots drawn through it (SHAP) are
+# serialized; plots built on Figure objects can render concurrently
+PYPLOT_LOCK = threading.Lock()
+
+def get_pyplot():
+    """
+    Import pyplot on first use with the non-interactive backend
+    
+    The plotting stack is only needed by the visualization and SHAP
+    endpoints, so it is kept out of the import path of the API.
+    
+    Returns:
+        The matplotlib.pyplot module
+    """
+    import matplotlib
+    matplotlib.use('Agg')  # Use non-interactive backend
+    import matplotlib.pyplot as plt
+    return plt
+
+FEATURE_ORDER = [
+    'orbital_period',
+    'transit_duration',
+    'transit_depth',
+    'planet_radius',
+    'signal_to_noise',
+    'koi_score'
+]
+
+@timed("prepare_features")
 def prepare_features(features: Dict[str, float]) -> np.ndarray:
     """
     Prepare input features for model prediction
@@ -18,16 +45,85 @@ def prepare_features(features: Dict[str, float]) -> np.ndarray:
     Returns:
         numpy array of features in correct order
     """
-    feature_order = [
-        'orbital_period',
-        'transit_duration', 
-        'transit_depth',
-        'planet_radius',
-        'signal_to_noise',
-        'koi_score'
-    ]
+    return np.array([[features[key] for key in FEATURE_ORDER]])
+
+@timed("prepare_features")
+def prepare_feature_matrix(rows: List[Dict[str, float]]) -> np.ndarray:
+    """
+    Prepare a contiguous feature matrix for a batch of candidates
+    
+    Args:
+        rows: List of dictionaries of feature names and values
+        
+    Returns:
+        (n_rows, n_features) float64 numpy array in correct feature order
+    """
+    X = np.empty((len(rows), len(FEATURE_ORDER)), dtype=np.float64)
+    for j, key in enumerate(FEATURE_ORDER):
+        X[:, j] = [row[key] for row in rows]
+    return X
+
+@timed("inference")
+def score_matrix(model, X: np.ndarray):
+    """
+    Score a feature matrix with a single model pass
+    
+    Labels are taken from the probabilities instead of a second
+    ``predict`` call, so each batch costs one model dispatch.
+    
+    Args:
+        model: Trained scikit-learn compatible model
+        X: Feature matrix of shape (n_rows, n_features)
+        
+    Returns:
+        Tuple of (predictions, confidences, probabilities) numpy arrays,
+        probabilities columns ordered as [false_positive, confirmed]
+    """
+    if len(X) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty((0, 2))
     
-    return np.array([[features[key] for key in feature_order]])
+    if hasattr(model, 'predict_proba'):
+        probabilities = np.asarray(model.predict_proba(X))
+        best = np.argmax(probabilities, axis=1)
+        classes = getattr(model, 'classes_', None)
+        predictions = np.asarray(classes)[best] if classes is not None else best
+        confidences = probabilities[np.arange(len(best)), best]
+    else:
+        # Default confidence if probabilities not available
+        predictions = np.asarray(model.predict(X))
+        confirmed = np.where(predictions == 1, 0.85, 0.15)
+        probabilities = np.column_stack([1.0 - confirmed, confirmed])
+        confidences = np.full(len(predictions), 0.85)
+    
+    return predictions, confidences, probabilities
+
+def format_predictions(predictions: np.ndarray, confidences: np.ndarray,
+                       probabilities: np.ndarray) -> List[Dict[str, Any]]:
+    """
+    Serialize scored rows into prediction dictionaries
+    
+    Args:
+        predictions: Predicted class per row
+        confidences: Confidence per row
+        probabilities: Probability matrix, columns [false_positive, confirmed]
+        
+    Returns:
+        List of prediction dictionaries in the API response format
+    """
+    labels = np.where(predictions == 1, "confirmed", "false-positive").tolist()
+    false_positive = probabilities[:, 0].astype(float).tolist()
+    confirmed = probabilities[:, 1].astype(float).tolist()
+    
+    return [
+        {
+            "prediction": label,
+            "confidence": conf,
+            "probabilities": {"false_positive": fp, "confirmed": cf}
+        }
+        for label, conf, fp, cf in zip(
+            labels, confidences.astype(float).tolist(), false_positive, confirmed
+        )
+    ]
 
 def calculate_feature_importance(model, feature_names: List[str]) -> Dict[str, float]:
     """
@@ -49,39 +145,52 @@ def calculate_feature_importance(model, feature_names: List[str]) -> Dict[str, f
     
     return dict(zip(feature_names, importances.tolist()))
 
-def plot_to_base64(fig) -> str:
+IMAGE_MEDIA_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml"
+}
+
+def plot_to_base64(fig, image_format: str = 'png') -> str:
     """
     Convert matplotlib figure to base64 string
     
     Args:
         fig: Matplotlib figure object
+        image_format: 'png' or 'svg'
         
     Returns:
-        Base64 encoded string of the plot
+        Base64 encoded data URI of the plot
     """
     buffer = BytesIO()
-    fig.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
+    if image_format == 'svg':
+        fig.savefig(buffer, format='svg', bbox_inches='tight', metadata={'Date': None})
+    else:
+        fig.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
     buffer.seek(0)
     image_base64 = base64.b64encode(buffer.read()).decode()
-    plt.close(fig)
-    return f"data:image/png;base64,{image_base64}"
+    if fig.canvas.manager is not None:
+        get_pyplot().close(fig)
+    return f"data:{IMAGE_MEDIA_TYPES[image_format]};base64,{image_base64}"
 
-def create_confusion_matrix_plot(y_true: np.ndarray, y_pred: np.ndarray) -> str:
+@timed("rendering")
+def create_confusion_matrix_plot(cm: np.ndarray, image_format: str = 'png') -> str:
     """
     Create confusion matrix visualization
     
     Args:
-        y_true: True labels
-        y_pred: Predicted labels
+        cm: 2x2 confusion counts, rows actual and columns predicted
+        image_format: 'png' or 'svg'
         
     Returns:
         Base64 encoded confusion matrix plot
     """
-    from sklearn.metrics import confusion_matrix
+    from matplotlib.figure import Figure
+    import seaborn as sns
     
-    cm = confusion_matrix(y_true, y_pred)
+    cm = np.asarray(cm)
     
-    fig, ax = plt.subplots(figsize=(8, 6))
+    fig = Figure(figsize=(8, 6))
+    ax = fig.subplots()
     sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', ax=ax)
     ax.set_xlabel('Predicted')
     ax.set_ylabel('Actual')
@@ -89,25 +198,156 @@ def create_confusion_matrix_plot(y_true: np.ndarray, y_pred: np.ndarray) -> str:
     ax.set_xticklabels(['False Positive', 'Confirmed'])
     ax.set_yticklabels(['False Positive', 'Confirmed'])
     
-    return plot_to_base64(fig)
+    return plot_to_base64(fig, image_format)
 
-def create_feature_importance_plot(importances: Dict[str, float]) -> str:
+@timed("rendering")
+def create_feature_importance_plot(importances: Dict[str, float], image_format: str = 'png') -> str:
     """
     Create feature importance bar plot
     
     Args:
         importances: Dictionary of feature importances
+        image_format: 'png' or 'svg'
         
     Returns:
         Base64 encoded feature importance plot
     """
+    from matplotlib.figure import Figure
+    
     features = list(importances.keys())
     values = list(importances.values())
     
-    fig, ax = plt.subplots(figsize=(10, 6))
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
     ax.barh(features, values, color='skyblue')
     ax.set_xlabel('Importance')
     ax.set_title('Feature Importance')
     ax.grid(axis='x', alpha=0.3)
     
-    return plot_to_base64(fig)
+    return plot_to_base64(fig, image_format)
+
+# Boosting libraries shap.TreeExplainer reads, by class name so that
+# checking a model does not import them
+TREE_SHAP_TYPES = {
+    "HistGradientBoostingClassifier", "XGBClassifier", "Booster", "LGBMClassifier", "CatBoostClassifier"
+}
+
+def supports_tree_shap(model) -> bool:
+    """
+    Whether shap.TreeExplainer can explain a model, without building one
+    
+    Args:
+        model: Trained model or compiled forest
+        
+    Returns:
+        True for single trees, tree ensembles and compiled forests
+    """
+    if hasattr(model, 'shap_model') or hasattr(model, 'tree_'):
+        return True
+    estimators = getattr(model, 'estimators_', None)
+    if estimators is not None and len(estimators) and hasattr(np.ravel(estimators)[0], 'tree_'):
+        return True
+    return type(model).__name__ in TREE_SHAP_TYPES
+
+def create_shap_explainer(model, background: Optional[np.ndarray] = None):
+    """
+    Build a SHAP explainer for a tree-based model
+    
+    Args:
+        model: Trained tree-based model, or a compiled forest
+        background: Optional background rows; without them SHAP uses the
+            training distribution recorded in the trees
+        
+    Returns:
+        shap.TreeExplainer
+    """
+    import shap
+    
+    if hasattr(model, 'shap_model'):
+        model = model.shap_model()
+    
+    if background is None:
+        return shap.TreeExplainer(model)
+    return shap.TreeExplainer(model, data=background, feature_perturbation="interventional")
+
+def positive_class_shap(shap_values, expected_value):
+    """
+    Select the SHAP values of the 'confirmed' class
+    
+    Args:
+        shap_values: Output of explainer.shap_values, a per-class list or a
+            (rows, features[, classes]) array depending on the shap version
+        expected_value: Explainer expected value, scalar or per class
+        
+    Returns:
+        Tuple of ((rows, features) values, base value)
+    """
+    if isinstance(shap_values, list):
+        values = np.asarray(shap_values[-1])
+    else:
+        values = np.asarray(shap_values)
+        if values.ndim == 3:
+            values = values[:, :, -1]
+    
+    base_value = float(np.atleast_1d(expected_value)[-1])
+    return values, base_value
+
+@timed("shap")
+def create_shap_explanation(explainer, X: np.ndarray, feature_names: List[str], plot: bool = True):
+    """
+    Calculate SHAP values and render a waterfall plot for one candidate
+    
+    Args:
+        explainer: Explainer from create_shap_explainer
+        X: Feature matrix with a single row
+        feature_names: Display names of the features
+        plot: Render the waterfall plot
+        
+    Returns:
+        Tuple of (base64 waterfall plot or None, SHAP values)
+    """
+    shap_values = explainer.shap_values(X)
+    
+    if not plot:
+        return None, shap_values
+    
+    import shap
+    
+    plt = get_pyplot()
+    values, base_value = positive_class_shap(shap_values, explainer.expected_value)
+    
+    # Generate plot; shap draws on the current pyplot figure
+    with PYPLOT_LOCK:
+        fig = plt.figure(figsize=(10, 6))
+        shap.waterfall_plot(
+            shap.Explanation(
+                values=values[0],
+                base_values=base_value,
+                data=X[0],
+                feature_names=feature_names
+            ),
+            show=False
+        )
+        plot_base64 = plot_to_base64(plt.gcf())
+        plt.close(fig)
+    
+    return plot_base64, shap_values
+
+def file_digest(path) -> str:
+    """
+    Content hash of a file, used as the version id of model artifacts and
+    to identify training datasets
+    
+    Args:
+        path: Path to the file
+        
+    Returns:
+        First 16 hex characters of the file's SHA-256 digest
+    """
+    import hashlib
+    
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
@@ -1,9 +1,12 @@
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
 import joblib
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+from tuning import SCRIPT_DEFAULT_PARAMS, build_model, load_hyperparameters
+
 # Create synthetic training data based on NASA Kepler statistics
 np.random.seed(42)
 
@@ -60,12 +63,9 @@ features = [
 X = df[features]
 y = df['koi_disposition']
 
-model = RandomForestClassifier(
-    n_estimators=200,
-    max_depth=10,
-    random_state=42,
-    n_jobs=-1
-)
+# Best configuration of the last search (scripts/train_model.py --tune)
+config = load_hyperparameters(Path('models') / 'hyperparameters.json', SCRIPT_DEFAULT_PARAMS)
+model = build_model(config['family'], config['params'], config['n_estimators'], random_state=42, n_jobs=-1)
 
 model.fit(X, y)
 
@@ -3,22 +3,140 @@ import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
+import functools
 import json
 import joblib
+import multiprocessing
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+from kfold import cross_validate, format_summary
+
+# Holdout sidecars in the format the API's evaluation store reads
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+from evaluation import save_holdout
+
 # External libraries
 try:
     from xgboost import XGBClassifier
-    from lightgbm import LGBMClassifier
+    from lightgbm import LGBMClassifier, early_stopping
     HAS_ADVANCED_MODELS = True
 except ImportError:
     HAS_ADVANCED_MODELS = False
     print("[v0] XGBoost/LightGBM not available, using Random Forest only")
 
-def train_model(csv_path):
-    """Train exoplanet classification model using the exact approach from user's code"""
+# Boosting rounds are capped here and stopped early on the validation split
+MAX_BOOSTING_ROUNDS = 2000
+EARLY_STOPPING_ROUNDS = 50
+VALIDATION_SIZE = 0.15
+
+def split_cores(names, cores):
+    """
+    Share the available cores between models trained at the same time
+
+    Returns:
+        Dictionary of threads per model name, at least one each
+    """
+    share, extra = divmod(cores, len(names))
+    return {name: max(1, share + (1 if i < extra else 0)) for i, name in enumerate(names)}
+
+def make_model(name, n_threads):
+    """Build an untrained candidate model using n_threads threads"""
+    if name == "Random Forest":
+        return RandomForestClassifier(
+            n_estimators=200, 
+            max_depth=10, 
+            random_state=42,
+            n_jobs=n_threads
+        )
+    if name == "XGBoost":
+        return XGBClassifier(
+            n_estimators=MAX_BOOSTING_ROUNDS,
+            learning_rate=0.05,
+            eval_metric='logloss',
+            early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+            random_state=42,
+            n_jobs=n_threads
+        )
+    if name == "LightGBM":
+        return LGBMClassifier(
+            n_estimators=MAX_BOOSTING_ROUNDS,
+            learning_rate=0.05,
+            random_state=42,
+            n_jobs=n_threads,
+            verbose=-1
+        )
+    raise ValueError(f"Unknown model: {name}")
+
+def make_fold_model(name, rounds, n_threads):
+    """Candidate model with a fixed number of boosting rounds, for k-fold evaluation"""
+    model = make_model(name, n_threads)
+    if name == "XGBoost":
+        model.set_params(n_estimators=rounds, early_stopping_rounds=None)
+    elif name == "LightGBM":
+        model.set_params(n_estimators=rounds)
+    return model
+
+def fit_candidate(name, n_threads, X_train, y_train, X_val, y_val, X_test):
+    """
+    Fit one candidate model in a worker process
+
+    Random Forest is fitted on the whole training split. The boosted models
+    are fitted on the training split minus the validation rows, and stop
+    once the validation log loss has not improved for EARLY_STOPPING_ROUNDS
+    rounds.
+
+    Returns:
+        Tuple of (fitted model, test predictions, test p_confirmed, timing report)
+    """
+    from threadpoolctl import threadpool_limits
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    # Caps BLAS/OpenMP pools the libraries do not size from n_jobs
+    with threadpool_limits(limits=n_threads):
+        model = make_model(name, n_threads)
+        if name == "XGBoost":
+            model.fit(X_train, y_train, eval_set=[(X_val, y_val)], verbose=False)
+            rounds = int(model.best_iteration) + 1
+        elif name == "LightGBM":
+            model.fit(
+                X_train, y_train,
+                eval_set=[(X_val, y_val)],
+                callbacks=[early_stopping(EARLY_STOPPING_ROUNDS, verbose=False)]
+            )
+            rounds = int(model.best_iteration_ or MAX_BOOSTING_ROUNDS)
+        else:
+            model.fit(X_train, y_train)
+            rounds = len(model.estimators_)
+
+        y_pred = model.predict(X_test)
+        p_confirmed = model.predict_proba(X_test)[:, list(model.classes_).index(1)]
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    report = {
+        "threads": n_threads,
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round(cpu, 3),
+        "cores_used": round(cpu / wall, 2) if wall > 0 else 0.0,
+        "rounds": rounds
+    }
+    return model, y_pred, p_confirmed, report
+
+def train_model(csv_path, folds=None):
+    """
+    Train exoplanet classification model using the exact approach from user's code
+
+    With folds, every candidate is also evaluated with stratified k-fold
+    cross-validation over all rows, and the best model is chosen by its
+    mean fold accuracy instead of the single holdout accuracy. Boosted
+    models keep the rounds found by early stopping on the holdout fit.
+    """
     
     print(f"[v0] Loading data from {csv_path}...")
     df = pd.read_csv(csv_path, sep=',', low_memory=False)
@@ -87,35 +205,66 @@ def train_model(csv_path):
     print(f"[v0] Training set: {len(X_train)} samples")
     print(f"[v0] Test set: {len(X_test)} samples")
     
-    # Define models
-    models = {
-        "Random Forest": RandomForestClassifier(
-            n_estimators=200, 
-            max_depth=10, 
-            random_state=42,
-            n_jobs=-1
-        )
-    }
-    
+    # Candidate models
+    names = ["Random Forest"]
     if HAS_ADVANCED_MODELS:
-        models["XGBoost"] = XGBClassifier(
-            eval_metric='logloss',
-            use_label_encoder=False,
-            random_state=42
+        names += ["XGBoost", "LightGBM"]
+    
+    # Validation rows for early stopping of the boosted models
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_train, y_train, stratify=y_train, random_state=42, test_size=VALIDATION_SIZE
+    )
+    
+    # Train every candidate at once, each in its own process with its share
+    # of the cores, so model selection takes about as long as the slowest fit
+    cores = os.cpu_count() or 1
+    threads = split_cores(names, cores)
+    print(f"\n[v0] 🚀 Training {', '.join(names)} in parallel on {cores} cores...")
+    
+    run_start = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=min(len(names), cores),
+        mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        futures = {
+            name: pool.submit(
+                fit_candidate, name, threads[name],
+                X_train if name == "Random Forest" else X_fit,
+                y_train if name == "Random Forest" else y_fit,
+                X_val, y_val, X_test
+            )
+            for name in names
+        }
+        fitted = {name: future.result() for name, future in futures.items()}
+    run_wall = time.perf_counter() - run_start
+    
+    # Fit every fold of every candidate at once, sharing the feature matrix
+    cv = None
+    if folds:
+        factories = {
+            name: functools.partial(make_fold_model, name, fitted[name][3]["rounds"])
+            for name in names
+        }
+        print(f"\n[v0] 🔁 {folds}-fold cross-validation of {', '.join(names)}...")
+        cv = cross_validate(factories, X_encoded.to_numpy(dtype=np.float64), y.to_numpy(), folds)
+        for name, result in cv["models"].items():
+            print(f"[v0] {format_summary(name, result)}")
+        print(
+            f"[v0] Cross-validation wall {cv['wall_seconds']:.2f}s "
+            f"(sum of fold fits {sum(r['sum_fold_seconds'] for r in cv['models'].values()):.2f}s)"
         )
-        models["LightGBM"] = LGBMClassifier(random_state=42)
     
     # Train and evaluate
     results = {}
+    timings = {}
     best_model = None
     best_accuracy = 0
+    best_score = 0
     best_model_name = ""
+    best_holdout = None
     
-    for name, model in models.items():
-        print(f"\n[v0] 🚀 Training {name}...")
-        model.fit(X_train, y_train)
-        y_pred = model.predict(X_test)
-        
+    for name, (model, y_pred, p_confirmed, timing) in fitted.items():
+        timings[name] = timing
         acc = accuracy_score(y_test, y_pred)
         results[name] = acc
         
@@ -128,19 +277,36 @@ def train_model(csv_path):
         print(f"[v0] Confusion Matrix:\n{cm}")
         
         # Track best model
-        if acc > best_accuracy:
+        score = cv["models"][name]["metrics"]["accuracy"]["mean"] if cv else acc
+        if best_model is None or score > best_score:
+            best_score = score
             best_accuracy = acc
             best_model = model
             best_model_name = name
+            best_holdout = (y_pred, p_confirmed)
         
         # Save model
         model_filename = f"data/{name.lower().replace(' ', '_')}_model.pkl"
         Path("data").mkdir(exist_ok=True)
         joblib.dump(model, model_filename)
+        save_holdout(model_filename, y_test, y_pred, p_confirmed)
         print(f"[v0] Saved model to {model_filename}")
     
+    # Wall-clock and core usage per model
+    print("\n[v0] ⏱️ Training time per model:")
+    for name, timing in timings.items():
+        print(
+            f"[v0]   {name:<14} wall {timing['wall_seconds']:>8.2f}s  cpu {timing['cpu_seconds']:>8.2f}s  "
+            f"threads {timing['threads']:>2}  cores used {timing['cores_used']:>5.2f}  rounds {timing['rounds']}"
+        )
+    print(
+        f"[v0]   {'total':<14} wall {run_wall:>8.2f}s  "
+        f"(sum of model fits {sum(t['wall_seconds'] for t in timings.values()):.2f}s)"
+    )
+    
     # Save best model as default
     joblib.dump(best_model, "data/exoplanet_model.pkl")
+    save_holdout("data/exoplanet_model.pkl", y_test, *best_holdout)
     print(f"\n[v0] ✅ Best model: {best_model_name} (Accuracy: {best_accuracy:.4f})")
     
     # Save feature names and metadata
@@ -150,6 +316,12 @@ def train_model(csv_path):
         "accuracy": best_accuracy,
         "n_features": len(feature_names),
         "training_samples": len(X_train),
+        "boosting_rounds": timings[best_model_name]["rounds"],
+        "cross_validation": {
+            "n_folds": cv["n_folds"],
+            "metrics": cv["models"][best_model_name]["metrics"],
+            "folds": cv["models"][best_model_name]["folds"]
+        } if cv else None,
         "test_samples": len(X_test),
         "class_distribution": {
             "confirmed": int(sum(y == 1)),
@@ -179,16 +351,19 @@ def train_model(csv_path):
         "success": True,
         "model_name": best_model_name,
         "accuracy": best_accuracy,
-        "results": results
+        "results": results,
+        "timings": timings,
+        "cross_validation": {name: result["metrics"] for name, result in cv["models"].items()} if cv else None
     }
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("[v0] Usage: python train_exoplanet_model.py <csv_path>")
+        print("[v0] Usage: python train_exoplanet_model.py <csv_path> [--folds k]")
         sys.exit(1)
     
     csv_path = sys.argv[1]
-    result = train_model(csv_path)
+    folds = int(sys.argv[sys.argv.index("--folds") + 1]) if "--folds" in sys.argv else None
+    result = train_model(csv_path, folds)
     
     if result:
         print(f"\n[v0] Training complete!")
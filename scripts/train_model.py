@@ -4,100 +4,206 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score, precision_score, recall_score, f1_score
 import joblib
+import functools
 import json
 import sys
 from pathlib import Path
 from datetime import datetime
 
-def train_exoplanet_model(csv_path, test_size=0.2, random_state=42):
+# Hyperparameter search shared with the API's tuned retraining
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+from tuning import (
+    SCRIPT_DEFAULT_PARAMS, build_model, load_hyperparameters, save_hyperparameters, successive_halving
+)
+from training import grow_random_forest
+from evaluation import save_holdout
+from utils import file_digest
+from kfold import cross_validate
+
+# NASA Kepler features used for classification
+FEATURES = [
+    'koi_period',      # Orbital period (days)
+    'koi_duration',    # Transit duration (hours)
+    'koi_impact',      # Impact parameter
+    'koi_depth',       # Transit depth (ppm)
+    'koi_prad',        # Planet radius (Earth radii)
+    'koi_insol',       # Insolation flux (Earth flux)
+    'koi_model_snr',   # Signal-to-noise ratio
+    'koi_srad',        # Stellar radius (Solar radii)
+    'koi_steff',       # Stellar effective temperature (K)
+    'koi_slogg',       # Stellar surface gravity (log10(cm/s²))
+    'koi_fpflag_nt',   # Not transit-like flag
+    'koi_fpflag_ss',   # Stellar eclipse flag
+    'koi_fpflag_co',   # Centroid offset flag
+    'koi_fpflag_ec'    # Ephemeris match flag
+]
+
+TARGET = 'koi_disposition'
+
+# Best configuration of the last search (train_model.py --tune), used by
+# later trainings and create_initial_model.py
+HYPERPARAMETERS_PATH = Path('models') / 'hyperparameters.json'
+
+def load_training_data(csv_path):
     """
-    Train Random Forest model on NASA Kepler exoplanet data
+    Load and clean labeled KOI rows
+    
+    Args:
+        csv_path: Path to training CSV file
+    
+    Returns:
+        Tuple of (features DataFrame, binary labels Series), or an error
+        result dictionary
+    """
+    df = pd.read_csv(csv_path)
+    
+    # Check if required columns exist
+    missing_features = [f for f in FEATURES if f not in df.columns]
+    if missing_features:
+        return {
+            'success': False,
+            'error': f'Missing required columns: {", ".join(missing_features)}'
+        }
+    
+    if TARGET not in df.columns:
+        return {
+            'success': False,
+            'error': f'Missing target column: {TARGET}'
+        }
+    
+    # Filter and clean data
+    df = df[FEATURES + [TARGET]].dropna()
+    
+    if len(df) < 10:
+        return {
+            'success': False,
+            'error': 'Insufficient data after cleaning (need at least 10 samples)'
+        }
+    
+    # Map disposition labels to binary classification
+    label_map = {
+        'CONFIRMED': 1,
+        'FALSE POSITIVE': 0,
+        'CANDIDATE': 2
+    }
+    
+    df[TARGET] = df[TARGET].map(label_map)
+    
+    # Remove CANDIDATE class for binary classification
+    df = df[df[TARGET] != 2]
+    
+    if len(df) < 10:
+        return {
+            'success': False,
+            'error': 'Insufficient confirmed/false positive samples (need at least 10)'
+        }
+    
+    # Check class balance
+    if df[TARGET].nunique() < 2:
+        return {
+            'success': False,
+            'error': 'Need both confirmed and false positive samples'
+        }
+    
+    return df[FEATURES], df[TARGET]
+
+def evaluate_and_save(model, X_train, X_test, y_train, y_test, y, filename_prefix, extra_metrics=None):
+    """
+    Evaluate a fitted model on the holdout split and save it
+    
+    Returns:
+        Training result dictionary
+    """
+    # Make predictions
+    p_confirmed = model.predict_proba(X_test)[:, list(model.classes_).index(1)]
+    y_pred = model.predict(X_test)
+    
+    return save_evaluated_model(model, y_test, y_pred, p_confirmed, len(X_train), y, filename_prefix, extra_metrics)
+
+def save_evaluated_model(model, y_test, y_pred, p_confirmed, train_samples, y, filename_prefix, extra_metrics=None):
+    """
+    Save a model with the metrics of its holdout predictions
+    
+    Returns:
+        Training result dictionary
+    """
+    # Calculate metrics
+    metrics = {
+        'accuracy': float(accuracy_score(y_test, y_pred)),
+        'precision': float(precision_score(y_test, y_pred, zero_division=0)),
+        'recall': float(recall_score(y_test, y_pred, zero_division=0)),
+        'f1_score': float(f1_score(y_test, y_pred, zero_division=0)),
+        'train_samples': int(train_samples),
+        'test_samples': int(len(y_test)),
+        'total_samples': int(len(y)),
+        'confirmed_count': int(sum(y == 1)),
+        'false_positive_count': int(sum(y == 0)),
+        **(extra_metrics or {})
+    }
+    
+    # Feature importance (boosted models have none)
+    feature_importance = {
+        feature: float(importance) 
+        for feature, importance in zip(FEATURES, getattr(model, 'feature_importances_', []))
+    }
+    
+    # Sort by importance
+    feature_importance = dict(
+        sorted(feature_importance.items(), key=lambda x: x[1], reverse=True)
+    )
+    
+    # Save model
+    model_dir = Path('models')
+    model_dir.mkdir(exist_ok=True)
+    
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    model_filename = f'{filename_prefix}_{timestamp}.pkl'
+    model_path = model_dir / model_filename
+    
+    joblib.dump(model, model_path)
+    
+    # Save as current model too
+    current_model_path = model_dir / 'current_model.pkl'
+    joblib.dump(model, current_model_path)
+    
+    # Holdout predictions next to each artifact, picked up by the API's
+    # evaluation store for /api/confusion-matrix and /api/model-stats
+    for path in [model_path, current_model_path]:
+        save_holdout(path, y_test, y_pred, p_confirmed)
+    
+    return {
+        'success': True,
+        'metrics': metrics,
+        'feature_importance': feature_importance,
+        'model_path': str(model_path),
+        'timestamp': timestamp
+    }
+
+def train_exoplanet_model(csv_path, test_size=0.2, random_state=42, tune_seconds=None, folds=None):
+    """
+    Train a model on NASA Kepler exoplanet data
+    
+    Uses the configuration saved by the last hyperparameter search, or a
+    200-tree Random Forest if there is none.
     
     Args:
         csv_path: Path to training CSV file
         test_size: Proportion of data for testing (default 0.2)
         random_state: Random seed for reproducibility (default 42)
+        tune_seconds: Search hyperparameters on the train split for this
+            many seconds first and save the best configuration (default:
+            no search)
+        folds: Also run a stratified k-fold evaluation over all rows with
+            this many folds, fitted in parallel (default: holdout only)
     
     Returns:
         Dictionary with training results and metrics
     """
-    
-    # NASA Kepler features used for classification
-    features = [
-        'koi_period',      # Orbital period (days)
-        'koi_duration',    # Transit duration (hours)
-        'koi_impact',      # Impact parameter
-        'koi_depth',       # Transit depth (ppm)
-        'koi_prad',        # Planet radius (Earth radii)
-        'koi_insol',       # Insolation flux (Earth flux)
-        'koi_model_snr',   # Signal-to-noise ratio
-        'koi_srad',        # Stellar radius (Solar radii)
-        'koi_steff',       # Stellar effective temperature (K)
-        'koi_slogg',       # Stellar surface gravity (log10(cm/s²))
-        'koi_fpflag_nt',   # Not transit-like flag
-        'koi_fpflag_ss',   # Stellar eclipse flag
-        'koi_fpflag_co',   # Centroid offset flag
-        'koi_fpflag_ec'    # Ephemeris match flag
-    ]
-    
-    target = 'koi_disposition'
-    
     try:
-        # Load data
-        df = pd.read_csv(csv_path)
-        
-        # Check if required columns exist
-        missing_features = [f for f in features if f not in df.columns]
-        if missing_features:
-            return {
-                'success': False,
-                'error': f'Missing required columns: {", ".join(missing_features)}'
-            }
-        
-        if target not in df.columns:
-            return {
-                'success': False,
-                'error': f'Missing target column: {target}'
-            }
-        
-        # Filter and clean data
-        df = df[features + [target]].dropna()
-        
-        if len(df) < 10:
-            return {
-                'success': False,
-                'error': 'Insufficient data after cleaning (need at least 10 samples)'
-            }
-        
-        # Map disposition labels to binary classification
-        label_map = {
-            'CONFIRMED': 1,
-            'FALSE POSITIVE': 0,
-            'CANDIDATE': 2
-        }
-        
-        df[target] = df[target].map(label_map)
-        
-        # Remove CANDIDATE class for binary classification
-        df = df[df[target] != 2]
-        
-        if len(df) < 10:
-            return {
-                'success': False,
-                'error': 'Insufficient confirmed/false positive samples (need at least 10)'
-            }
-        
-        # Prepare features and target
-        X = df[features]
-        y = df[target]
-        
-        # Check class balance
-        class_counts = y.value_counts()
-        if len(class_counts) < 2:
-            return {
-                'success': False,
-                'error': 'Need both confirmed and false positive samples'
-            }
+        data = load_training_data(csv_path)
+        if isinstance(data, dict):
+            return data
+        X, y = data
         
         # Train/test split with stratification
         X_train, X_test, y_train, y_test = train_test_split(
@@ -107,64 +213,95 @@ def train_exoplanet_model(csv_path, test_size=0.2, random_state=42):
             random_state=random_state
         )
         
-        # Train Random Forest model
-        model = RandomForestClassifier(
-            n_estimators=200,
-            max_depth=10,
-            random_state=random_state,
-            n_jobs=-1
-        )
+        extra = {}
+        if tune_seconds:
+            tuning = successive_halving(X_train.values, y_train.values, tune_seconds, random_state=random_state)
+            save_hyperparameters(HYPERPARAMETERS_PATH, tuning)
+            extra['tuning'] = tuning
+        config = load_hyperparameters(HYPERPARAMETERS_PATH, SCRIPT_DEFAULT_PARAMS)
+        extra['hyperparameters'] = config
         
+        model = build_model(config['family'], config['params'], config['n_estimators'], random_state, n_jobs=-1)
         model.fit(X_train, y_train)
         
-        # Make predictions
-        y_pred = model.predict(X_test)
-        
-        # Calculate metrics
-        metrics = {
-            'accuracy': float(accuracy_score(y_test, y_pred)),
-            'precision': float(precision_score(y_test, y_pred, zero_division=0)),
-            'recall': float(recall_score(y_test, y_pred, zero_division=0)),
-            'f1_score': float(f1_score(y_test, y_pred, zero_division=0)),
-            'train_samples': int(len(X_train)),
-            'test_samples': int(len(X_test)),
-            'total_samples': int(len(df)),
-            'confirmed_count': int(sum(y == 1)),
-            'false_positive_count': int(sum(y == 0))
-        }
-        
-        # Feature importance
-        feature_importance = {
-            feature: float(importance) 
-            for feature, importance in zip(features, model.feature_importances_)
-        }
+        # Record which data every tree was grown on
+        if hasattr(model, 'estimators_'):
+            model.tree_provenance_ = [{
+                'dataset': file_digest(csv_path),
+                'trained_at': datetime.now().isoformat(),
+                'rows': int(len(X_train))
+            }] * len(model.estimators_)
         
-        # Sort by importance
-        feature_importance = dict(
-            sorted(feature_importance.items(), key=lambda x: x[1], reverse=True)
-        )
+        result = evaluate_and_save(model, X_train, X_test, y_train, y_test, y, 'exoplanet_model')
+        result.update(extra)
         
-        # Save model
-        model_dir = Path('models')
-        model_dir.mkdir(exist_ok=True)
+        if folds:
+            factory = functools.partial(
+                build_model, config['family'], config['params'], config['n_estimators'], random_state
+            )
+            cv = cross_validate({'model': factory}, X.values, y.values, folds, random_state)
+            result['cross_validation'] = {
+                **cv['models']['model'],
+                'n_folds': cv['n_folds'],
+                'wall_seconds': cv['wall_seconds']
+            }
+        return result
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        model_filename = f'exoplanet_model_{timestamp}.pkl'
-        model_path = model_dir / model_filename
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+def grow_exoplanet_model(csv_path, base_model_path, new_trees=50, max_trees=None,
+                         test_size=0.2, random_state=42):
+    """
+    Grow an existing Random Forest with trees fitted on new labeled data
+    
+    Only the new trees are fitted, on the new rows only (warm_start), so
+    the cost depends on the new data rather than on everything the forest
+    was trained on before. The oldest trees are retired when the forest
+    grows past max_trees.
+    
+    Args:
+        csv_path: Path to CSV file with the new labeled rows
+        base_model_path: Fitted RandomForestClassifier to grow
+        new_trees: Number of trees to add (default 50)
+        max_trees: Largest ensemble to keep (default: no limit)
+        test_size: Proportion of new data for testing (default 0.2)
+        random_state: Random seed for reproducibility (default 42)
+    
+    Returns:
+        Dictionary with training results and metrics
+    """
+    try:
+        model = joblib.load(base_model_path)
+        if not isinstance(model, RandomForestClassifier):
+            return {
+                'success': False,
+                'error': f'Base model must be a RandomForestClassifier, not {type(model).__name__}'
+            }
         
-        joblib.dump(model, model_path)
+        data = load_training_data(csv_path)
+        if isinstance(data, dict):
+            return data
+        X, y = data
         
-        # Save as current model too
-        current_model_path = model_dir / 'current_model.pkl'
-        joblib.dump(model, current_model_path)
+        # Same warm start, reseeding, retirement and provenance as the API
+        model, metrics, holdout = grow_random_forest(
+            model, X, y, new_trees, max_trees, test_size, random_state,
+            source={'dataset': file_digest(csv_path), 'trained_at': datetime.now().isoformat()}
+        )
         
-        return {
-            'success': True,
-            'metrics': metrics,
-            'feature_importance': feature_importance,
-            'model_path': str(model_path),
-            'timestamp': timestamp
-        }
+        return save_evaluated_model(
+            model, holdout['y_true'], holdout['y_pred'], holdout['p_confirmed'],
+            metrics['train_samples'], y, 'exoplanet_model', {
+                'base_model': str(base_model_path),
+                'trees_added': metrics['trees_added'],
+                'trees_retired': metrics['trees_retired'],
+                'trees': metrics['trees']
+            }
+        )
         
     except Exception as e:
         return {
@@ -180,8 +317,25 @@ if __name__ == '__main__':
         }))
         sys.exit(1)
     
-    csv_path = sys.argv[1]
-    test_size = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    # Options: --tune seconds (hyperparameter search), --folds k (k-fold evaluation)
+    args = sys.argv[1:]
+    options = {}
+    for option in ['--tune', '--folds']:
+        if option in args:
+            position = args.index(option)
+            options[option] = args[position + 1]
+            del args[position:position + 2]
+    tune_seconds = float(options['--tune']) if '--tune' in options else None
+    folds = int(options['--folds']) if '--folds' in options else None
+    
+    csv_path = args[0]
+    test_size = float(args[1]) if len(args) > 1 else 0.2
     
-    result = train_exoplanet_model(csv_path, test_size)
+    # Incremental mode: train_model.py data.csv [test_size] base_model.pkl [new_trees] [max_trees]
+    if len(args) > 2:
+        new_trees = int(args[3]) if len(args) > 3 else 50
+        max_trees = int(args[4]) if len(args) > 4 else None
+        result = grow_exoplanet_model(csv_path, args[2], new_trees, max_trees, test_size)
+    else:
+        result = train_exoplanet_model(csv_path, test_size, tune_seconds=tune_seconds, folds=folds)
     print(json.dumps(result))